@@ -0,0 +1,83 @@
+"""
+Micro-benchmark BranchTree operations on large synthetic trees.
+
+Usage: PYTHONPATH=. python -m bench.branch_tree [--branches N]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from graphite_shim.branch_tree import BranchTree, ParentInfo
+
+
+def make_parent_map(*, num_branches: int, stack_depth: int) -> dict[str, ParentInfo]:
+    """Make `num_branches` branches, in stacks of `stack_depth` branches on top of trunk."""
+    parent_map = {}
+    for i in range(num_branches):
+        parent = "main" if i % stack_depth == 0 else f"branch-{i - 1}"
+        parent_map[f"branch-{i}"] = ParentInfo(name=parent, last_commit=f"{i:040x}")
+    return parent_map
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, default=10_000)
+    args = parser.parse_args()
+
+    for stack_depth in [1, 100]:
+        parent_map = make_parent_map(num_branches=args.branches, stack_depth=stack_depth)
+        print(f"{args.branches} branches, stacks of depth {stack_depth}:")
+
+        for name, func in {
+            "build": build,
+            "restack all": restack_all,
+            "create all": create_all,
+            "rename+remove x1000": rename_and_remove,
+            "serialize": serialize,
+        }.items():
+            print(f"  {name:<22} {timeit(func, parent_map) * 1000:>10.1f} ms")
+
+
+def build(parent_map: dict[str, ParentInfo]) -> None:
+    tree = BranchTree(trunk="main", parent_map=parent_map)
+    tree.get_branches()
+
+
+def restack_all(parent_map: dict[str, ParentInfo]) -> None:
+    # Mimics `gt restack`: read a branch, then update its parent commit
+    tree = BranchTree(trunk="main", parent_map=parent_map)
+    for branch in parent_map:
+        tree.get_branch(branch)
+        tree.update_parent_commit(branch, commit="0" * 40)
+
+
+def create_all(parent_map: dict[str, ParentInfo]) -> None:
+    # Mimics `gt create` on every branch
+    tree = BranchTree(trunk="main")
+    for branch, parent in parent_map.items():
+        tree.get_branch(parent.name)
+        tree.set_parent(branch, parent=parent)
+
+
+def rename_and_remove(parent_map: dict[str, ParentInfo]) -> None:
+    tree = BranchTree(trunk="main", parent_map=parent_map)
+    for branch in list(parent_map)[:1000]:
+        tree.rename_branch(from_=branch, to=f"{branch}-renamed")
+        tree.get_branch(f"{branch}-renamed")
+        tree.remove_branch(f"{branch}-renamed")
+
+
+def serialize(parent_map: dict[str, ParentInfo]) -> None:
+    tree = BranchTree(trunk="main", parent_map=parent_map)
+    BranchTree.deserialize(tree.serialize())
+
+
+def timeit(func: Callable[[dict[str, ParentInfo]], None], parent_map: dict[str, ParentInfo]) -> float:
+    start = time.perf_counter()
+    func(parent_map)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
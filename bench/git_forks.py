@@ -0,0 +1,75 @@
+"""
+Count the git processes forked per command, with and without the persistent
+`git cat-file` session.
+
+Usage: PYTHONPATH=. python -m bench.git_forks [--branches N]
+"""
+
+import argparse
+import contextlib
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from bench.utils.repo import commit, configure_shim, count_forks, git, init_repo, make_stack
+from graphite_shim.commands.base import Command
+from graphite_shim.commands.create import CommandCreate, CreateArgs
+from graphite_shim.commands.restack import CommandRestack, RestackArgs, RestackTargets
+from graphite_shim.commands.track import CommandTrack, TrackArgs
+from graphite_shim.config import Config
+from graphite_shim.git import GitClient
+from graphite_shim.store import StoreManager
+from graphite_shim.utils.term import suppress_output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, default=50)
+    args = parser.parse_args()
+
+    branches = [f"branch-{i}" for i in range(args.branches)]
+    scenarios: dict[str, tuple[type[Command[Any]], Any]] = {
+        "create": (CommandCreate, CreateArgs(name="new-branch", insert=False)),
+        "track": (CommandTrack, TrackArgs(parent=branches[-2])),
+        "restack": (CommandRestack, RestackArgs(targets=RestackTargets.FULL_STACK)),
+    }
+
+    print(f"{'command':<10} {'no batch':>10} {'batch':>10}")
+    for name, (cmd_cls, cmd_args) in scenarios.items():
+        counts = []
+        for use_batch in [False, True]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                repo = Path(tmpdir)
+                init_repo(repo)
+                parents = make_stack(repo, branches, base="main")
+                config = configure_shim(repo, parents=parents)
+                # move trunk, so that restack has work to do
+                git(repo, "switch", "--quiet", "main")
+                commit(repo, "trunk-update")
+                git(repo, "switch", "--quiet", branches[-1])
+
+                counts.append(run_command(cmd_cls, cmd_args, repo=repo, config=config, use_batch=use_batch))
+        print(f"{name:<10} {counts[0]:>10} {counts[1]:>10}")
+
+
+def run_command(
+    cmd_cls: type[Command[Any]],
+    cmd_args: Any,
+    *,
+    repo: Path,
+    config: Config,
+    use_batch: bool,
+) -> int:
+    store = StoreManager.load(store_dir=config.config_dir)
+    with (
+        contextlib.closing(GitClient(cwd=repo, use_batch=use_batch)) as git,
+        count_forks() as counter,
+        suppress_output(),
+    ):
+        cmd = cmd_cls(prompter=None, git=git, config=config, store=store)
+        cmd.run(cmd_args)
+    return counter.count
+
+
+if __name__ == "__main__":
+    main()
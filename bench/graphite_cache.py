@@ -0,0 +1,91 @@
+"""
+Compare loading the whole Graphite cache with json.loads against streaming
+just its branches, on synthetic multi-MB cache files.
+
+Usage: PYTHONPATH=. python -m bench.graphite_cache
+"""
+
+import hashlib
+import json
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from graphite_shim.cache_only import CacheIndex
+from graphite_shim.utils.json_stream import iter_array_items
+
+
+def make_graphite_cache(*, num_branches: int, stack_depth: int = 5, body_size: int = 2000) -> str:
+    """Make the contents of a .graphite_cache_persist file, with PR info like real caches have."""
+    branches: list[tuple[str, dict[str, Any]]] = [("main", {"validationResult": "TRUNK", "children": []})]
+    for i in range(num_branches):
+        parent = "main" if i % stack_depth == 0 else f"user/feature-{i - 1}"
+        branches.append(
+            (
+                f"user/feature-{i}",
+                {
+                    "parentBranchName": parent,
+                    "parentBranchRevision": hashlib.sha1(parent.encode()).hexdigest(),
+                    "validationResult": "VALID",
+                    "children": [],
+                    "prInfo": {
+                        "number": i,
+                        "title": f"Feature {i}",
+                        "body": "Lorem ipsum dolor sit amet. " * (body_size // 28),
+                        "state": "OPEN",
+                        "reviewDecision": "REVIEW_REQUIRED",
+                        "isDraft": False,
+                    },
+                },
+            )
+        )
+    return json.dumps({"sha": "0" * 40, "branches": branches})
+
+
+def load_full(path: Path) -> CacheIndex:
+    data = json.loads(path.read_text())
+    return CacheIndex.build(data["branches"], source=(0, 0))
+
+
+def load_streaming(path: Path) -> CacheIndex:
+    with path.open() as f:
+        return CacheIndex.build(iter_array_items(f, "branches"), source=(0, 0))
+
+
+def measure(func: Callable[[Path], CacheIndex], path: Path, *, runs: int = 5) -> tuple[float, int]:
+    """Return the best time and the peak memory of loading the cache."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(path)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), peak
+
+
+def main() -> None:
+    print(f"{'branches':>10} {'file':>8} {'json.loads':>22} {'streaming':>22}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / ".graphite_cache_persist"
+        for num_branches in [1_000, 5_000, 20_000]:
+            path.write_text(make_graphite_cache(num_branches=num_branches))
+            size_mb = path.stat().st_size / 1024 / 1024
+
+            results = []
+            for func in [load_full, load_streaming]:
+                duration, peak = measure(func, path)
+                results.append(f"{duration * 1000:>7.1f}ms {peak / 1024 / 1024:>7.1f}MB peak")
+
+            print(f"{num_branches:>10} {size_mb:>6.1f}MB {results[0]:>22} {results[1]:>22}")
+
+
+if __name__ == "__main__":
+    main()
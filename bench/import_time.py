@@ -0,0 +1,64 @@
+"""
+Measure startup latency: module import time (via `python -X importtime`)
+and end-to-end wall time of cheap commands like `gt trunk`.
+
+Usage: PYTHONPATH=. python -m bench.import_time [--runs N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from bench.utils.repo import configure_shim, get_env, init_repo, make_stack, run_gt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo = Path(tmpdir)
+        init_repo(repo)
+        configure_shim(repo, parents=make_stack(repo, ["a", "b"], base="main"))
+
+        imports = get_import_times(repo)
+        total_us = imports["graphite_shim.__main__"]
+        print(f"Importing graphite_shim.__main__: {total_us / 1000:.1f}ms")
+        print("Slowest graphite_shim modules (cumulative):")
+        shim_modules = {mod: us for mod, us in imports.items() if mod.startswith("graphite_shim.")}
+        for mod, us in sorted(shim_modules.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+            print(f"  {mod:<40} {us / 1000:>6.1f}ms")
+
+        print("")
+        print(f"{'command':<20} {'median':>10} {'min':>10}")
+        for cmd in [["trunk"], ["parent"], ["ls"]]:
+            times = [run_gt(repo, cmd) for _ in range(args.runs)]
+            print(f"{' '.join(cmd):<20} {statistics.median(times):>8.1f}ms {min(times):>8.1f}ms")
+
+
+def get_import_times(repo: Path) -> dict[str, int]:
+    """Get the cumulative import time of each module, in microseconds."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import graphite_shim.__main__"],
+        cwd=repo,
+        env=get_env(),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, mod = line.removeprefix("import time:").split("|")
+        times[mod.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == "__main__":
+    main()
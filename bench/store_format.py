@@ -0,0 +1,57 @@
+"""
+Compare loading/saving the store as json vs binary.
+
+Usage: PYTHONPATH=. python -m bench.store_format
+"""
+
+import json
+import tempfile
+import timeit
+from pathlib import Path
+
+from bench.store_memory import make_store_json
+from graphite_shim.binary_store import BinaryStoreReader
+from graphite_shim.branch_tree import BranchTree
+from graphite_shim.config import StoreFormat
+from graphite_shim.store import BINARY_STORE_FILE, STORE_FILE, StoreManager
+
+REPEAT = 5
+
+
+def time_it(func: object) -> float:
+    """Get the best time of a few runs, in milliseconds."""
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1000  # type: ignore[arg-type]
+
+
+def main() -> None:
+    print(f"{'branches':>10} {'format':>8} {'size':>10} {'save':>10} {'load':>10} {'lookup':>10}")
+    for num_branches in [1_000, 10_000, 100_000]:
+        store = BranchTree.deserialize(json.loads(make_store_json(num_branches=num_branches)))
+        branch = f"user/feature-{num_branches // 2}"
+
+        for format in StoreFormat:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                store_dir = Path(tmpdir)
+                (store_dir / ".graphite_shim").mkdir()
+
+                save_ms = time_it(lambda: StoreManager.save(store, store_dir=store_dir, format=format))  # noqa: B023
+                load_ms = time_it(lambda: StoreManager.load(store_dir=store_dir))  # noqa: B023
+
+                # Look up one branch without loading the whole store
+                match format:
+                    case StoreFormat.JSON:
+                        store_file = store_dir / STORE_FILE
+                        lookup_ms = time_it(lambda: json.loads(store_file.read_text())["branches"][branch])  # noqa: B023
+                    case StoreFormat.BINARY:
+                        store_file = store_dir / BINARY_STORE_FILE
+                        lookup_ms = time_it(lambda: BinaryStoreReader.open(store_file)[branch])  # noqa: B023
+
+                size_kb = store_file.stat().st_size / 1024
+                print(
+                    f"{num_branches:>10} {format:>8} {size_kb:>8.0f}KB"
+                    f" {save_ms:>8.1f}ms {load_ms:>8.1f}ms {lookup_ms:>8.2f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Measure the memory used by a loaded store.
+
+Usage: PYTHONPATH=. python -m bench.store_memory
+"""
+
+import hashlib
+import json
+import tracemalloc
+
+from graphite_shim.branch_tree import BranchTree
+
+
+def make_store_json(*, num_branches: int, stack_depth: int = 5) -> str:
+    """Make the contents of a store.json file."""
+    branches = {}
+    for i in range(num_branches):
+        parent = "main" if i % stack_depth == 0 else f"user/feature-{i - 1}"
+        branches[f"user/feature-{i}"] = {
+            "name": parent,
+            "last_commit": hashlib.sha1(parent.encode()).hexdigest(),
+        }
+    return json.dumps({"trunk": "main", "branches": branches})
+
+
+def main() -> None:
+    print(f"{'branches':>10} {'total':>12} {'per branch':>12}")
+    for num_branches in [1_000, 10_000, 100_000]:
+        store_json = make_store_json(num_branches=num_branches)
+
+        tracemalloc.start()
+        data = json.loads(store_json)
+        store = BranchTree.deserialize(data)
+        store.get_branches()  # build all BranchInfos
+        del data
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{num_branches:>10} {size / 1024:>10.0f}KB {size / num_branches:>11.0f}B")
+        del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Time common commands end to end against a generated repo with many stacks
+and a long trunk history, optionally saving the results as JSON and
+comparing them against a saved baseline.
+
+Commands that change the repo run against a fresh copy each time.
+
+Usage: PYTHONPATH=. python -m bench.suite [--stacks N] [--stack-depth N] [--trunk-commits N]
+           [--runs N] [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from bench.utils.repo import LargeRepoSpec, configure_shim, git, make_large_repo, run_gt
+from graphite_shim.commands.log import Graph
+from graphite_shim.git import GitClient
+from graphite_shim.store import StoreManager
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class Scenario:
+    name: str
+    # Run the command in the given repo, returning the wall time in milliseconds
+    run: Callable[[Path], float]
+    # Untimed setup before each run, if any
+    setup: Callable[[Path], None] | None = None
+    # Whether the command changes the repo, so each run needs a fresh copy
+    mutates: bool = False
+
+
+def get_scenarios() -> list[Scenario]:
+    return [
+        Scenario(name="log short", run=lambda repo: run_gt(repo, ["log", "short"])),
+        Scenario(name="select-branch graph", run=time_build_graph),
+        Scenario(name="restack (up to date)", run=lambda repo: run_gt(repo, ["restack"])),
+        Scenario(name="restack", run=lambda repo: run_gt(repo, ["restack"]), setup=move_trunk, mutates=True),
+        Scenario(name="submit --stack", run=lambda repo: run_gt(repo, ["submit", "--stack"]), mutates=True),
+        Scenario(name="sync", run=lambda repo: run_gt(repo, ["sync"]), mutates=True),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stacks", type=int, default=20)
+    parser.add_argument("--stack-depth", type=int, default=5)
+    parser.add_argument("--trunk-commits", type=int, default=1000)
+    parser.add_argument("--upstream-commits", type=int, default=20)
+    parser.add_argument("--merged-stacks", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", action="append", help="Only run the given scenario(s)")
+    parser.add_argument("--output", type=Path, help="Save the results to this file")
+    parser.add_argument("--baseline", type=Path, help="Compare the results to these saved results")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    spec = LargeRepoSpec(
+        num_stacks=args.stacks,
+        stack_depth=args.stack_depth,
+        trunk_commits=args.trunk_commits,
+        upstream_commits=args.upstream_commits,
+        merged_stacks=min(args.merged_stacks, args.stacks - 1),
+    )
+    scenarios = [scenario for scenario in get_scenarios() if not args.only or scenario.name in args.only]
+
+    results: dict[str, dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        template = Path(tmpdir) / "template"
+        start = time.perf_counter()
+        repo, parents = make_large_repo(template, spec)
+        configure_shim(repo, parents=parents)
+        print(f"Generated {len(parents)} branches in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'scenario':<24} {'median':>10} {'min':>10}")
+        for scenario in scenarios:
+            times = [run_scenario(scenario, template=template, tmpdir=Path(tmpdir)) for _ in range(args.runs)]
+            results[scenario.name] = {"median_ms": statistics.median(times), "min_ms": min(times), "times_ms": times}
+            print(f"{scenario.name:<24} {statistics.median(times):>8.1f}ms {min(times):>8.1f}ms")
+
+    data = {
+        "spec": dataclasses.asdict(spec),
+        "git_version": subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip(),
+        "python_version": sys.version.split()[0],
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(data, indent=2) + "\n")
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if not compare(baseline, data, threshold=args.threshold):
+            sys.exit(1)
+
+
+def run_scenario(scenario: Scenario, *, template: Path, tmpdir: Path) -> float:
+    if not scenario.mutates:
+        repo = template / "work"
+        if scenario.setup:
+            scenario.setup(repo)
+        return scenario.run(repo)
+
+    copy = tmpdir / "copy"
+    shutil.rmtree(copy, ignore_errors=True)
+    shutil.copytree(template, copy, symlinks=True)
+    repo = copy / "work"
+    if scenario.setup:
+        scenario.setup(repo)
+    return scenario.run(repo)
+
+
+def move_trunk(repo: Path) -> None:
+    """Fast-forward trunk to the remote's, without restacking anything."""
+    git(repo, "fetch", "--quiet")
+    git(repo, "update-ref", "refs/heads/main", "refs/remotes/origin/main")
+
+
+def time_build_graph(repo: Path) -> float:
+    """Time building the graph `gt select-branch` shows, in process, from a fresh store + GitClient."""
+    start = time.perf_counter()
+    store = StoreManager.load(store_dir=repo / ".git")
+    with contextlib.closing(GitClient(cwd=repo)) as git_client:
+        graph = Graph.build("main", curr_branch=git_client.get_curr_branch(), store=store, git=git_client)
+        list(graph.branch_lines())
+        list(graph.untracked_branch_lines())
+    return (time.perf_counter() - start) * 1000
+
+
+def compare(baseline: dict[str, Any], data: dict[str, Any], *, threshold: float) -> bool:
+    """Print how the results compare to the baseline, returning False if anything regressed."""
+    if baseline["spec"] != data["spec"]:
+        print(f"\nWARNING: baseline was run with a different repo: {baseline['spec']}")
+
+    print(f"\n{'scenario':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = []
+    for name, result in data["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median_ms"]
+        after = result["median_ms"]
+        change = after / before - 1
+        if change > threshold:
+            status = "  REGRESSED"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "  improved"
+        else:
+            status = ""
+        print(f"{name:<24} {before:>8.1f}ms {after:>8.1f}ms {change:>+7.0%}{status}")
+
+    return len(regressions) == 0
+
+
+if __name__ == "__main__":
+    main()
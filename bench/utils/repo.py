@@ -0,0 +1,240 @@
+"""
+Helpers for generating real git repos to benchmark against.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Generator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from graphite_shim.branch_tree import BranchTree, ParentInfo
+from graphite_shim.config import Config, ConfigManager
+from graphite_shim.store import StoreManager
+
+PACKAGE_ROOT = Path(__file__).parent.parent.parent
+
+
+def git(repo: Path, *args: str) -> str:
+    proc = subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True)
+    return proc.stdout.strip()
+
+
+def init_repo(repo: Path, *, trunk: str = "main") -> None:
+    repo.mkdir(parents=True, exist_ok=True)
+    git(repo, "init", "--quiet", f"--initial-branch={trunk}")
+    git(repo, "config", "user.name", "bench")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "commit.gpgsign", "false")
+    commit(repo, "init")
+
+
+def commit(repo: Path, name: str) -> str:
+    (repo / f"{name}.txt").write_text(f"{name}\n")
+    git(repo, "add", f"{name}.txt")
+    git(repo, "commit", "--quiet", "--message", name)
+    return git(repo, "rev-parse", "HEAD")
+
+
+def make_stack(repo: Path, branches: Sequence[str], *, base: str) -> dict[str, str]:
+    """Create a stack of branches on top of `base`, returning a map of branch to parent."""
+    parents = {}
+    parent = base
+    for branch in branches:
+        git(repo, "switch", "--quiet", "--create", branch, parent)
+        commit(repo, branch)
+        parents[branch] = parent
+        parent = branch
+    return parents
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class LargeRepoSpec:
+    num_stacks: int
+    stack_depth: int
+    # commits on trunk before the stacks were created
+    trunk_commits: int
+    # commits pushed to the remote's trunk since the stacks were created
+    upstream_commits: int
+    # stacks that have since been merged into the remote's trunk
+    merged_stacks: int
+
+
+def make_large_repo(root: Path, spec: LargeRepoSpec, *, trunk: str = "main") -> tuple[Path, dict[str, str]]:
+    """
+    Generate a repo in `root/work` with the given stacks off of trunk, and
+    a bare remote in `root/remote.git` whose trunk has moved on, so `gt sync`
+    has branches to restack and clean up. The remote is configured with a
+    relative path, so `root` can be copied.
+
+    Commits are written with `git fast-import`, which is much faster than
+    committing one by one. Returns the repo, plus a map of branch to parent.
+    Branch `stack-0/branch-<depth - 1>` is checked out.
+    """
+    assert spec.trunk_commits > 0, "trunk needs at least one commit"
+    repo = root / "work"
+    repo.mkdir(parents=True)
+    git(repo, "init", "--quiet", f"--initial-branch={trunk}")
+    git(repo, "config", "user.name", "bench")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "commit.gpgsign", "false")
+
+    stream = _FastImportStream()
+    trunk_mark = 0
+    for i in range(spec.trunk_commits):
+        trunk_mark = stream.commit(
+            f"refs/heads/{trunk}",
+            message=f"trunk {i}",
+            parent=trunk_mark or None,
+            files={f"trunk/{i % 100}.txt": f"{i}\n"},
+        )
+
+    parents = {}
+    # stack => (mark of the top branch, files in the stack)
+    stacks: list[tuple[int, dict[str, str]]] = []
+    for stack in range(spec.num_stacks):
+        mark = trunk_mark
+        parent = trunk
+        files: dict[str, str] = {}
+        for depth in range(spec.stack_depth):
+            branch = f"stack-{stack}/branch-{depth}"
+            new_files = {f"stacks/{stack}/{depth}.txt": f"{branch}\n"}
+            mark = stream.commit(f"refs/heads/{branch}", message=branch, parent=mark, files=new_files)
+            files |= new_files
+            parents[branch] = parent
+            parent = branch
+        stacks.append((mark, files))
+
+    upstream_ref = "refs/heads/bench-upstream"
+    upstream_mark = trunk_mark
+    for i in range(spec.upstream_commits):
+        upstream_mark = stream.commit(
+            upstream_ref,
+            message=f"upstream {i}",
+            parent=upstream_mark,
+            files={f"trunk/upstream-{i}.txt": f"{i}\n"},
+        )
+    # merge the last stacks, so the checked out stack isn't merged
+    for stack, (mark, files) in list(enumerate(stacks))[len(stacks) - spec.merged_stacks :]:
+        upstream_mark = stream.commit(
+            upstream_ref,
+            message=f"Merge stack {stack}",
+            parent=upstream_mark,
+            merge=mark,
+            files=files,
+        )
+
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=repo, input=stream.getvalue(), check=True)
+
+    remote = root / "remote.git"
+    git(root, "init", "--quiet", "--bare", f"--initial-branch={trunk}", remote.as_posix())
+    git(repo, "remote", "add", "origin", "../remote.git")
+    git(repo, "push", "--quiet", "origin", f"{upstream_ref}:refs/heads/{trunk}")
+    git(repo, "update-ref", f"refs/remotes/origin/{trunk}", f"refs/heads/{trunk}")
+    git(repo, "update-ref", "-d", upstream_ref)
+
+    git(repo, "reset", "--quiet", "--hard")
+    git(repo, "switch", "--quiet", f"stack-0/branch-{spec.stack_depth - 1}")
+    return repo, parents
+
+
+class _FastImportStream:
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._num_marks = 0
+
+    def commit(
+        self,
+        ref: str,
+        *,
+        message: str,
+        parent: int | None,
+        files: Mapping[str, str],
+        merge: int | None = None,
+    ) -> int:
+        """Add a commit with the given changes to its parent, returning its mark."""
+        self._num_marks += 1
+        lines = [
+            f"commit {ref}",
+            f"mark :{self._num_marks}",
+            f"committer bench <bench@example.com> {1_700_000_000 + self._num_marks} +0000",
+        ]
+        self._chunks.append("\n".join(lines).encode() + b"\n")
+        self._data(message)
+        if parent is not None:
+            self._chunks.append(f"from :{parent}\n".encode())
+        if merge is not None:
+            self._chunks.append(f"merge :{merge}\n".encode())
+        for path, content in files.items():
+            self._chunks.append(f"M 644 inline {path}\n".encode())
+            self._data(content)
+        return self._num_marks
+
+    def _data(self, content: str) -> None:
+        data = content.encode()
+        self._chunks.append(f"data {len(data)}\n".encode() + data + b"\n")
+
+    def getvalue(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+def configure_shim(repo: Path, *, trunk: str = "main", parents: Mapping[str, str]) -> Config:
+    """Configure graphite_shim in the given repo, tracking the given branches."""
+    git_dir = repo / ".git"
+    config = Config(config_dir=git_dir, trunk=trunk)
+    (git_dir / ".graphite_shim").mkdir(exist_ok=True)
+    ConfigManager.save(config, config_dir=git_dir)
+
+    shas = dict(zip(parents.values(), git(repo, "rev-parse", *parents.values()).splitlines(), strict=True))
+    store = BranchTree(
+        trunk=trunk,
+        parent_map={branch: ParentInfo(name=parent, last_commit=shas[parent]) for branch, parent in parents.items()},
+    )
+    StoreManager.save(store, store_dir=git_dir, format=config.store_format)
+    return config
+
+
+def run_gt(repo: Path, args: list[str]) -> float:
+    """Run gt, returning the wall time in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "graphite_shim", *args],
+        cwd=repo,
+        env=get_env(),
+        check=True,
+        capture_output=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def get_env() -> dict[str, str]:
+    return {**os.environ, "PYTHONPATH": str(PACKAGE_ROOT)}
+
+
+class ForkCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+
+@contextlib.contextmanager
+def count_forks() -> Generator[ForkCounter]:
+    """Count the number of processes spawned with the subprocess module."""
+    counter = ForkCounter()
+    orig_popen = subprocess.Popen
+
+    class CountingPopen(orig_popen):  # type: ignore[valid-type,misc]
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            counter.count += 1
+            super().__init__(*args, **kwargs)
+
+    subprocess.Popen = CountingPopen  # type: ignore[misc]
+    try:
+        yield counter
+    finally:
+        subprocess.Popen = orig_popen  # type: ignore[misc]
@@ -2,22 +2,23 @@
 A minimal implementation of the Graphite CLI.
 """
 
-import argparse
 import contextlib
 import os
 import sys
 import traceback
 import typing
-from collections.abc import Generator
+from collections.abc import Callable, Generator, Mapping, Sequence
 from pathlib import Path
+from typing import Any
 
-from graphite_shim.cache_only import CacheOnlyRunner
-from graphite_shim.commands import get_all_commands
+from graphite_shim import profiling
+from graphite_shim.commands import CommandInfo, get_all_commands
+from graphite_shim.commands.base import Command
 from graphite_shim.config import Config, ConfigManager, UseGraphiteConfig
 from graphite_shim.exception import UserError
 from graphite_shim.find_graphite import find_graphite
 from graphite_shim.git import GitClient, GitClientError
-from graphite_shim.store import StoreManager
+from graphite_shim.store import StoreCache, StoreManager
 from graphite_shim.utils.term import Prompter, print, printerr
 
 
@@ -41,6 +42,17 @@ def handle_errors() -> Generator[None, None, None]:
 
 @handle_errors()
 def main() -> None:
+    with contextlib.closing(GitClient(cwd=Path.cwd())) as git:
+        run(git=git)
+
+
+def run(
+    *, git: GitClient, config: Config | UseGraphiteConfig | None = None, store_cache: StoreCache | None = None
+) -> None:
+    """
+    Run the command in sys.argv. The daemon (see graphite_shim/daemon.py)
+    calls this directly, passing in state it keeps between commands.
+    """
     argv = sys.argv.copy()
     try:
         no_interactive_index = argv.index("--no-interactive")
@@ -49,8 +61,22 @@ def main() -> None:
     except ValueError:
         prompter = Prompter()
 
-    git = GitClient(cwd=Path.cwd())
-    config = ConfigManager.load(config_dir=git.git_common_dir)
+    profile = pop_global_flag(argv, "--profile")
+
+    with profiling.profiling(enabled=profile):
+        _run(argv, prompter=prompter, git=git, config=config, store_cache=store_cache)
+
+
+def _run(
+    argv: list[str],
+    *,
+    prompter: Prompter | None,
+    git: GitClient,
+    config: Config | UseGraphiteConfig | None,
+    store_cache: StoreCache | None,
+) -> None:
+    if config is None:
+        config = ConfigManager.load(config_dir=git.git_common_dir)
     if config is None:
         if prompter is None:
             raise UserError("gt not configured")
@@ -60,7 +86,7 @@ def main() -> None:
         ConfigManager.save(config, config_dir=git.git_common_dir)
         if isinstance(config, Config):
             store = StoreManager.new(config=config)
-            StoreManager.save(store, store_dir=git.git_common_dir)
+            StoreManager.save(store, store_dir=git.git_common_dir, format=config.store_format)
         print("")
         print("@(green)graphite_shim configured!")
         print("~" * 80)
@@ -68,36 +94,97 @@ def main() -> None:
     match config:
         case UseGraphiteConfig():
             if os.environ.get("CACHE_ONLY", "").lower() == "true":
-                run_cache_only(argv, git=git)
+                run_cache_only(argv, prompter=prompter, git=git)
                 return
 
             graphite = find_graphite()
             if graphite is None:
                 raise UserError("`gt` is not installed!")
-            os.execvp(graphite, sys.argv)
+            graphite_argv = sys.argv.copy()
+            pop_global_flag(graphite_argv, "--profile")
+            os.execvp(graphite, graphite_argv)
         case Config():
-            run_shim(argv, prompter=prompter, git=git, config=config)
+            run_shim(argv, prompter=prompter, git=git, config=config, store_cache=store_cache)
         case _:
             typing.assert_never(config)
 
 
-def run_shim(argv: list[str], *, prompter: Prompter | None, git: GitClient, config: Config) -> None:
-    store = StoreManager.load(store_dir=git.git_common_dir)
+def run_shim(
+    argv: list[str],
+    *,
+    prompter: Prompter | None,
+    git: GitClient,
+    config: Config,
+    store_cache: StoreCache | None = None,
+) -> None:
+    with profiling.span("load store"):
+        if store_cache is not None:
+            store = store_cache.load(store_dir=git.git_common_dir)
+        else:
+            store = StoreManager.load(store_dir=git.git_common_dir)
+
+    # Ignore manually-parsed flags
+    with contextlib.suppress(ValueError):
+        argv.pop(argv.index("--color"))
+
+    def init_cmd(cmd_info: CommandInfo) -> Command[Any]:
+        return cmd_info.load()(prompter=prompter, git=git, config=config, store=store)
+
+    with profiling.span("parse args"):
+        parsed = fast_parse_args(argv[1:], init_cmd=init_cmd)
+        if parsed is None:
+            parsed = parse_args(argv[1:], aliases=config.aliases, init_cmd=init_cmd)
+
+    cmd, cmd_args = parsed
+    with profiling.span(f"run {type(cmd).__name__}"):
+        cmd.run(cmd_args)
+    with profiling.span("save store"):
+        StoreManager.save(store, store_dir=git.git_common_dir, format=config.store_format)
+
+
+def fast_parse_args(
+    args: list[str],
+    *,
+    init_cmd: Callable[[CommandInfo], Command[Any]],
+) -> tuple[Command[Any], Any] | None:
+    """
+    Parse simple invocations of commands that are run very often (e.g. `gt parent`
+    in a shell prompt) without argparse, returning None if it's not simple.
+    """
+    if len(args) == 0 or (cmd_info := get_all_commands().get(args[0])) is None:
+        return None
+    cmd = init_cmd(cmd_info)
+    cmd_args = cmd.fast_parse(args[1:])
+    return (cmd, cmd_args) if cmd_args is not None else None
+
+
+def parse_args(
+    args: list[str],
+    *,
+    aliases: Mapping[str, Sequence[str]],
+    init_cmd: Callable[[CommandInfo], Command[Any]],
+) -> tuple[Command[Any], Any]:
+    # argparse is slow to import, so only import it when needed
+    import argparse
+
+    # Only import + set up arguments for the command being run, to keep startup fast
+    cmd_name = get_command_name(args, aliases=aliases)
 
     parser = argparse.ArgumentParser(prog="gt", description=__doc__)
     subparsers = parser.add_subparsers(title="commands", required=True, metavar="command")
-    for name, cmd_cls in get_all_commands().items():
-        cmd = cmd_cls(prompter=prompter, git=git, config=config, store=store)
+    for name, cmd_info in get_all_commands().items():
         cmd_parser = subparsers.add_parser(
             name,
-            help=cmd.__doc__,
-            description=cmd.__doc__,
+            help=cmd_info.doc,
+            description=cmd_info.doc,
         )
-        args_parser = cmd.add_args(cmd_parser)
-        cmd_parser.set_defaults(cmd=cmd, parse_args=args_parser)
+        if name == cmd_name:
+            cmd = init_cmd(cmd_info)
+            args_parser = cmd.add_args(cmd_parser)
+            cmd_parser.set_defaults(cmd=cmd, parse_args=args_parser)
 
     # add aliases
-    for alias, alias_args in config.aliases.items():
+    for alias, alias_args in aliases.items():
         description = f"Alias for `{' '.join(alias_args)}`"
         alias_parser = subparsers.add_parser(
             alias,
@@ -106,30 +193,53 @@ def run_shim(argv: list[str], *, prompter: Prompter | None, git: GitClient, conf
         )
         alias_parser.set_defaults(alias_args=alias_args)
 
-    def parse_args(args: list[str]) -> argparse.Namespace:
+    def parse(args: list[str]) -> argparse.Namespace:
         ns, extra_args = parser.parse_known_args(args)
         if hasattr(ns, "alias_args"):
-            return parse_args(ns.alias_args + extra_args)
+            return parse(ns.alias_args + extra_args)
         elif len(extra_args) > 0:
             # Parse again with parse_args to get proper error
             parser.parse_args(args)
             raise AssertionError("parse_args did not error")
         return ns
 
-    # Ignore manually-parsed flags
-    with contextlib.suppress(ValueError):
-        argv.pop(argv.index("--color"))
-
-    args = parse_args(argv[1:])
-    if not hasattr(args, "cmd"):
+    ns = parse(args)
+    if not hasattr(ns, "cmd"):
         parser.error("No command provided")
 
-    cmd_args = args.parse_args(args)
-    args.cmd.run(cmd_args)
-    StoreManager.save(store, store_dir=git.git_common_dir)
+    return ns.cmd, ns.parse_args(ns)
 
 
-def run_cache_only(argv: list[str], *, git: GitClient) -> None:
+def pop_global_flag(argv: list[str], flag: str) -> bool:
+    """
+    Remove the given flag from argv if it comes before the command name,
+    returning whether it was found. Anything after the command name could be
+    an argument's value, e.g. `gt create -m --profile`.
+    """
+    for i, arg in enumerate(argv[1:], start=1):
+        if arg == flag:
+            argv.pop(i)
+            return True
+        if arg == "--" or not arg.startswith("-"):
+            break
+    return False
+
+
+def get_command_name(args: Sequence[str], *, aliases: Mapping[str, Sequence[str]]) -> str | None:
+    """Get the name of the command that will be run, resolving aliases."""
+    seen_aliases = set()
+    while True:
+        i = next((i for i, arg in enumerate(args) if not arg.startswith("-")), None)
+        if i is None:
+            return None
+        name = args[i]
+        if name not in aliases or name in seen_aliases:
+            return name
+        seen_aliases.add(name)
+        args = [*aliases[name], *args[i + 1 :]]
+
+
+def run_cache_only(argv: list[str], *, prompter: Prompter | None, git: GitClient) -> None:
     """
     Run a subset of graphite commands using only the Graphite cache.
 
@@ -137,27 +247,34 @@ def run_cache_only(argv: list[str], *, git: GitClient) -> None:
     But in cases where performance matters, we want to only use local cached
     data.
     """
+    import argparse
+
+    from graphite_shim.cache_only import CacheOnlyRunner
+
     runner = CacheOnlyRunner(
         graphite_cache_dir=git.git_common_dir,
-        curr_branch=git.get_curr_branch(),
+        git=git,
+        prompter=prompter,
     )
 
     parser = argparse.ArgumentParser(prog="gt", description=__doc__)
     subparsers = parser.add_subparsers(title="commands", required=True, metavar="command")
 
     cmds = runner.get_commands()
-    for cmd, func in cmds.items():
-        subparsers.add_parser(cmd).set_defaults(func=func)
+    for name, cmd in cmds.items():
+        cmd_parser = subparsers.add_parser(name)
+        cmd.add_args(cmd_parser)
+        cmd_parser.set_defaults(func=cmd.run)
 
     # Show nicer error message on invalid command
     match argv:
-        case [_, cmd, *_] if cmd not in cmds:
-            subparsers.add_parser(cmd).set_defaults(
-                func=lambda: parser.error(f"Graphite command not supported with CACHE_ONLY: {cmd}")
+        case [_, cmd_name, *_] if cmd_name not in cmds:
+            subparsers.add_parser(cmd_name).set_defaults(
+                func=lambda _: parser.error(f"Graphite command not supported with CACHE_ONLY: {cmd_name}")
             )
 
     args = parser.parse_args(argv[1:])
-    args.func()
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""
+A compact binary encoding of the store, as an alternative to store.json.
+
+Layout (little-endian):
+
+    header:  magic, version, commit size, branch count, string table size, trunk name
+    records: one fixed-width record per branch, sorted by branch name:
+             (name offset, name length, parent offset, parent length, parent commit)
+    order:   record indexes in topological order, to preserve children order
+    strings: UTF-8 string table, each branch/parent name stored once
+
+Lookups binary search the records, so a single branch can be decoded
+without decoding the rest of the file.
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from collections.abc import ItemsView, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+from graphite_shim.branch_tree import ParentInfo
+
+MAGIC = b"GTSB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBBxxIIII")
+ORDER = struct.Struct("<I")
+
+
+def _record_struct(commit_size: int) -> struct.Struct:
+    return struct.Struct(f"<IHIH{commit_size}s")
+
+
+def encode(data: dict[str, Any]) -> bytes:
+    """
+    Encode serialized store data (see BranchTree.serialize).
+
+    Raises ValueError if the commits can't be stored as fixed-width binary
+    (e.g. if they aren't all full SHA-1 or SHA-256 hashes).
+    """
+    branches: dict[str, dict[str, str]] = data["branches"]
+    commit_lens = {len(parent["last_commit"]) for parent in branches.values()}
+    if not commit_lens <= {40, 64} or len(commit_lens) > 1:
+        raise ValueError("Commits must all be full SHA-1 or SHA-256 hashes")
+    commit_size = commit_lens.pop() // 2 if commit_lens else 20
+
+    strings = bytearray()
+    string_refs: dict[str, tuple[int, int]] = {}
+
+    def add_string(s: str) -> tuple[int, int]:
+        if s not in string_refs:
+            encoded = s.encode()
+            string_refs[s] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return string_refs[s]
+
+    trunk_ref = add_string(data["trunk"])
+    record_struct = _record_struct(commit_size)
+    sorted_names = sorted(branches, key=str.encode)
+    records = b"".join(
+        record_struct.pack(
+            *add_string(name),
+            *add_string(branches[name]["name"]),
+            bytes.fromhex(branches[name]["last_commit"]),
+        )
+        for name in sorted_names
+    )
+
+    record_indexes = {name: i for i, name in enumerate(sorted_names)}
+    order = b"".join(ORDER.pack(record_indexes[name]) for name in branches)
+
+    header = HEADER.pack(MAGIC, VERSION, commit_size, len(branches), len(strings), *trunk_ref)
+    return b"".join([header, records, order, strings])
+
+
+class BinaryStoreReader(Mapping[str, ParentInfo]):
+    """A lazily-decoded view of an encoded store, mapping branches to their parents."""
+
+    def __init__(self, buf: bytes | mmap.mmap) -> None:
+        if len(buf) < HEADER.size:
+            raise ValueError("Not a graphite_shim binary store")
+        magic, version, commit_size, num_branches, strings_size, trunk_offset, trunk_len = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a graphite_shim binary store")
+
+        self._buf = memoryview(buf)
+        self._num_branches: int = num_branches
+        self._record_struct = _record_struct(commit_size)
+
+        self._records_start = HEADER.size
+        self._order_start = self._records_start + num_branches * self._record_struct.size
+        self._strings_start = self._order_start + num_branches * ORDER.size
+        if self._strings_start + strings_size != len(buf):
+            raise ValueError("Binary store is truncated")
+
+        self.trunk = self._get_string(trunk_offset, trunk_len)
+
+    @classmethod
+    def open(cls, path: Path) -> BinaryStoreReader:
+        with path.open("rb") as f:
+            # mmap can't map empty files; let the header check fail instead
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if path.stat().st_size > 0 else b""
+        return cls(buf)
+
+    def __len__(self) -> int:
+        return self._num_branches
+
+    def __iter__(self) -> Iterator[str]:
+        for name, _ in self._iter_items():
+            yield name
+
+    def __getitem__(self, branch: str) -> ParentInfo:
+        target = branch.encode()
+        lo, hi = 0, self._num_branches
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name_offset, name_len, *_ = self._record_struct.unpack_from(self._buf, self._record_offset(mid))
+            name = self._get_bytes(name_offset, name_len)
+            if name == target:
+                return self._decode_record(mid)[1]
+            elif name < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        raise KeyError(branch)
+
+    def items(self) -> _ItemsView:
+        return _ItemsView(self)
+
+    def _iter_items(self) -> Iterator[tuple[str, ParentInfo]]:
+        """Decode all records, in topological order."""
+        strings = bytes(self._buf[self._strings_start :])
+        # most names appear twice (as a branch and as a parent), so only decode them once
+        decoded: dict[int, str] = {}
+
+        def get_string(offset: int, length: int) -> str:
+            if (s := decoded.get(offset)) is None:
+                s = decoded[offset] = sys.intern(strings[offset : offset + length].decode())
+            return s
+
+        records_buf = self._buf[self._records_start : self._order_start]
+        items = [
+            (
+                get_string(name_offset, name_len),
+                ParentInfo(name=get_string(parent_offset, parent_len), last_commit=sys.intern(commit.hex())),
+            )
+            for name_offset, name_len, parent_offset, parent_len, commit in self._record_struct.iter_unpack(records_buf)
+        ]
+
+        order_buf = self._buf[self._order_start : self._strings_start]
+        for (index,) in ORDER.iter_unpack(order_buf):
+            yield items[index]
+
+    def _decode_record(self, index: int) -> tuple[str, ParentInfo]:
+        name_offset, name_len, parent_offset, parent_len, commit = self._record_struct.unpack_from(
+            self._buf, self._record_offset(index)
+        )
+        parent = ParentInfo(
+            name=self._get_string(parent_offset, parent_len),
+            last_commit=sys.intern(commit.hex()),
+        )
+        return self._get_string(name_offset, name_len), parent
+
+    def _record_offset(self, index: int) -> int:
+        return self._records_start + index * self._record_struct.size
+
+    def _get_bytes(self, offset: int, length: int) -> bytes:
+        start = self._strings_start + offset
+        return bytes(self._buf[start : start + length])
+
+    def _get_string(self, offset: int, length: int) -> str:
+        return sys.intern(self._get_bytes(offset, length).decode())
+
+
+class _ItemsView(ItemsView[str, ParentInfo]):
+    """Iterate items in one pass, instead of a binary search per key."""
+
+    _mapping: BinaryStoreReader
+
+    def __iter__(self) -> Iterator[tuple[str, ParentInfo]]:
+        return self._mapping._iter_items()
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import abc
-import contextlib
 import dataclasses
-import functools
 import itertools
+import sys
 from collections import defaultdict
 from collections.abc import Iterator, Mapping, Sequence
 from pathlib import Path
@@ -21,36 +20,48 @@ class BranchTree:
         parent_map: Mapping[str, ParentInfo] = {},
     ) -> None:
         self._trunk = trunk
-        self._parent_map_unsafe = parent_map
-
-    @property
-    def _parent_map(self) -> Mapping[str, ParentInfo]:
-        return self._parent_map_unsafe
-
-    @_parent_map.setter
-    def _parent_map(self, parent_map: Mapping[str, ParentInfo]) -> None:
-        self._parent_map_unsafe = parent_map
-        with contextlib.suppress(AttributeError):
-            del self._branch_infos  # clear cache
-
-    @functools.cached_property
-    def _branch_infos(self) -> Mapping[str, BranchInfo]:
-        children_map = defaultdict(list)
-        for branch, parent in self._parent_map.items():
-            children_map[parent.name].append(branch)
-        return {
-            self._trunk: TrunkBranchInfo(
-                name=self._trunk,
-                children=children_map[self._trunk],
-            ),
-        } | {
-            branch: NonTrunkBranchInfo(
-                name=branch,
-                parent=parent,
-                children=children_map[branch],
-            )
-            for branch, parent in self._parent_map.items()
-        }
+        self._parents: dict[str, ParentInfo] = {}
+        # parent => children, as an ordered set
+        self._children: defaultdict[str, dict[str, None]] = defaultdict(dict)
+        # BranchInfos are built lazily, and evicted when a mutation affects them
+        self._branch_infos: dict[str, BranchInfo] = {}
+        # Built lazily, and cleared when the shape of the tree changes
+        self._tour: EulerTour | None = None
+        # Mutations since the tree was loaded or last saved, see `pending_ops`
+        self._pending_ops: list[dict[str, Any]] = []
+
+        for branch, parent in parent_map.items():
+            self._parents[branch] = parent
+            self._children[parent.name][branch] = None
+
+    def _get_branch_info(self, branch: str) -> BranchInfo:
+        """Get the info for the given branch, raising KeyError if it doesn't exist."""
+        if cached_info := self._branch_infos.get(branch):
+            return cached_info
+
+        info: BranchInfo
+        children = tuple(self._children.get(branch, {}))
+        if branch == self._trunk:
+            info = TrunkBranchInfo(name=branch, children=children)
+        else:
+            info = NonTrunkBranchInfo(name=branch, parent=self._parents[branch], children=children)
+        self._branch_infos[branch] = info
+        return info
+
+    def _invalidate(self, *branches: str, reshaped: bool = True) -> None:
+        for branch in branches:
+            self._branch_infos.pop(branch, None)
+        if reshaped:
+            self._tour = None
+
+    def _get_roots(self) -> list[str]:
+        """Get the trunk, plus any untracked branches that tracked branches are stacked on."""
+        return [self._trunk, *(parent for parent in self._children if parent not in self._parents)]
+
+    def _get_tour(self) -> EulerTour:
+        if self._tour is None:
+            self._tour = EulerTour.build(self._get_roots(), children=self._children)
+        return self._tour
 
     # ----- Serialization ---- #
 
@@ -58,92 +69,195 @@ class BranchTree:
     def deserialize(cls, data: dict[str, Any]) -> Self:
         return cls(
             trunk=data["trunk"],
-            parent_map={k: ParentInfo.deserialize(v) for k, v in data["branches"].items()},
+            parent_map={sys.intern(k): ParentInfo.deserialize(v) for k, v in data["branches"].items()},
         )
 
     def serialize(self) -> dict[str, Any]:
         return {
             "trunk": self._trunk,
-            "branches": {k: v.serialize() for k, v in self._parent_map_unsafe.items()},
+            "branches": {k: self._parents[k].serialize() for k in self._iter_topological()},
         }
 
+    def _iter_topological(self) -> Iterator[str]:
+        """
+        Iterate over all non-trunk branches, parents before children, and
+        children in order. Deserializing branches in this order preserves
+        the order of each branch's children.
+        """
+        stack = list(reversed(self._get_roots()))
+        seen = set()
+        while stack:
+            branch = stack.pop()
+            if branch in seen:
+                continue
+            seen.add(branch)
+            if branch in self._parents:
+                yield branch
+            stack.extend(reversed(self._children.get(branch, {})))
+
+        # shouldn't happen, but don't lose branches that are in a cycle
+        yield from (branch for branch in self._parents if branch not in seen)
+
+    @property
+    def is_dirty(self) -> bool:
+        """Has the tree been mutated since it was loaded or last saved?"""
+        return len(self._pending_ops) > 0
+
+    @property
+    def pending_ops(self) -> Sequence[dict[str, Any]]:
+        """
+        The mutations since the tree was loaded or last saved, as serialized
+        ops that can be replayed with `apply_op`.
+        """
+        return self._pending_ops
+
+    def mark_clean(self) -> None:
+        self._pending_ops = []
+
+    def apply_op(self, op: dict[str, Any]) -> None:
+        match op["op"]:
+            case "rename_branch":
+                self.rename_branch(from_=op["from"], to=op["to"])
+            case "remove_branch":
+                self.remove_branch(op["branch"])
+            case "set_parent":
+                self.set_parent(op["branch"], parent=ParentInfo.deserialize(op["parent"]))
+            case "update_parent_commit":
+                self.update_parent_commit(op["branch"], commit=op["commit"])
+            case ty:
+                raise ValueError(f"Unknown op: {ty}")
+
     # ----- Public API ---- #
 
     def get_branch(self, branch: str) -> BranchInfo:
         """Get the parent of the given branch."""
         try:
-            return self._branch_infos[branch]
+            return self._get_branch_info(branch)
         except KeyError:
             raise ValueError(f"Branch does not exist: {branch}") from None
 
     def get_branches(self) -> Sequence[BranchInfo]:
         """Get the parent of the given branch."""
-        return list(self._branch_infos.values())
+        return [self._get_branch_info(branch) for branch in [self._trunk, *self._parents]]
 
     def rename_branch(self, *, from_: str, to: str) -> None:
         """Rename the given branch."""
         info = self.get_branch(from_)
         if info.is_trunk:
             return
-        self._parent_map = {to: info.parent} | {
-            # ruff-keep-multiline
-            k: v if v.name != from_ else dataclasses.replace(v, name=to)
-            for k, v in self._parent_map.items()
-            if k != from_
-        }
+
+        parent = self._parents.pop(from_)
+        self._parents[to] = parent
+        siblings = self._children[parent.name]
+        self._children[parent.name] = {to if k == from_ else k: None for k in siblings}
+
+        children = self._children.pop(from_, {})
+        if children:
+            self._children[to].update(children)
+        for child in children:
+            self._parents[child] = dataclasses.replace(self._parents[child], name=to)
+
+        self._invalidate(from_, to, parent.name, *children)
+        self._pending_ops.append({"op": "rename_branch", "from": from_, "to": to})
 
     def remove_branch(self, branch: str) -> None:
         info = self.get_branch(branch)
         if info.is_trunk:
             raise ValueError("Cannot remove trunk branch")
-        self._parent_map = {
-            k: (
-                v
-                if v.name != branch
-                # if the parent is being removed, replace the parent
-                # with the removed branch's parent
-                else dataclasses.replace(v, name=info.parent.name)
-            )
-            for k, v in self._parent_map.items()
-            if k != branch
-        }
+
+        # reparent the removed branch's children onto its parent
+        parent = self._parents.pop(branch)
+        children = self._children.pop(branch, {})
+        for child in children:
+            self._parents[child] = dataclasses.replace(self._parents[child], name=parent.name)
+
+        # move children into the removed branch's position
+        siblings = self._children[parent.name]
+        if children:
+            self._children[parent.name] = {
+                k: None for sibling in siblings for k in (children if sibling == branch else [sibling])
+            }
+        else:
+            del siblings[branch]
+
+        self._invalidate(branch, parent.name, *children)
+        self._pending_ops.append({"op": "remove_branch", "branch": branch})
 
     def set_parent(self, branch: str, *, parent: ParentInfo) -> None:
         """Set the parent of the given branch."""
         if branch == self._trunk:
             raise ValueError("Cannot set the parent of the trunk branch")
-        self._parent_map = {**self._parent_map, branch: parent}
+
+        old_parent = self._parents.get(branch)
+        if old_parent == parent:
+            return
+        self._parents[branch] = parent
+        self._invalidate(branch, reshaped=False)
+
+        if old_parent is None or old_parent.name != parent.name:
+            if old_parent is not None:
+                del self._children[old_parent.name][branch]
+                self._invalidate(old_parent.name)
+            self._children[parent.name][branch] = None
+            self._invalidate(parent.name)
+
+        self._pending_ops.append({"op": "set_parent", "branch": branch, "parent": parent.serialize()})
 
     def update_parent_commit(self, branch: str, *, commit: str) -> None:
         """Update the commit of the parent of the given branch."""
         if branch == self._trunk:
             raise ValueError("Cannot set the parent of the trunk branch")
-        parent = self._parent_map[branch]
-        self._parent_map = {
-            **self._parent_map,
-            branch: dataclasses.replace(parent, last_commit=commit),
-        }
+        parent = self._parents[branch]
+        if parent.last_commit == commit:
+            return
+        self._parents[branch] = dataclasses.replace(parent, last_commit=commit)
+        self._invalidate(branch, reshaped=False)
+        self._pending_ops.append({"op": "update_parent_commit", "branch": branch, "commit": commit})
 
     def get_ancestors(self, branch: str) -> Iterator[BranchInfo]:
         """Get upstream branches, starting from the branch's parent to the trunk."""
-        curr = self._branch_infos[branch]
+        curr = self._get_branch_info(branch)
         while isinstance(curr, NonTrunkBranchInfo):
-            curr = self._branch_infos[curr.parent.name]
+            curr = self._get_branch_info(curr.parent.name)
             yield curr
 
     def get_children(self, branch: str) -> Iterator[BranchInfo]:
         """Get immediate children of the given branch."""
 
-        info = self._branch_infos[branch]
+        info = self._get_branch_info(branch)
         for child in info.children:
-            yield self._branch_infos[child]
+            yield self._get_branch_info(child)
 
     def get_all_descendants(self, branch: str) -> Iterator[BranchInfo]:
         """Get all descendants, in topological order."""
 
-        for child in self.get_children(branch):
+        stack = list(reversed(self._get_branch_info(branch).children))
+        while stack:
+            child = self._get_branch_info(stack.pop())
             yield child
-            yield from self.get_all_descendants(child.name)
+            stack.extend(reversed(child.children))
+
+    def is_ancestor(self, ancestor: str, branch: str) -> bool:
+        """
+        Is `ancestor` an ancestor of (or the same as) `branch`? Like
+        `git merge-base --is-ancestor`, but for the branch tree.
+
+        Returns False if either branch isn't in the tree.
+        """
+        return self._get_tour().is_ancestor(ancestor, branch)
+
+    def lowest_common_ancestor(self, branch1: str, branch2: str) -> BranchInfo | None:
+        """Get the closest branch that both branches are stacked on, if any."""
+        tour = self._get_tour()
+        for branch in [branch1, branch2]:
+            if branch not in tour.first:
+                raise ValueError(f"Branch does not exist: {branch}")
+        lca = tour.lowest_common_ancestor(branch1, branch2)
+        try:
+            return self.get_branch(lca) if lca is not None else None
+        except ValueError:
+            # common ancestor is an untracked branch
+            return None
 
     def get_stack(
         self,
@@ -160,11 +274,11 @@ class BranchTree:
         descendant_branches = self.get_all_descendants(branch) if descendants else []
 
         yield from ancestor_branches
-        yield self._branch_infos[branch]
+        yield self._get_branch_info(branch)
         yield from descendant_branches
 
 
-@dataclasses.dataclass(frozen=True, kw_only=True)
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
 class ParentInfo:
     name: str
     # The commit of the parent we last rebased on top of
@@ -182,9 +296,11 @@ class ParentInfo:
                 last_commit=git.resolve_commit(branch),
             )
 
+        # Intern strings, since names + commits are repeated across branches
+        # (e.g. siblings share the same parent and parent commit)
         return cls(
-            name=data["name"],
-            last_commit=data["last_commit"],
+            name=sys.intern(data["name"]),
+            last_commit=sys.intern(data["last_commit"]),
         )
 
     def serialize(self) -> dict[str, Any]:
@@ -197,19 +313,93 @@ class ParentInfo:
 type BranchInfo = TrunkBranchInfo | NonTrunkBranchInfo
 
 
-@dataclasses.dataclass(frozen=True, kw_only=True)
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
 class BranchInfoBase(abc.ABC):
     name: str
-    children: list[str]
+    children: tuple[str, ...]
 
 
-@dataclasses.dataclass(frozen=True, kw_only=True)
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
 class TrunkBranchInfo(BranchInfoBase):
     is_trunk: Literal[True] = True
     parent: None = None
 
 
-@dataclasses.dataclass(frozen=True, kw_only=True)
+@dataclasses.dataclass(frozen=True, kw_only=True, slots=True)
 class NonTrunkBranchInfo(BranchInfoBase):
     is_trunk: Literal[False] = False
     parent: ParentInfo
+
+
+@dataclasses.dataclass(frozen=True)
+class EulerTour:
+    """
+    An Euler tour of the branch tree, for answering ancestry queries in O(1).
+
+    https://cp-algorithms.com/graph/lca.html
+    """
+
+    # Branches in the order they're entered/exited during a DFS
+    tour: list[str | None]
+    depths: list[int]
+    # Index of the first + last time the branch appears in the tour
+    first: Mapping[str, int]
+    last: Mapping[str, int]
+    # sparse_table[k][i] = index of the shallowest branch in tour[i : i + 2**k]
+    sparse_table: list[list[int]]
+
+    @classmethod
+    def build(cls, roots: Sequence[str], *, children: Mapping[str, Mapping[str, None]]) -> Self:
+        tour: list[str | None] = []
+        depths: list[int] = []
+        first: dict[str, int] = {}
+        last: dict[str, int] = {}
+
+        def visit(branch: str | None, depth: int) -> None:
+            tour.append(branch)
+            depths.append(depth)
+            if branch is not None:
+                first.setdefault(branch, len(tour) - 1)
+                last[branch] = len(tour) - 1
+
+        # all roots are children of a virtual root (None), so every branch
+        # has a common ancestor
+        stack: list[tuple[str | None, int, Iterator[str]]] = [(None, -1, iter(roots))]
+        visit(None, -1)
+        while stack:
+            _, depth, child_iter = stack[-1]
+            child = next(child_iter, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    visit(stack[-1][0], stack[-1][1])
+            elif child not in first:  # guard against cycles
+                visit(child, depth + 1)
+                stack.append((child, depth + 1, iter(children.get(child, {}))))
+
+        sparse_table = [list(range(len(tour)))]
+        k = 1
+        while (1 << k) <= len(tour):
+            prev = sparse_table[-1]
+            half = 1 << (k - 1)
+            sparse_table.append(
+                [
+                    prev[i] if depths[prev[i]] <= depths[prev[i + half]] else prev[i + half]
+                    for i in range(len(tour) - (1 << k) + 1)
+                ]
+            )
+            k += 1
+
+        return cls(tour=tour, depths=depths, first=first, last=last, sparse_table=sparse_table)
+
+    def is_ancestor(self, ancestor: str, branch: str) -> bool:
+        if ancestor not in self.first or branch not in self.first:
+            return False
+        return self.first[ancestor] <= self.first[branch] and self.last[branch] <= self.last[ancestor]
+
+    def lowest_common_ancestor(self, branch1: str, branch2: str) -> str | None:
+        lo, hi = sorted([self.first[branch1], self.first[branch2]])
+        k = (hi - lo + 1).bit_length() - 1
+        i1 = self.sparse_table[k][lo]
+        i2 = self.sparse_table[k][hi - (1 << k) + 1]
+        return self.tour[i1 if self.depths[i1] <= self.depths[i2] else i2]
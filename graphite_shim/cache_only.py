@@ -6,47 +6,221 @@ But in cases where performance matters, we want to only use local cached
 data.
 """
 
+from __future__ import annotations
+
+import collections
+import contextlib
+import dataclasses
 import functools
 import json
-from collections.abc import Callable, Mapping
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Self
 
 from graphite_shim.exception import UserError
+from graphite_shim.git import GitClient
+from graphite_shim.utils.fs import write_atomic
+from graphite_shim.utils.json_stream import iter_array_items
+from graphite_shim.utils.term import Prompter, print
+
+if TYPE_CHECKING:
+    import argparse
+
+GRAPHITE_CACHE_FILE = ".graphite_cache_persist"
+
+# Derived from the Graphite cache, see CacheIndex
+CACHE_INDEX_FILE = ".graphite_shim/graphite_cache_index.json"
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheOnlyCommand:
+    run: Callable[[argparse.Namespace], None]
+    add_args: Callable[[argparse.ArgumentParser], object] = lambda _: None
 
 
 class CacheOnlyRunner:
-    def __init__(self, *, graphite_cache_dir: Path, curr_branch: str) -> None:
+    def __init__(self, *, graphite_cache_dir: Path, git: GitClient, prompter: Prompter | None) -> None:
         self._graphite_cache_dir = graphite_cache_dir
-        self._curr_branch = curr_branch
+        self._git = git
+        self._prompter = prompter
 
     @functools.cached_property
-    def _cache_data(self) -> Mapping[str, Any]:
-        try:
-            data: dict[str, Any] = json.loads((self._graphite_cache_dir / ".graphite_cache_persist").read_text())
-            return data
-        except FileNotFoundError:
-            raise UserError("Could not find graphite cache") from None
+    def _curr_branch(self) -> str:
+        return self._git.get_curr_branch()
 
     @functools.cached_property
-    def _branch_map(self) -> Mapping[str, Mapping[str, Any]]:
-        return dict(self._cache_data["branches"])
+    def _index(self) -> CacheIndex:
+        return CacheIndex.load(graphite_cache_dir=self._graphite_cache_dir)
+
+    def get_commands(self) -> Mapping[str, CacheOnlyCommand]:
+        def add_steps_arg(parser: argparse.ArgumentParser) -> None:
+            parser.add_argument("steps", metavar="n", nargs="?", type=int, default=1)
 
-    def get_commands(self) -> Mapping[str, Callable[[], None]]:
         return {
-            "trunk": self.get_trunk,
-            "parent": self.get_parent,
+            "trunk": CacheOnlyCommand(lambda _: self.get_trunk()),
+            "parent": CacheOnlyCommand(lambda _: self.get_parent()),
+            "children": CacheOnlyCommand(lambda _: self.get_children()),
+            "log": CacheOnlyCommand(
+                lambda _: self.log_short(),
+                add_args=lambda parser: parser.add_argument("command", choices=["short"]),
+            ),
+            "up": CacheOnlyCommand(lambda args: self.up(args.steps), add_args=add_steps_arg),
+            "down": CacheOnlyCommand(lambda args: self.down(args.steps), add_args=add_steps_arg),
+            "top": CacheOnlyCommand(lambda _: self.up(10000)),
+            "bottom": CacheOnlyCommand(lambda _: self.down(10000, include_trunk=False)),
         }
 
     def get_trunk(self) -> None:
-        curr = self._curr_branch
-        while info := self._branch_map.get(curr):
-            if info["validationResult"] == "TRUNK":
-                print(curr)
+        for branch in [self._curr_branch, *self._index.get_ancestors(self._curr_branch)]:
+            if branch in self._index.trunks:
+                print(branch)
                 return
-            curr = info["parentBranchName"]
         raise Exception("Could not find trunk")
 
     def get_parent(self) -> None:
-        parent: str = self._branch_map[self._curr_branch]["parentBranchName"]
-        print(parent)
+        print(self._index.parents[self._curr_branch])
+
+    def get_children(self) -> None:
+        for child in self._index.children.get(self._curr_branch, []):
+            print(child)
+
+    def log_short(self) -> None:
+        from graphite_shim.commands.log import Graph
+
+        index = self._index
+        graph = Graph.build_from_children(
+            index.trunks,
+            get_children=lambda branch: index.children.get(branch, []),
+            untracked_branches=[
+                branch
+                for branch in self._git.get_branches()
+                if branch not in index.parents and branch not in index.trunks
+            ],
+            curr_branch=self._curr_branch,
+        )
+        for _, line in graph.branch_lines():
+            print(line)
+        untracked_branches = list(graph.untracked_branch_lines())
+        if untracked_branches:
+            print("")
+            print("Untracked branches:")
+            for _, line in untracked_branches:
+                print(line)
+
+    def up(self, steps: int) -> None:
+        if steps < 1:
+            raise UserError(f"Expected a positive number of steps, got: {steps}")
+
+        branch = self._curr_branch
+        for _ in range(steps):
+            children = self._index.children.get(branch, [])
+            if len(children) == 0:
+                break
+            elif len(children) == 1:
+                branch = children[0]
+            else:
+                if self._prompter is None:
+                    raise UserError("Multiple children available")
+                branch = self._prompter.ask_oneof("Select child to go to", children)
+
+        self._git.run(["switch", branch])
+
+    def down(self, steps: int, *, include_trunk: bool = True) -> None:
+        if steps < 1:
+            raise UserError(f"Expected a positive number of steps, got: {steps}")
+
+        ancestors = self._index.get_ancestors(self._curr_branch)
+
+        if len(ancestors) == 0:
+            print(f"Already on @(green){self._curr_branch}")
+            return
+
+        if not include_trunk:
+            if len(ancestors) == 1:
+                print("Already on lowest branch in stack")
+                return
+            ancestors = ancestors[:-1]
+
+        self._git.run(["switch", ancestors[min(steps, len(ancestors)) - 1]])
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class CacheIndex:
+    """
+    The branch structure in the Graphite cache, indexed by parent and child.
+
+    The Graphite cache only has parent links, mixed in with everything else
+    Graphite caches, so this is persisted next to it and only rebuilt when
+    the Graphite cache changes.
+    """
+
+    # (mtime_ns, size) of the Graphite cache this was built from
+    source: tuple[int, int]
+    trunks: Sequence[str]
+    parents: Mapping[str, str]
+    children: Mapping[str, Sequence[str]]
+
+    @classmethod
+    def load(cls, *, graphite_cache_dir: Path) -> Self:
+        cache_file = graphite_cache_dir / GRAPHITE_CACHE_FILE
+        index_file = graphite_cache_dir / CACHE_INDEX_FILE
+        try:
+            stat = cache_file.stat()
+        except FileNotFoundError:
+            raise UserError("Could not find graphite cache") from None
+        source = (stat.st_mtime_ns, stat.st_size)
+
+        with contextlib.suppress(FileNotFoundError, ValueError, KeyError, TypeError):
+            index = cls.deserialize(json.loads(index_file.read_text()))
+            if index.source == source:
+                return index
+
+        # The Graphite cache can be megabytes (e.g. PR descriptions), so only
+        # parse the branches, one at a time
+        with cache_file.open() as f:
+            index = cls.build(iter_array_items(f, "branches"), source=source)
+        # The index is only a cache, so it's fine if it can't be saved
+        with contextlib.suppress(OSError):
+            index_file.parent.mkdir(exist_ok=True)
+            write_atomic(index_file, json.dumps(index.serialize()).encode())
+        return index
+
+    @classmethod
+    def build(cls, branches: Iterable[tuple[str, Mapping[str, Any]]], *, source: tuple[int, int]) -> Self:
+        trunks = []
+        parents = {}
+        children: dict[str, list[str]] = collections.defaultdict(list)
+        for branch, info in branches:
+            if info["validationResult"] == "TRUNK":
+                trunks.append(branch)
+            elif (parent := info.get("parentBranchName")) is not None:
+                parents[branch] = parent
+                children[parent].append(branch)
+
+        return cls(source=source, trunks=trunks, parents=parents, children=dict(children))
+
+    @classmethod
+    def deserialize(cls, data: dict[str, Any]) -> Self:
+        mtime_ns, size = data["source"]
+        return cls(
+            source=(mtime_ns, size),
+            trunks=data["trunks"],
+            parents=data["parents"],
+            children=data["children"],
+        )
+
+    def serialize(self) -> dict[str, Any]:
+        return {
+            "source": list(self.source),
+            "trunks": self.trunks,
+            "parents": self.parents,
+            "children": self.children,
+        }
+
+    def get_ancestors(self, branch: str) -> list[str]:
+        """Get the ancestors of the given branch, starting with its parent."""
+        ancestors = []
+        while (parent := self.parents.get(branch)) is not None:
+            ancestors.append(parent)
+            branch = parent
+        return ancestors
@@ -0,0 +1,178 @@
+"""
+Thin client for the gt daemon (see graphite_shim/daemon.py).
+
+Forwards the command (with our stdin/stdout/stderr) to the repo's daemon if
+one is running, otherwise runs it in this process. Only uses the standard
+library, so that forwarding a command doesn't pay for importing gt itself.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import struct
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+SOCKET_FILE = ".graphite_shim/daemon.sock"
+
+# Messages are a length-prefixed JSON payload
+LENGTH = struct.Struct("!I")
+# The daemon responds with the command's exit code, or EXIT_FALLBACK if
+# the client should run the command itself
+EXIT_CODE = struct.Struct("!i")
+EXIT_FALLBACK = -1
+
+# Commands that shouldn't go through the daemon
+LOCAL_COMMANDS = {"daemon"}
+
+
+def main() -> None:
+    exit_code = None
+    if sys.argv[1:2] and sys.argv[1] not in LOCAL_COMMANDS:
+        exit_code = forward_command(sys.argv)
+
+    if exit_code is None:
+        from graphite_shim.__main__ import main as run_local
+
+        run_local()
+    else:
+        sys.exit(exit_code)
+
+
+def forward_command(argv: list[str]) -> int | None:
+    """
+    Run the command in the daemon, returning None if there's no daemon to run it.
+
+    Once the request has been sent, the daemon may have started running the
+    command, so it's an error (rather than a fallback) if the daemon goes away
+    without responding; running it again locally could redo a half-applied
+    command.
+    """
+    sock = connect()
+    if sock is None:
+        return None
+
+    with sock:
+        request = {
+            "op": "run",
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "env": dict(os.environ),
+        }
+        try:
+            send_message(sock, request, fds=[0, 1, 2])
+        except OSError:
+            # the daemon only runs complete requests
+            return None
+
+        try:
+            data = recv_exact(sock, EXIT_CODE.size)
+        except KeyboardInterrupt:
+            # closing the socket interrupts the command in the daemon
+            return 130
+        except OSError:
+            data = None
+
+    if data is None:
+        print("ERROR: Lost connection to the gt daemon; the command may have partially run.", file=sys.stderr)
+        return 1
+    (exit_code,) = EXIT_CODE.unpack(data)
+    return exit_code if exit_code != EXIT_FALLBACK else None
+
+
+def connect(git_common_dir: Path | None = None) -> socket.socket | None:
+    """Connect to the daemon for the current repo, if one is running."""
+    if git_common_dir is None:
+        git_common_dir = find_git_common_dir(Path.cwd())
+    if git_common_dir is None:
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(git_common_dir / SOCKET_FILE))
+    except OSError:
+        # not running, stale socket, path too long, etc.
+        sock.close()
+        return None
+    return sock
+
+
+def find_git_common_dir(cwd: Path) -> Path | None:
+    """
+    Find the git common dir by walking up from the given directory, without
+    shelling out to git. Returns None if it can't be determined here (in which
+    case, we'll let GitClient figure it out in-process).
+    """
+    if "GIT_DIR" in os.environ or "GIT_COMMON_DIR" in os.environ:
+        return None
+
+    for directory in [cwd, *cwd.parents]:
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            git_dir = dot_git
+        elif dot_git.is_file():
+            content = dot_git.read_text()
+            if not content.startswith("gitdir: "):
+                return None
+            git_dir = directory / content.removeprefix("gitdir: ").strip()
+        else:
+            continue
+
+        # Linked worktrees point to the common dir with a `commondir` file
+        try:
+            common_dir = (git_dir / "commondir").read_text().strip()
+        except FileNotFoundError:
+            return git_dir.resolve()
+        return (git_dir / common_dir).resolve()
+
+    return None
+
+
+# ----- Protocol ----- #
+
+
+def send_message(sock: socket.socket, message: dict[str, Any], *, fds: Sequence[int] = ()) -> None:
+    payload = json.dumps(message).encode()
+    socket.send_fds(sock, [LENGTH.pack(len(payload))], fds)
+    sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket) -> tuple[dict[str, Any], list[int]] | None:
+    """Receive a message + any file descriptors sent with it, or None if the connection was closed."""
+    header, fds, _, _ = socket.recv_fds(sock, LENGTH.size, maxfds=3)
+    try:
+        if len(header) < LENGTH.size:
+            rest = recv_exact(sock, LENGTH.size - len(header))
+            if rest is None:
+                raise EOFError
+            header += rest
+
+        (length,) = LENGTH.unpack(header)
+        payload = recv_exact(sock, length)
+        if payload is None:
+            raise EOFError
+    except EOFError:
+        for fd in fds:
+            os.close(fd)
+        return None
+    return json.loads(payload), fds
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    """Receive exactly `size` bytes, or None if the connection was closed first."""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,35 @@
+from __future__ import annotations
+
+import dataclasses
 import importlib
-import inspect
-import pkgutil
 from collections.abc import Mapping
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+from graphite_shim.commands._registry import COMMANDS
+
+if TYPE_CHECKING:
+    from graphite_shim.commands.base import Command
+
 
-from graphite_shim.commands.base import Command
+@dataclasses.dataclass(frozen=True)
+class CommandInfo:
+    tag: str
+    module: str
+    cls_name: str
+    doc: str | None
 
+    def load(self) -> type[Command[Any]]:
+        """Import the command's module, returning the command class."""
+        cmd_cls: type[Command[Any]] = getattr(importlib.import_module(self.module), self.cls_name)
+        return cmd_cls
 
-def get_all_commands() -> Mapping[str, type[Command[Any]]]:
-    # Import + load all graphite_shim.commands.* modules
-    # https://stackoverflow.com/a/3365846/4966649
-    all_submodules = (
-        importlib.import_module(f"{__name__}.{module_info.name}") for module_info in pkgutil.iter_modules(__path__)
-    )
 
+def get_all_commands() -> Mapping[str, CommandInfo]:
+    """
+    Get all commands, without importing them. See graphite_shim/commands/registry.py
+    to regenerate the registry after adding a command.
+    """
     return {
-        cls.__tag__: cls
-        for mod in all_submodules
-        for _, cls in inspect.getmembers(mod, inspect.isclass)
-        if hasattr(cls, "__tag__")  # set in all Command subclasses
+        tag: CommandInfo(tag=tag, module=module, cls_name=cls_name, doc=doc)
+        for tag, (module, cls_name, doc) in COMMANDS.items()
     }
@@ -0,0 +1,115 @@
+# Generated by `python -m graphite_shim.commands.registry`. Do not edit.
+
+# tag => (module, class name, docstring)
+COMMANDS: dict[str, tuple[str, str, str | None]] = {
+    "abort": (
+        "graphite_shim.commands.abort",
+        "CommandAbort",
+        "Abort the restack operation.",
+    ),
+    "bottom": (
+        "graphite_shim.commands.bottom",
+        "CommandBottom",
+        "Checkout the bottom-most branch in the stack (just above the trunk).",
+    ),
+    "continue": (
+        "graphite_shim.commands.continue",
+        "CommandContinue",
+        "Continue the restack operation.",
+    ),
+    "create": (
+        "graphite_shim.commands.create",
+        "CommandCreate",
+        "Create a branch.",
+    ),
+    "daemon": (
+        "graphite_shim.commands.daemon",
+        "CommandDaemon",
+        "Manage the daemon that runs commands in this repo without startup overhead.",
+    ),
+    "delete": (
+        "graphite_shim.commands.delete",
+        "CommandDelete",
+        "Delete a branch.",
+    ),
+    "down": (
+        "graphite_shim.commands.down",
+        "CommandDown",
+        "Checkout a branch down the stack (towards ancestors).",
+    ),
+    "init": (
+        "graphite_shim.commands.init",
+        "CommandInit",
+        "Initialize graphite_shim.",
+    ),
+    "log": (
+        "graphite_shim.commands.log",
+        "CommandLog",
+        "Display git history / branches.",
+    ),
+    "move": (
+        "graphite_shim.commands.move",
+        "CommandMove",
+        "Move a branch.",
+    ),
+    "parent": (
+        "graphite_shim.commands.parent",
+        "CommandParent",
+        "Show the parent branch.",
+    ),
+    "rename": (
+        "graphite_shim.commands.rename",
+        "CommandRename",
+        "Rename the current branch.",
+    ),
+    "reorder": (
+        "graphite_shim.commands.reorder",
+        "CommandReorder",
+        "Reorder branches in a stack.",
+    ),
+    "restack": (
+        "graphite_shim.commands.restack",
+        "CommandRestack",
+        "Restack a stack of branches.",
+    ),
+    "select-branch": (
+        "graphite_shim.commands.select_branch",
+        "CommandSelectBranch",
+        "Interactively select branch to checkout.",
+    ),
+    "submit": (
+        "graphite_shim.commands.submit",
+        "CommandSubmit",
+        "Submit a stack to the remote.",
+    ),
+    "sync": (
+        "graphite_shim.commands.sync",
+        "CommandSync",
+        "Syncs with remote and syncs branches.",
+    ),
+    "top": (
+        "graphite_shim.commands.top",
+        "CommandTop",
+        "Checkout the top-most branch in the stack.",
+    ),
+    "track": (
+        "graphite_shim.commands.track",
+        "CommandTrack",
+        "Start tracking a branch.",
+    ),
+    "trunk": (
+        "graphite_shim.commands.trunk",
+        "CommandTrunk",
+        "Show the trunk branch.",
+    ),
+    "untrack": (
+        "graphite_shim.commands.untrack",
+        "CommandUntrack",
+        "Stop tracking a branch.",
+    ),
+    "up": (
+        "graphite_shim.commands.up",
+        "CommandUp",
+        "Checkout a branch up the stack (towards descendants).",
+    ),
+}
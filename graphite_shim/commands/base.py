@@ -1,12 +1,18 @@
+from __future__ import annotations
+
 import abc
-import argparse
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING
 
 from graphite_shim.config import Config
 from graphite_shim.git import GitClient
 from graphite_shim.store import Store
 from graphite_shim.utils.term import Prompter
 
+if TYPE_CHECKING:
+    # argparse is slow to import, so only import it when parsing the slow way
+    import argparse
+
 
 class Command[Args](abc.ABC):
     __tag__: str
@@ -35,6 +41,14 @@ class Command[Args](abc.ABC):
     def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], Args]:
         pass
 
+    def fast_parse(self, args: Sequence[str]) -> Args | None:
+        """
+        Parse simple invocations without argparse, returning None to fall back
+        to `add_args`. Only worth implementing for commands that are run very
+        often (e.g. in shell prompts).
+        """
+        return None
+
     @abc.abstractmethod
     def run(self, args: Args) -> None:
         pass
@@ -43,3 +57,16 @@ class Command[Args](abc.ABC):
 def camel_to_hyphens(s: str) -> str:
     """https://stackoverflow.com/a/44969381"""
     return "".join(["-" + c.lower() if c.isupper() else c for c in s]).lstrip("-")
+
+
+def positive_int(s: str) -> int:
+    """An argparse `type` for options like --jobs, which must be at least 1."""
+    import argparse
+
+    try:
+        n = int(s)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {s!r}")
+    return n
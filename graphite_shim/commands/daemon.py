@@ -0,0 +1,84 @@
+import argparse
+import dataclasses
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from typing import Literal
+
+from graphite_shim import client
+from graphite_shim.commands.base import Command
+from graphite_shim.exception import UserError
+from graphite_shim.utils.term import print
+
+# How long to wait for the daemon to start up
+START_TIMEOUT = 5
+
+
+@dataclasses.dataclass(frozen=True)
+class DaemonArgs:
+    action: Literal["start", "stop", "status"]
+
+
+class CommandDaemon(Command[DaemonArgs]):
+    """Manage the daemon that runs commands in this repo without startup overhead."""
+
+    def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], DaemonArgs]:
+        parser.add_argument("action", choices=["start", "stop", "status"])
+
+        return lambda args: DaemonArgs(
+            action=args.action,
+        )
+
+    def run(self, args: DaemonArgs) -> None:
+        match args.action:
+            case "start":
+                self._start()
+            case "stop":
+                if not self._send("stop"):
+                    raise UserError("Daemon is not running")
+                print("@(green)Daemon stopped")
+            case "status":
+                if self._send("ping"):
+                    print("@(green)Daemon is running")
+                else:
+                    print("Daemon is not running")
+
+    def _start(self) -> None:
+        if self._send("ping"):
+            print("Daemon is already running")
+            return
+
+        git_common_dir = self._git.git_common_dir
+        # Imported here to avoid importing it for every command
+        from graphite_shim.daemon import LOG_FILE
+
+        with (git_common_dir / LOG_FILE).open("a") as log:
+            subprocess.Popen(
+                [sys.executable, "-m", "graphite_shim.daemon", str(git_common_dir)],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                # detach from the terminal, so it keeps running after the shell exits
+                start_new_session=True,
+            )
+
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._send("ping"):
+                print("@(green)Daemon started")
+                return
+            time.sleep(0.05)
+        raise UserError(f"Daemon failed to start, see {git_common_dir / LOG_FILE}")
+
+    def _send(self, op: str) -> bool:
+        """Send the given op to the daemon, returning False if it's not running."""
+        sock = client.connect(self._git.git_common_dir)
+        if sock is None:
+            return False
+        with sock:
+            try:
+                client.send_message(sock, {"op": op})
+                return client.recv_exact(sock, client.EXIT_CODE.size) is not None
+            except OSError:
+                return False
@@ -4,6 +4,7 @@ from collections.abc import Callable
 from typing import Any
 
 from graphite_shim.commands.base import Command
+from graphite_shim.exception import UserError
 from graphite_shim.utils.term import print
 
 
@@ -27,6 +28,9 @@ class CommandDown(Command[DownArgs]):
 
     @staticmethod
     def _run(cmd: Command[Any], args: DownArgs, *, include_main: bool) -> None:
+        if args.steps < 1:
+            raise UserError(f"Expected a positive number of steps, got: {args.steps}")
+
         curr = cmd._git.get_curr_branch()
         ancestors = list(cmd._store.get_ancestors(curr))
 
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-import argparse
 import dataclasses
-from collections.abc import Callable, Iterable
-from typing import Any, Literal, Self
+from collections.abc import Callable, Iterable, Sequence
+from typing import TYPE_CHECKING, Any, Literal, Self
 
 from graphite_shim.commands.base import Command
 from graphite_shim.git import GitClient
 from graphite_shim.store import Store
 from graphite_shim.utils.term import print
 
+if TYPE_CHECKING:
+    import argparse
+
 
 @dataclasses.dataclass(frozen=True)
 class LogArgs:
@@ -29,6 +31,19 @@ class CommandLog(Command[LogArgs]):
             only_stack=args.stack,
         )
 
+    def fast_parse(self, args: Sequence[str]) -> LogArgs | None:
+        command: Literal["short", "long", None]
+        match [arg for arg in args if arg != "--stack"]:
+            case []:
+                command = None
+            case ["short"]:
+                command = "short"
+            case ["long"]:
+                command = "long"
+            case _:
+                return None
+        return LogArgs(command=command, only_stack="--stack" in args)
+
     def run(self, args: LogArgs) -> None:
         curr = self._git.get_curr_branch()
 
@@ -92,35 +107,53 @@ class Graph:
         store: Store,
         git: GitClient,
     ) -> Self:
-        def _build(
-            branch: str,
-            *,
-            path_filter: list[str] | None,
-            column: int,
-        ) -> Iterable[tuple[str, int, int]]:
-            children = list(store.get_children(branch))
-            next_calls = [
-                (child, path_filter[1:] if path_filter is not None else None)
-                for child in children
-                if path_filter is None or path_filter[:1] == [child.name]
-            ]
-            for i, (child, next_path_filter) in enumerate(next_calls):
-                yield from _build(
-                    child.name,
-                    path_filter=next_path_filter,
-                    column=column + i,
-                )
-            yield (branch, column, len(next_calls))
-
         path_filter = None
         if branch_filter is not None:
             path_filter = [branch.name for branch in store.get_stack(curr_branch)][1:]
 
-        branches = list(_build(trunk, path_filter=path_filter, column=0))
-
-        all_branches = git.query(["branch", "--format=%(refname:short)"]).splitlines()
+        all_branches = git.get_branches()
         untracked_branches = list(set(all_branches) - {b.name for b in store.get_branches()})
 
+        return cls.build_from_children(
+            [trunk],
+            get_children=lambda branch: [child.name for child in store.get_children(branch)],
+            path_filter=path_filter,
+            untracked_branches=untracked_branches,
+            curr_branch=curr_branch,
+        )
+
+    @classmethod
+    def build_from_children(
+        cls,
+        roots: Sequence[str],
+        *,
+        get_children: Callable[[str], Sequence[str]],
+        path_filter: list[str] | None = None,
+        untracked_branches: list[str],
+        curr_branch: str,
+    ) -> Self:
+        """Build the graph of the given roots, without a Store (e.g. from the Graphite cache)."""
+        # Post-order traversal, so each branch comes after all of its descendants.
+        # Entries are (branch, path filter, column, number of children if visited)
+        branches: list[tuple[str, int, int]] = []
+        stack: list[tuple[str, list[str] | None, int, int | None]] = [
+            (root, path_filter, 0, None) for root in reversed(roots)
+        ]
+        while stack:
+            branch, branch_path_filter, column, num_children = stack.pop()
+            if num_children is not None:
+                branches.append((branch, column, num_children))
+                continue
+
+            next_calls = [
+                (child, branch_path_filter[1:] if branch_path_filter is not None else None)
+                for child in get_children(branch)
+                if branch_path_filter is None or branch_path_filter[:1] == [child]
+            ]
+            stack.append((branch, None, column, len(next_calls)))
+            for i, (child, next_path_filter) in reversed(list(enumerate(next_calls))):
+                stack.append((child, next_path_filter, column + i, None))
+
         return cls(
             branches=branches,
             untracked_branches=untracked_branches,
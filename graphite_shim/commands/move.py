@@ -33,6 +33,9 @@ class CommandMove(Command[MoveArgs]):
             print(f"@(green){args.onto} is already the parent")
             return
 
+        if self._store.is_ancestor(curr, args.onto):
+            raise UserError(f"Cannot move {curr} onto itself or one of its descendants")
+
         onto_commit = self._git.resolve_commit(args.onto)
         proc = self._git.run(
             [
@@ -1,11 +1,16 @@
-import argparse
+from __future__ import annotations
+
 import dataclasses
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING
 
 from graphite_shim.commands.base import Command
 from graphite_shim.exception import UserError
 from graphite_shim.utils.term import print
 
+if TYPE_CHECKING:
+    import argparse
+
 
 @dataclasses.dataclass(frozen=True)
 class ParentArgs:
@@ -18,6 +23,9 @@ class CommandParent(Command[ParentArgs]):
     def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], ParentArgs]:
         return lambda args: ParentArgs()
 
+    def fast_parse(self, args: Sequence[str]) -> ParentArgs | None:
+        return ParentArgs() if not args else None
+
     def run(self, args: ParentArgs) -> None:
         curr = self._git.get_curr_branch()
         branch = self._store.get_branch(curr)
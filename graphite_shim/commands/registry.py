@@ -0,0 +1,69 @@
+"""
+Generate graphite_shim/commands/_registry.py, which lets us look up commands
+without importing every command module on startup.
+
+Usage: PYTHONPATH=. python -m graphite_shim.commands.registry
+"""
+
+import importlib
+import inspect
+import json
+import pkgutil
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import graphite_shim.commands
+from graphite_shim.commands.base import Command
+
+REGISTRY_FILE = Path(graphite_shim.commands.__file__).parent / "_registry.py"
+
+
+def scan_commands() -> Mapping[str, type[Command[Any]]]:
+    # Import + load all graphite_shim.commands.* modules
+    # https://stackoverflow.com/a/3365846/4966649
+    all_submodules = (
+        importlib.import_module(f"{graphite_shim.commands.__name__}.{module_info.name}")
+        for module_info in pkgutil.iter_modules(graphite_shim.commands.__path__)
+    )
+
+    commands = {
+        cls.__tag__: cls
+        for mod in all_submodules
+        for _, cls in inspect.getmembers(mod, inspect.isclass)
+        if hasattr(cls, "__tag__")  # set in all Command subclasses
+    }
+    return dict(sorted(commands.items()))
+
+
+def render_registry(commands: Mapping[str, type[Command[Any]]] | None = None) -> str:
+    if commands is None:
+        commands = scan_commands()
+
+    lines = [
+        "# Generated by `python -m graphite_shim.commands.registry`. Do not edit.",
+        "",
+        "# tag => (module, class name, docstring)",
+        "COMMANDS: dict[str, tuple[str, str, str | None]] = {",
+    ]
+    for tag, cls in commands.items():
+        lines.extend(
+            [
+                f"    {json.dumps(tag)}: (",
+                f"        {json.dumps(cls.__module__)},",
+                f"        {json.dumps(cls.__name__)},",
+                f"        {_literal(cls.__doc__)},",
+                "    ),",
+            ]
+        )
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _literal(s: str | None) -> str:
+    # JSON strings are valid Python string literals, but `null` isn't `None`
+    return "None" if s is None else json.dumps(s)
+
+
+if __name__ == "__main__":
+    REGISTRY_FILE.write_text(render_registry())
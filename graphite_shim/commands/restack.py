@@ -5,13 +5,16 @@ import dataclasses
 import enum
 import json
 import subprocess
-from collections.abc import Callable
+from collections.abc import Callable, Sequence, Set
 from pathlib import Path
 from typing import Any, ClassVar, Self
 
+from graphite_shim import profiling
 from graphite_shim.branch_tree import BranchInfo, NonTrunkBranchInfo
 from graphite_shim.commands.base import Command
 from graphite_shim.exception import UserError
+from graphite_shim.git import GitClientError, RefTransaction
+from graphite_shim.replay import Replayer
 from graphite_shim.store import StoreManager
 from graphite_shim.utils.term import print
 
@@ -66,6 +69,10 @@ class CommandRestack(Command[RestackArgs]):
     @staticmethod
     def _restack(cmd: Command[Any], *, targets: list[BranchInfo] | None) -> None:
         if targets:
+            targets = CommandRestack._prune_targets(cmd, targets=targets)
+            if len(targets) == 0:
+                return
+
             plan = RebasePlan(
                 git_dir=cmd._git.git_common_dir,
                 orig_branch=cmd._git.get_curr_branch(),
@@ -107,10 +114,17 @@ class CommandRestack(Command[RestackArgs]):
                 raise UserError("Rebase failed, resolve conflicts and run `gt continue`")
 
             cmd._store.update_parent_commit(curr.name, commit=new_base)
-            # TODO: Provide better API to allow commands to manually save store, even on failure
-            StoreManager.save(cmd._store, store_dir=cmd._git.git_common_dir)
+            # Persist now, so progress isn't lost if a later rebase fails
+            StoreManager.append(cmd._store, store_dir=cmd._git.git_common_dir, format=cmd._config.store_format)
 
         while len(plan.targets) > 0:
+            if is_start:
+                # Restack what we can without touching the worktree, then rebase the next one
+                num_restacked = CommandRestack._restack_in_memory(cmd, targets=plan.targets)
+                plan = dataclasses.replace(plan, targets=plan.targets[num_restacked:])
+                if len(plan.targets) == 0:
+                    break
+
             try:
                 run_one(plan, is_start=is_start)
             except Exception:
@@ -121,6 +135,139 @@ class CommandRestack(Command[RestackArgs]):
 
         CommandRestack._reset(cmd, plan=plan)
 
+    @staticmethod
+    def _prune_targets(cmd: Command[Any], *, targets: list[BranchInfo]) -> list[BranchInfo]:
+        """
+        Remove targets that are already up to date: their parent hasn't moved
+        since they were last restacked, and isn't being restacked itself.
+        Targets should be ordered parents first.
+        """
+        branches = []
+        for branch in targets:
+            assert isinstance(branch, NonTrunkBranchInfo)
+            branches.append(branch)
+
+        parent_commits = cmd._git.resolve_commits([branch.parent.name for branch in branches])
+        needs_restack = set()
+        for branch, parent_commit in zip(branches, parent_commits, strict=True):
+            if branch.parent.name in needs_restack or branch.parent.last_commit != parent_commit:
+                needs_restack.add(branch.name)
+
+        up_to_date = [branch.name for branch in branches if branch.name not in needs_restack]
+        if up_to_date:
+            print(f"@(gray)Already up to date: {', '.join(up_to_date)}")
+        to_restack: list[BranchInfo] = [branch for branch in branches if branch.name in needs_restack]
+        if to_restack:
+            print(f"@(gray)To restack: {', '.join(branch.name for branch in to_restack)}")
+        return to_restack
+
+    @staticmethod
+    def _restack_in_memory(cmd: Command[Any], *, targets: list[str]) -> int:
+        """
+        Restack as many of the targets as possible (in order) without touching
+        the worktree, by replaying their commits in memory, then moving all of
+        the branches in one transaction. Returns the number of targets
+        restacked; the rest need to be rebased.
+        """
+        replayer = Replayer.create(git=cmd._git)
+        if replayer is None:
+            return 0
+
+        branches = []
+        for name in targets:
+            branch = cmd._store.get_branch(name)
+            assert isinstance(branch, NonTrunkBranchInfo)
+            branches.append(branch)
+
+        with profiling.span("restack: replay", num_targets=len(branches)):
+            replayed = CommandRestack._replay(
+                cmd,
+                replayer=replayer,
+                targets=branches,
+                skip=CommandRestack._get_other_worktree_branches(cmd),
+            )
+        for replayed_branch in replayed:
+            print(f"@(blue)Restacking {replayed_branch.name}...")
+
+        if not CommandRestack._apply_replayed(cmd, replayed=replayed):
+            return 0
+        return len(replayed)
+
+    @staticmethod
+    def _get_other_worktree_branches(cmd: Command[Any]) -> set[str]:
+        # Moving a branch checked out in another worktree would leave that worktree out of sync
+        return {branch for branch, path in cmd._git.get_worktree_branches().items() if path != cmd._git.root}
+
+    @staticmethod
+    def _replay(
+        cmd: Command[Any],
+        *,
+        replayer: Replayer,
+        targets: Sequence[NonTrunkBranchInfo],
+        skip: Set[str],
+    ) -> list[ReplayedBranch]:
+        """
+        Replay as many of the targets as possible (in order) onto their
+        parents, stopping at the first one that can't be replayed in memory
+        or is in `skip`.
+
+        Only creates new commits, without updating any refs or the store, so
+        independent stacks can be replayed concurrently (with a Replayer each).
+        """
+        replayed: dict[str, ReplayedBranch] = {}
+        for branch in targets:
+            if branch.name in skip:
+                break
+
+            parent = branch.parent.name
+            new_base = replayed[parent].new_commit if parent in replayed else cmd._git.resolve_commit(parent)
+            old_commit = cmd._git.resolve_commit(branch.name)
+            new_commit = replayer.replay(upstream=branch.parent.last_commit, onto=new_base, branch=old_commit)
+            if new_commit is None:
+                break
+
+            replayed[branch.name] = ReplayedBranch(
+                name=branch.name,
+                old_commit=old_commit,
+                new_commit=new_commit,
+                new_base=new_base,
+            )
+        return list(replayed.values())
+
+    @staticmethod
+    def _apply_replayed(cmd: Command[Any], *, replayed: Sequence[ReplayedBranch]) -> bool:
+        """
+        Move the replayed branches to their new commits in one transaction,
+        and record their new bases in the store. Returns False (changing
+        nothing) if the current branch is replayed but the worktree can't be
+        updated to match.
+        """
+        curr = cmd._git.get_curr_branch()
+        updates = {branch.name: (branch.old_commit, branch.new_commit) for branch in replayed if branch.is_moved}
+        if curr in updates:
+            # Update the worktree like `git switch` would, keeping any local changes
+            old, new = updates[curr]
+            if cmd._git.run(["read-tree", "-m", "-u", old, new], capture_output=True, check=False).returncode != 0:
+                return False
+
+        if updates:
+            try:
+                transaction = RefTransaction()
+                for name, (old, new) in updates.items():
+                    transaction.update(f"refs/heads/{name}", new, old=old)
+                cmd._git.update_refs(transaction, message="gt restack")
+            except GitClientError:
+                if curr in updates:
+                    old, new = updates[curr]
+                    cmd._git.run(["read-tree", "-m", "-u", new, old], capture_output=True, check=False)
+                raise
+
+        for branch in replayed:
+            cmd._store.update_parent_commit(branch.name, commit=branch.new_base)
+        StoreManager.append(cmd._store, store_dir=cmd._git.git_common_dir, format=cmd._config.store_format)
+
+        return True
+
     @staticmethod
     def _reset(cmd: Command[Any], *, plan: RebasePlan | None = None) -> None:
         plan_ = plan or RebasePlan.load(git_dir=cmd._git.git_common_dir)
@@ -128,6 +275,19 @@ class CommandRestack(Command[RestackArgs]):
         cmd._git.run(["switch", plan_.orig_branch], stderr=subprocess.PIPE)
 
 
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ReplayedBranch:
+    name: str
+    old_commit: str
+    new_commit: str
+    # The commit the branch was replayed onto
+    new_base: str
+
+    @property
+    def is_moved(self) -> bool:
+        return self.old_commit != self.new_commit
+
+
 @dataclasses.dataclass(frozen=True)
 class RebasePlan:
     git_dir: Path
@@ -1,9 +1,15 @@
 import argparse
+import concurrent.futures
 import dataclasses
-from collections.abc import Callable, Iterable
+import shlex
+import time
+from collections.abc import Callable, Iterable, Mapping, Sequence
 
+from graphite_shim import profiling
 from graphite_shim.branch_tree import BranchInfo
-from graphite_shim.commands.base import Command
+from graphite_shim.commands.base import Command, positive_int
+from graphite_shim.exception import UserError
+from graphite_shim.git import GitClientError
 from graphite_shim.utils.term import print
 
 
@@ -11,6 +17,36 @@ from graphite_shim.utils.term import print
 class SubmitArgs:
     submit_stack: bool
     force: bool
+    dry_run: bool = False
+    jobs: int | None = None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class BranchPush:
+    branch: str
+    local_sha: str
+    # The remote-tracking ref's SHA, or None if the branch isn't on the remote yet
+    remote_sha: str | None
+
+    @property
+    def is_up_to_date(self) -> bool:
+        return self.local_sha == self.remote_sha
+
+    def describe(self) -> str:
+        if self.remote_sha is None:
+            return "new"
+        elif self.is_up_to_date:
+            return "up to date"
+        else:
+            return f"{self.remote_sha[:7]}..{self.local_sha[:7]}"
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class PushResult:
+    remote: str
+    duration: float
+    output: str
+    error: str | None
 
 
 class CommandSubmit(Command[SubmitArgs]):
@@ -19,10 +55,14 @@ class CommandSubmit(Command[SubmitArgs]):
     def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], SubmitArgs]:
         parser.add_argument("--stack", action="store_true")
         parser.add_argument("--force", "-f", action="store_true")
+        parser.add_argument("--dry-run", action="store_true", help="Show what would be pushed, without pushing")
+        parser.add_argument("--jobs", "-j", type=positive_int, default=self._config.max_workers)
 
         return lambda args: SubmitArgs(
             submit_stack=args.stack,
             force=args.force,
+            dry_run=args.dry_run,
+            jobs=args.jobs,
         )
 
     def run(self, args: SubmitArgs) -> None:
@@ -32,10 +72,90 @@ class CommandSubmit(Command[SubmitArgs]):
         if curr != self._config.trunk:
             branches = [branch for branch in branches if branch.name != self._config.trunk]
 
+        branch_names = [branch.name for branch in branches]
+        with profiling.span("submit: plan"):
+            plans = self._plan_push(branch_names, remotes=self._config.remotes)
+
         print("@(blue)Found branches:")
-        for branch in branches:
-            print(f"- @(cyan){branch.name}")
+        for i, branch in enumerate(branch_names):
+            statuses = ", ".join(f"{remote}: {pushes[i].describe()}" for remote, pushes in plans.items())
+            print(f"- @(cyan){branch}@(reset) @(gray)({statuses})")
+
+        # --force pushes everything, in case the remote-tracking refs are stale
+        if not args.force:
+            plans = {remote: [push for push in pushes if not push.is_up_to_date] for remote, pushes in plans.items()}
+        plans = {remote: pushes for remote, pushes in plans.items() if len(pushes) > 0}
+        if len(plans) == 0:
+            print("\n@(green)Everything up to date")
+            return
+
+        push_args = {remote: get_push_args(pushes, remote=remote, force=args.force) for remote, pushes in plans.items()}
+        if args.dry_run:
+            for remote, pushes in plans.items():
+                num_objects = self._count_objects(pushes, remote=remote)
+                print(f"\n@(blue)Would push {len(pushes)} branch(es) to {remote}, ~{num_objects} object(s):")
+                print(shlex.join(["git", *push_args[remote]]))
+            return
 
         print("\n@(blue)Pushing branches to remote...")
-        force = "--force" if args.force else "--force-with-lease"
-        self._git.run(["push", "--atomic", force, "origin", *(branch.name for branch in branches)])
+        with profiling.span("submit: push", remotes=list(push_args)):
+            results = self._push(push_args, max_workers=args.jobs)
+        for result in results:
+            if result.error is None:
+                print(f"@(green)✓ {result.remote}@(reset) @(gray)({result.duration:.1f}s)")
+                if result.output:
+                    print(result.output)
+            else:
+                print(f"@(red)✗ {result.remote}@(reset) @(gray)({result.duration:.1f}s)")
+                print(result.error)
+
+        failed = [result.remote for result in results if result.error is not None]
+        if failed:
+            raise UserError(f"Failed to push to: {', '.join(failed)}")
+
+    def _plan_push(self, branches: Sequence[str], *, remotes: Sequence[str]) -> dict[str, list[BranchPush]]:
+        """Compare the branches against each remote's remote-tracking refs, read in one batch per remote."""
+        local_shas = self._git.resolve_commits([f"refs/heads/{branch}" for branch in branches])
+        plans = {}
+        for remote in remotes:
+            remote_shas = self._git.get_refs(f"refs/remotes/{remote}/")
+            plans[remote] = [
+                BranchPush(
+                    branch=branch,
+                    local_sha=local_sha,
+                    remote_sha=remote_shas.get(f"refs/remotes/{remote}/{branch}"),
+                )
+                for branch, local_sha in zip(branches, local_shas, strict=True)
+            ]
+        return plans
+
+    def _count_objects(self, pushes: Sequence[BranchPush], *, remote: str) -> int:
+        """Estimate the number of objects a push would send: those not reachable from the remote's refs."""
+        out = self._git.query(
+            ["rev-list", "--objects", *(push.local_sha for push in pushes), "--not", f"--remotes={remote}"]
+        )
+        return len(out.splitlines())
+
+    def _push(self, push_args: Mapping[str, list[str]], *, max_workers: int | None) -> list[PushResult]:
+        """Push to each remote concurrently. Each push is atomic, but pushes to different remotes are independent."""
+
+        def push(remote: str) -> PushResult:
+            start = time.perf_counter()
+            try:
+                proc = self._git.run(push_args[remote], capture_output=True)
+            except GitClientError as e:
+                return PushResult(remote=remote, duration=time.perf_counter() - start, output="", error=str(e))
+            output = (proc.stdout + proc.stderr).strip()
+            return PushResult(remote=remote, duration=time.perf_counter() - start, output=output, error=None)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(push, push_args))
+
+
+def get_push_args(pushes: Sequence[BranchPush], *, remote: str, force: bool) -> list[str]:
+    if force:
+        force_args = ["--force"]
+    else:
+        # Only overwrite what we've seen; an empty lease means the branch must not exist yet
+        force_args = [f"--force-with-lease={push.branch}:{push.remote_sha or ''}" for push in pushes]
+    return ["push", "--atomic", *force_args, remote, *(push.branch for push in pushes)]
@@ -1,19 +1,25 @@
 import argparse
+import concurrent.futures
 import contextlib
 import dataclasses
 import sys
-from collections.abc import Callable
-from pathlib import Path
+from collections.abc import Callable, Sequence
 
-from graphite_shim.commands.base import Command
-from graphite_shim.commands.restack import CommandRestack
+from graphite_shim import profiling
+from graphite_shim.branch_tree import BranchInfo, NonTrunkBranchInfo
+from graphite_shim.commands.base import Command, positive_int
+from graphite_shim.commands.restack import CommandRestack, ReplayedBranch
 from graphite_shim.exception import UserError
+from graphite_shim.git import GitClientError, RefTransaction
+from graphite_shim.replay import Replayer
+from graphite_shim.squash_cache import SquashCache, TrunkPatchIndex
 from graphite_shim.utils.term import print, suppress_output
 
 
 @dataclasses.dataclass(frozen=True)
 class SyncArgs:
     restack: bool
+    jobs: int | None
 
 
 class CommandSync(Command[SyncArgs]):
@@ -21,9 +27,11 @@ class CommandSync(Command[SyncArgs]):
 
     def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], SyncArgs]:
         parser.add_argument("--no-restack", dest="restack", action="store_false")
+        parser.add_argument("--jobs", "-j", type=positive_int, default=self._config.max_workers)
 
         return lambda args: SyncArgs(
             restack=args.restack,
+            jobs=args.jobs,
         )
 
     def run(self, args: SyncArgs) -> None:
@@ -31,67 +39,157 @@ class CommandSync(Command[SyncArgs]):
         trunk = self._config.trunk
 
         print("@(blue)Fetching from remote...")
-        self._git.run(["fetch"])
-        self._update_trunk(curr=curr, trunk=trunk)
+        with profiling.span("sync: fetch"):
+            self._git.run(["fetch"])
+        with profiling.span("sync: update trunk"):
+            self._update_trunk(curr=curr, trunk=trunk)
 
         if args.restack:
             print("\n@(blue)Restacking branches...")
-            for branch in self._store.get_children(trunk):
-                targets = list(self._store.get_stack(branch.name, include_trunk=False))
-                try:
-                    print(f"@(yellow)Restacking {branch.name}...", end="")
-                    sys.stdout.flush()
-                    with suppress_output():
-                        CommandRestack._restack(self, targets=targets)
-                    print(" @(green)OK")
-                except UserError:
-                    print(" @(red)FAIL@(reset) - skipping...")
-                    self._git.run(["rebase", "--abort"])
-                    CommandRestack._reset(self)
-                except Exception as e:
-                    print(f" @(red)ERROR@(reset)\n{str(e).strip()}")
-                    self._git.run(["rebase", "--abort"], capture_output=True, check=False)
-                    with contextlib.suppress(Exception):
-                        CommandRestack._reset(self)
+            with profiling.span("sync: restack"):
+                self._restack_stacks(trunk=trunk, max_workers=args.jobs)
 
         print("\n@(blue)Cleaning up merged branches...")
-        merged_branches = list(self._git.get_merged_branches(trunk))
+        with profiling.span("sync: find merged branches"):
+            squash_cache = SquashCache.load(git_dir=self._git.git_common_dir)
+            patch_index = TrunkPatchIndex.load(git_dir=self._git.git_common_dir)
+            merged_branches = list(
+                self._git.get_merged_branches(
+                    trunk,
+                    max_workers=args.jobs,
+                    cache=squash_cache,
+                    patch_index=patch_index,
+                )
+            )
+            squash_cache.save()
+            patch_index.save()
         if merged_branches:
             for merged_branch in merged_branches:
                 print(f"- {merged_branch}")
-            if curr in merged_branches:
-                self._git.run(["switch", trunk])
-            self._git.run(["branch", "-D", *merged_branches])
+            with profiling.span("sync: delete merged branches"):
+                if curr in merged_branches:
+                    self._git.run(["switch", trunk])
+                self._delete_branches(merged_branches)
 
         print("\n@(blue)Cleaning up old branches from cache...")
-        branches = set(self._git.query(["branch", "--format=%(refname:short)"]).splitlines())
-        for branch in self._store.get_branches():
-            if branch.name not in branches:
-                self._store.remove_branch(branch.name)
+        with profiling.span("sync: clean up cache"):
+            branches = set(self._git.get_branches())
+            for branch in self._store.get_branches():
+                if branch.name not in branches:
+                    self._store.remove_branch(branch.name)
+
+    def _restack_stacks(self, *, trunk: str, max_workers: int | None) -> None:
+        """
+        Restack each stack off of trunk. Stacks are independent, so they're
+        replayed in memory concurrently, then moved in one transaction.
+        Anything that can't be replayed in memory is rebased one stack at a
+        time, as usual.
+        """
+        stacks = {
+            root.name: list(self._store.get_stack(root.name, include_trunk=False))
+            for root in self._store.get_children(trunk)
+        }
+        with suppress_output():
+            pending = CommandRestack._prune_targets(self, targets=[b for targets in stacks.values() for b in targets])
+        stack_roots = {branch.name: root for root, targets in stacks.items() for branch in targets}
+        pending_stacks: dict[str, list[BranchInfo]] = {}
+        for branch in pending:
+            pending_stacks.setdefault(stack_roots[branch.name], []).append(branch)
+
+        # stack root => branches replayed in memory, in order
+        replayed: dict[str, list[ReplayedBranch]] = {}
+        if pending_stacks and Replayer.create(git=self._git) is not None:
+            skip = CommandRestack._get_other_worktree_branches(self)
+
+            def replay(targets: list[BranchInfo]) -> list[ReplayedBranch]:
+                branches = [branch for branch in targets if isinstance(branch, NonTrunkBranchInfo)]
+                # Replayer caches trees, so don't share it between threads
+                return CommandRestack._replay(self, replayer=Replayer(git=self._git), targets=branches, skip=skip)
+
+            with (
+                profiling.span("sync: replay stacks", num_stacks=len(pending_stacks)),
+                concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor,
+            ):
+                replayed = dict(zip(pending_stacks, executor.map(replay, pending_stacks.values()), strict=True))
+
+            # in stack order, so the store is updated deterministically
+            try:
+                applied = CommandRestack._apply_replayed(
+                    self, replayed=[b for branches in replayed.values() for b in branches]
+                )
+            except GitClientError:
+                # the transaction is atomic, so nothing moved; rebase as usual instead
+                applied = False
+            if not applied:
+                replayed = {}
+
+        for root in stacks:
+            print(f"@(yellow)Restacking {root}...", end="")
+            sys.stdout.flush()
+
+            num_replayed = len(replayed.get(root, []))
+            targets = pending_stacks.get(root, [])[num_replayed:]
+            if len(targets) == 0:
+                print(" @(green)OK")
+                continue
+
+            try:
+                with suppress_output():
+                    CommandRestack._restack(self, targets=targets)
+                print(" @(green)OK")
+            except UserError:
+                print(" @(red)FAIL@(reset) - skipping...")
+                self._git.run(["rebase", "--abort"])
+                CommandRestack._reset(self)
+            except Exception as e:
+                print(f" @(red)ERROR@(reset)\n{str(e).strip()}")
+                self._git.run(["rebase", "--abort"], capture_output=True, check=False)
+                with contextlib.suppress(Exception):
+                    CommandRestack._reset(self)
+
+    def _delete_branches(self, branches: Sequence[str]) -> None:
+        """
+        Delete the given branches in one transaction, like `git branch -D`,
+        skipping any that are checked out in another worktree or no longer exist.
+        """
+        worktree_branches = self._git.get_worktree_branches()
+        heads = self._git.get_refs("refs/heads/")
+
+        transaction = RefTransaction()
+        deleted = []
+        for branch in branches:
+            if worktree := worktree_branches.get(branch):
+                print(f"@(yellow)WARNING: {branch} not deleted, checked out in {worktree}")
+                continue
+            if (sha := heads.get(f"refs/heads/{branch}")) is None:
+                continue
+            transaction.delete(f"refs/heads/{branch}", old=sha)
+            deleted.append(branch)
+        self._git.update_refs(transaction, message="gt sync")
+
+        # `git branch -D` also removes the branch's config, e.g. its upstream
+        proc = self._git.run(["config", "--name-only", "--get-regexp", r"^branch\."], capture_output=True, check=False)
+        configured = {key.removeprefix("branch.").rsplit(".", 1)[0] for key in proc.stdout.splitlines()}
+        for branch in deleted:
+            if branch in configured:
+                self._git.run(["config", "--remove-section", f"branch.{branch}"])
 
     def _update_trunk(self, *, curr: str, trunk: str) -> None:
-        old_sha = self._git.query(["rev-parse", f"refs/heads/{trunk}"])
-        new_sha = self._git.query(["rev-parse", f"refs/remotes/origin/{trunk}"])
+        old_sha, new_sha = self._git.resolve_commits([f"refs/heads/{trunk}", f"refs/remotes/origin/{trunk}"])
 
         if old_sha == new_sha:
             print(f"@(green){trunk}@(reset) is up to date.")
         elif self._git.is_ff(from_=old_sha, to=new_sha):
-            if trunk_worktree := self._find_worktree_for_branch(trunk):
+            if trunk_worktree := self._git.get_worktree_branches().get(trunk):
                 in_worktree = ["-C", trunk_worktree.as_posix()]
                 if self._git.query([*in_worktree, "status", "--porcelain"]) != "":
                     print(f"@(yellow)WARNING: {trunk} not updated, uncommitted changes found")
                     return
                 self._git.run([*in_worktree, "reset", "--hard", new_sha])
             else:
-                self._git.run(["update-ref", f"refs/heads/{trunk}", new_sha, old_sha])
+                transaction = RefTransaction()
+                transaction.update(f"refs/heads/{trunk}", new_sha, old=old_sha)
+                self._git.update_refs(transaction, message="gt sync")
             print(f"@(green){trunk}@(reset) fast-forwarded to {new_sha}")
         else:
             print(f"@(yellow)WARNING: {trunk} not updated, not a fast-forward")
-
-    def _find_worktree_for_branch(self, branch: str) -> Path | None:
-        out = self._git.query(["worktree", "list", "--porcelain"])
-        for section in out.split("\n\n"):
-            parts = {k: v for line in section.splitlines() if " " in line for k, v in [line.split(" ", 1)]}
-            if parts.get("branch") == f"refs/heads/{branch}":
-                return Path(parts["worktree"])
-        return None
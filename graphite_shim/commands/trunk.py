@@ -1,10 +1,15 @@
-import argparse
+from __future__ import annotations
+
 import dataclasses
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING
 
 from graphite_shim.commands.base import Command
 from graphite_shim.utils.term import print
 
+if TYPE_CHECKING:
+    import argparse
+
 
 @dataclasses.dataclass(frozen=True)
 class TrunkArgs:
@@ -17,5 +22,8 @@ class CommandTrunk(Command[TrunkArgs]):
     def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], TrunkArgs]:
         return lambda args: TrunkArgs()
 
+    def fast_parse(self, args: Sequence[str]) -> TrunkArgs | None:
+        return TrunkArgs() if not args else None
+
     def run(self, args: TrunkArgs) -> None:
         print(self._config.trunk)
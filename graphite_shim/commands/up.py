@@ -4,6 +4,7 @@ from collections.abc import Callable
 from typing import Any
 
 from graphite_shim.commands.base import Command
+from graphite_shim.exception import UserError
 
 
 @dataclasses.dataclass(frozen=True)
@@ -26,6 +27,9 @@ class CommandUp(Command[UpArgs]):
 
     @staticmethod
     def _run(cmd: Command[Any], args: UpArgs) -> None:
+        if args.steps < 1:
+            raise UserError(f"Expected a positive number of steps, got: {args.steps}")
+
         curr = cmd._git.get_curr_branch()
         branch = cmd._store.get_branch(curr)
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import dataclasses
+import enum
 import functools
 import json
 import typing
@@ -64,12 +65,26 @@ class UseGraphiteConfig:
     pass
 
 
+class StoreFormat(enum.StrEnum):
+    JSON = "json"
+    # see graphite_shim/binary_store.py
+    BINARY = "binary"
+
+
 @dataclasses.dataclass(frozen=True, kw_only=True)
 class Config:
     config_dir: Path
 
     trunk: str
 
+    # Max number of threads for parallelizable work (None = Python's default)
+    max_workers: int | None = None
+
+    store_format: StoreFormat = StoreFormat.JSON
+
+    # Remotes to submit to
+    remotes: Sequence[str] = ("origin",)
+
     @functools.cached_property
     def aliases(self) -> Mapping[str, Sequence[str]]:
         return load_aliases()
@@ -92,11 +107,17 @@ class Config:
         return cls(
             config_dir=config_dir,
             trunk=data["trunk"],
+            max_workers=data.get("max_workers"),
+            store_format=StoreFormat(data.get("store_format", StoreFormat.JSON)),
+            remotes=tuple(data.get("remotes", ["origin"])),
         )
 
     def serialize(self) -> dict[str, Any]:
         return {
             "trunk": self.trunk,
+            "max_workers": self.max_workers,
+            "store_format": self.store_format.value,
+            "remotes": list(self.remotes),
         }
 
 
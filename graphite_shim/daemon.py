@@ -0,0 +1,255 @@
+"""
+An opt-in, per-repo server that runs gt commands in a long-lived process,
+so that commands don't pay for interpreter startup, imports, or reloading
+the store every time. Start it with `gt daemon start`; the `gt` script
+forwards commands to it with graphite_shim/client.py.
+
+The daemon handles one command at a time, so commands run through it are
+serialized. State kept between commands is revalidated on every command:
+the store is reloaded if its files changed, and refs are always read from
+disk.
+
+Usage: python -m graphite_shim.daemon GIT_COMMON_DIR
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from collections.abc import Generator, Sequence
+from pathlib import Path
+from typing import Any
+
+import graphite_shim
+from graphite_shim.__main__ import handle_errors, run
+from graphite_shim.client import EXIT_CODE, EXIT_FALLBACK, SOCKET_FILE, recv_message
+from graphite_shim.config import Config, ConfigManager
+from graphite_shim.git import GitClient
+from graphite_shim.store import StoreCache
+
+LOG_FILE = ".graphite_shim/daemon.log"
+
+# Shut down after being idle for this long
+IDLE_TIMEOUT = 30 * 60
+
+
+class Daemon:
+    def __init__(self, *, git_common_dir: Path) -> None:
+        self._git_common_dir = git_common_dir
+        self._socket_file = git_common_dir / SOCKET_FILE
+        self._store_cache = StoreCache()
+        # cwd => client. Keeps caches like parsed packed-refs warm.
+        self._git_clients: dict[Path, GitClient] = {}
+        self._source_key = _get_source_key()
+
+    def serve(self) -> None:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            self._socket_file.unlink(missing_ok=True)
+            server.bind(str(self._socket_file))
+            server.listen()
+            server.settimeout(IDLE_TIMEOUT)
+            socket_ino = self._socket_file.stat().st_ino
+            _log(f"Listening on {self._socket_file}")
+
+            try:
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except TimeoutError:
+                        _log("Idle, shutting down")
+                        return
+
+                    with conn:
+                        conn.settimeout(None)
+                        try:
+                            should_continue = self._handle(conn)
+                        except KeyboardInterrupt:
+                            # client went away just as the command finished
+                            should_continue = True
+                        except Exception as e:
+                            _log(f"Error handling request: {e!r}")
+                            should_continue = True
+                    if not should_continue:
+                        return
+            finally:
+                for git in self._git_clients.values():
+                    git.close()
+                # only clean up the socket if another daemon hasn't replaced it
+                with contextlib.suppress(FileNotFoundError):
+                    if self._socket_file.stat().st_ino == socket_ino:
+                        self._socket_file.unlink()
+
+    def _handle(self, conn: socket.socket) -> bool:
+        """Handle a request, returning False if the daemon should shut down."""
+        message = recv_message(conn)
+        if message is None:
+            return True
+        request, fds = message
+
+        try:
+            match request["op"]:
+                case "ping":
+                    conn.sendall(EXIT_CODE.pack(0))
+                    return True
+                case "stop":
+                    conn.sendall(EXIT_CODE.pack(0))
+                    _log("Stopped")
+                    return False
+                case "run":
+                    if _get_source_key() != self._source_key:
+                        # gt was upgraded; let the client run it with the new code
+                        conn.sendall(EXIT_CODE.pack(EXIT_FALLBACK))
+                        _log("Source changed, shutting down")
+                        return False
+
+                    exit_code = self._run(request, fds=fds, conn=conn)
+                    conn.sendall(EXIT_CODE.pack(exit_code))
+                    return True
+                case op:
+                    raise ValueError(f"Unknown op: {op}")
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _run(self, request: dict[str, Any], *, fds: Sequence[int], conn: socket.socket) -> int:
+        cwd = Path(request["cwd"])
+        git = self._git_clients.get(cwd)
+        if git is None:
+            git = self._git_clients[cwd] = GitClient(cwd=cwd)
+        if git.git_common_dir.resolve() != self._git_common_dir.resolve():
+            return EXIT_FALLBACK
+
+        # Only handle the shim; other configs would exec graphite or
+        # prompt for setup, which should happen in the client
+        config = ConfigManager.load(config_dir=self._git_common_dir)
+        if not isinstance(config, Config):
+            return EXIT_FALLBACK
+
+        try:
+            with (
+                _command_context(argv=request["argv"], cwd=cwd, env=request["env"], fds=fds),
+                _interrupt_on_disconnect(conn),
+            ):
+                try:
+                    with handle_errors():
+                        run(git=git, config=config, store_cache=self._store_cache)
+                except SystemExit as e:
+                    return e.code if isinstance(e.code, int) else 1
+                return 0
+        finally:
+            self._store_cache.refresh(store_dir=self._git_common_dir)
+            # don't keep a `git cat-file` process around between commands
+            git.close()
+
+
+@contextlib.contextmanager
+def _command_context(
+    *,
+    argv: list[str],
+    cwd: Path,
+    env: dict[str, str],
+    fds: Sequence[int],
+) -> Generator[None]:
+    """Set up the process to look like the client's process while running a command."""
+    orig_argv = sys.argv
+    orig_cwd = os.getcwd()
+    orig_env = dict(os.environ)
+    orig_streams = (sys.stdin, sys.stdout, sys.stderr)
+    # stdin/stdout/stderr at the OS level, so that git subprocesses inherit them
+    orig_fds = [os.dup(fd) for fd in range(3)]
+
+    try:
+        sys.argv = argv
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        for fd, client_fd in enumerate(fds):
+            os.dup2(client_fd, fd)
+        sys.stdin = open(0, closefd=False)  # noqa: SIM115
+        sys.stdout = open(1, "w", buffering=1, closefd=False)  # noqa: SIM115
+        sys.stderr = open(2, "w", buffering=1, closefd=False)  # noqa: SIM115
+
+        yield
+    finally:
+        for stream in [sys.stdin, sys.stdout, sys.stderr]:
+            if stream not in orig_streams:
+                with contextlib.suppress(OSError):
+                    stream.close()
+        sys.stdin, sys.stdout, sys.stderr = orig_streams
+        for fd, orig_fd in enumerate(orig_fds):
+            os.dup2(orig_fd, fd)
+            os.close(orig_fd)
+        os.environ.clear()
+        os.environ.update(orig_env)
+        os.chdir(orig_cwd)
+        sys.argv = orig_argv
+
+
+@contextlib.contextmanager
+def _interrupt_on_disconnect(conn: socket.socket) -> Generator[None]:
+    """
+    Interrupt the command (like Ctrl-C) if the client goes away.
+
+    The interrupt is only raised while the command is running, and at most
+    once, so a late interrupt can't cut short restoring the process state
+    afterwards (see _command_context).
+    """
+    interruptible = True
+
+    def on_sigint(signum: int, frame: Any) -> None:
+        nonlocal interruptible
+        if interruptible:
+            interruptible = False
+            raise KeyboardInterrupt
+
+    # written to when the command finishes, to wake up the watcher
+    done_r, done_w = os.pipe()
+
+    def watch() -> None:
+        readable, _, _ = select.select([conn, done_r], [], [])
+        # the client doesn't send anything else, so this means it disconnected
+        if done_r not in readable:
+            main_thread_id = threading.main_thread().ident
+            if main_thread_id is not None:
+                signal.pthread_kill(main_thread_id, signal.SIGINT)
+
+    orig_handler = signal.signal(signal.SIGINT, on_sigint)
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        try:
+            yield
+        finally:
+            interruptible = False
+    finally:
+        os.write(done_w, b"\0")
+        watcher.join()
+        os.close(done_r)
+        os.close(done_w)
+        signal.signal(signal.SIGINT, orig_handler)
+
+
+def _get_source_key() -> float:
+    """Get a key that changes when graphite_shim's source code changes."""
+    source_dir = Path(graphite_shim.__file__).parent
+    return max(path.stat().st_mtime for path in source_dir.rglob("*.py"))
+
+
+def _log(msg: str) -> None:
+    sys.stderr.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
+    sys.stderr.flush()
+
+
+def main() -> None:
+    git_common_dir = Path(sys.argv[1])
+    Daemon(git_common_dir=git_common_dir).serve()
+
+
+if __name__ == "__main__":
+    main()
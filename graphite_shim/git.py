@@ -1,16 +1,30 @@
 from __future__ import annotations
 
+import concurrent.futures
+import contextlib
 import dataclasses
 import functools
 import re
 import shlex
 import subprocess
 import sys
-from collections.abc import Iterator
+import tempfile
+import threading
+from collections.abc import Iterator, Mapping, Sequence
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
+from graphite_shim import profiling
 from graphite_shim.exception import UserError
+from graphite_shim.refs import INVALID_REF_RE, RefReader, RefReaderError
+from graphite_shim.snapshot import (
+    FOR_EACH_REF_FORMAT,
+    SNAPSHOT_PREFIXES,
+    RefsFingerprint,
+    RepoSnapshot,
+    get_refs_fingerprint,
+)
+from graphite_shim.squash_cache import SquashCache, TrunkPatchIndex
 
 
 def _git(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess[str]:
@@ -22,24 +36,153 @@ def _git(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess[str]:
     if "capture_output" not in kwargs:
         kwargs.setdefault("stdout", sys.stdout)
         kwargs.setdefault("stderr", sys.stderr)
-    try:
-        return subprocess.run(["git", *args], **kwargs)
-    except subprocess.CalledProcessError as e:
-        msg = f"command returned exit code {e.returncode}: {shlex.join(e.cmd)}"
-        if e.stdout:
-            msg += f"\n{e.stdout}"
-        if e.stderr:
-            msg += f"\n{e.stderr}"
-        raise GitClientError(msg) from None
+    with profiling.git_span(args) as span_args:
+        try:
+            proc = subprocess.run(["git", *args], **kwargs)
+        except subprocess.CalledProcessError as e:
+            span_args["exit_code"] = e.returncode
+            msg = f"command returned exit code {e.returncode}: {shlex.join(e.cmd)}"
+            if e.stdout:
+                msg += f"\n{e.stdout}"
+            if e.stderr:
+                msg += f"\n{e.stderr}"
+            raise GitClientError(msg) from None
+        span_args["exit_code"] = proc.returncode
+        return proc
+
+
+def _git_pipe(args: list[str], into: list[str], *, cwd: Path) -> Iterator[str]:
+    """Stream the output of `git <args> | git <into>`, line by line."""
+    with profiling.git_span([*args, "|", "git", *into]) as span_args:
+        yield from _git_pipe_impl(args, into, cwd=cwd, span_args=span_args)
+
+
+def _git_pipe_impl(args: list[str], into: list[str], *, cwd: Path, span_args: dict[str, Any]) -> Iterator[str]:
+    # stderr goes to files rather than pipes: we only read it once the
+    # processes exit, and a full stderr pipe would block them before then
+    with tempfile.TemporaryFile() as source_stderr, tempfile.TemporaryFile() as sink_stderr:
+        source = subprocess.Popen(["git", *args], stdout=subprocess.PIPE, stderr=source_stderr, cwd=cwd)
+        sink = subprocess.Popen(
+            ["git", *into],
+            stdin=source.stdout,
+            stdout=subprocess.PIPE,
+            stderr=sink_stderr,
+            text=True,
+            cwd=cwd,
+        )
+        assert source.stdout is not None and sink.stdout is not None
+        source.stdout.close()  # allow source to get SIGPIPE if sink exits early
+
+        try:
+            yield from sink.stdout
+        finally:
+            sink.stdout.close()
+            results = [
+                (args, source.wait(), _read_file(source_stderr)),
+                (into, sink.wait(), _read_file(sink_stderr)),
+            ]
+
+    span_args["exit_code"] = next((returncode for _, returncode, _ in results if returncode != 0), 0)
+    for proc_args, returncode, stderr in results:
+        if returncode != 0:
+            raise GitClientError(f"command returned exit code {returncode}: git {shlex.join(proc_args)}\n{stderr}")
+
+
+def _read_file(f: IO[bytes]) -> str:
+    f.seek(0)
+    return f.read().decode(errors="replace")
 
 
 class GitClientError(Exception):
     pass
 
 
+class RefTransaction:
+    """
+    A batch of ref changes, applied atomically with one `git update-ref
+    --stdin` by GitClient.update_refs. If any ref doesn't have its expected
+    old value, none of the refs are changed.
+    """
+
+    def __init__(self) -> None:
+        self._commands: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def create(self, ref: str, new: str) -> None:
+        """Create the ref, which must not exist yet."""
+        self._commands.append(f"create {ref} {new}")
+
+    def update(self, ref: str, new: str, *, old: str | None = None) -> None:
+        """Point the ref at `new`, if it's currently at `old` (when given)."""
+        self._commands.append(f"update {ref} {new} {old or ''}".rstrip())
+
+    def delete(self, ref: str, *, old: str | None = None) -> None:
+        """Delete the ref, if it's currently at `old` (when given)."""
+        self._commands.append(f"delete {ref} {old or ''}".rstrip())
+
+    def to_stdin(self) -> str:
+        commands = ["start", *self._commands, "prepare", "commit"]
+        return "".join(f"{command}\n" for command in commands)
+
+
+class _CatFileBatch:
+    """
+    A long-lived `git cat-file --batch-check` process, for resolving objects
+    without forking a new git process for every lookup.
+    """
+
+    # Max number of requests to write before reading responses, so that git
+    # never blocks on a full stdout pipe while we're blocked writing stdin.
+    CHUNK_SIZE = 256
+
+    def __init__(self, *, cwd: Path) -> None:
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch-check=%(objectname)"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            cwd=cwd,
+        )
+        self._lock = threading.Lock()
+
+    def resolve(self, revs: Sequence[str]) -> list[str | None]:
+        """Resolve the given revisions, returning None for missing objects."""
+        assert self._proc.stdin is not None
+        assert self._proc.stdout is not None
+
+        results: list[str | None] = []
+        with self._lock, profiling.git_span(["cat-file", "--batch-check"]) as span_args:
+            span_args["num_objects"] = len(revs)
+            for i in range(0, len(revs), self.CHUNK_SIZE):
+                chunk = revs[i : i + self.CHUNK_SIZE]
+                self._proc.stdin.write("".join(f"{rev}\n" for rev in chunk))
+                self._proc.stdin.flush()
+                for rev in chunk:
+                    line = self._proc.stdout.readline()
+                    if not line:
+                        raise BrokenPipeError("git cat-file exited unexpectedly")
+                    line = line.rstrip("\n")
+                    results.append(None if line == f"{rev} missing" or line == f"{rev} ambiguous" else line)
+        return results
+
+    def close(self) -> None:
+        if self._proc.stdin is not None:
+            self._proc.stdin.close()
+        self._proc.wait()
+
+
+_BATCH_LOCK = threading.Lock()
+
+
 @dataclasses.dataclass(frozen=True)
 class GitClient:
     cwd: Path
+    # Resolve objects through a persistent `git cat-file` process,
+    # falling back to `git rev-parse` if unavailable
+    use_batch: bool = True
 
     @functools.cached_property
     def root(self) -> Path:
@@ -48,25 +191,65 @@ class GitClient:
 
     @functools.cached_property
     def git_common_dir(self) -> Path:
-        # shortcut, to avoid shelling out
-        if (self.cwd / ".git").is_dir(follow_symlinks=False):
-            return self.cwd / ".git"
-
-        proc = _git(["rev-parse", "--git-common-dir"], capture_output=True, cwd=self.cwd)
-        return Path(proc.stdout.strip())
+        # shortcut, to avoid shelling out. Linked worktrees point to the
+        # common dir with a `commondir` file in their git dir.
+        try:
+            common_dir = (self.git_dir / "commondir").read_text().strip()
+        except FileNotFoundError:
+            return self.git_dir
+        return (self.git_dir / common_dir).resolve()
 
     @functools.cached_property
     def git_dir(self) -> Path:
         # shortcut, to avoid shelling out
-        if (self.cwd / ".git").is_dir(follow_symlinks=False):
-            return self.cwd / ".git"
-        elif (self.cwd / ".git").is_file():
-            git_content = (self.cwd / ".git").read_text()
+        dot_git = self.cwd / ".git"
+        if dot_git.is_dir() and not dot_git.is_symlink():
+            return dot_git
+        elif dot_git.is_file():
+            git_content = dot_git.read_text()
             if m := re.match(r"gitdir: (?P<path>.+)", git_content):
-                return Path(m.group("path"))
+                return self.cwd / m.group("path").strip()
 
         proc = _git(["rev-parse", "--git-dir"], capture_output=True, cwd=self.cwd)
-        return Path(proc.stdout.strip())
+        return self.cwd / proc.stdout.strip()
+
+    @functools.cached_property
+    def version(self) -> tuple[int, int]:
+        """The (major, minor) version of git."""
+        out = _git(["--version"], capture_output=True).stdout
+        m = re.search(r"(?P<major>\d+)\.(?P<minor>\d+)", out)
+        if not m:
+            raise GitClientError(f"Could not parse git version: {out}")
+        return (int(m.group("major")), int(m.group("minor")))
+
+    @functools.cached_property
+    def refs(self) -> RefReader:
+        return RefReader(git_dir=self.git_dir, common_dir=self.git_common_dir)
+
+    @functools.cached_property
+    def _snapshots(self) -> dict[RefsFingerprint, RepoSnapshot]:
+        # holds at most the latest snapshot
+        return {}
+
+    @functools.cached_property
+    def _batch(self) -> _CatFileBatch | None:
+        # cached_property doesn't lock, and this is first used from worker
+        # threads (e.g. restacking in sync), so only start one process
+        with _BATCH_LOCK:
+            if "_batch" in self.__dict__:
+                batch: _CatFileBatch | None = self.__dict__["_batch"]
+                return batch
+            batch = None
+            if self.use_batch:
+                with contextlib.suppress(OSError):
+                    batch = _CatFileBatch(cwd=self.cwd)
+            self.__dict__["_batch"] = batch
+            return batch
+
+    def close(self) -> None:
+        """Clean up any long-lived git processes."""
+        if batch := self.__dict__.pop("_batch", None):
+            batch.close()
 
     # ----- Primary API ----- #
 
@@ -96,14 +279,110 @@ class GitClient:
         return proc.returncode == 0
 
     def does_branch_exist(self, name: str) -> bool:
+        if not name or INVALID_REF_RE.search(name):
+            # not a valid branch name, and reading it could escape refs/heads/
+            return False
+        with contextlib.suppress(RefReaderError):
+            return self.refs.read_ref(f"refs/heads/{name}") is not None
+        if (resolved := self._batch_resolve([f"refs/heads/{name}"])) is not None:
+            return resolved[0] is not None
         return self.query(["branch", "--list", name]) != ""
 
+    def get_branches(self) -> list[str]:
+        """Get the names of all local branches."""
+        return list(self.get_snapshot().branches)
+
+    def get_refs(self, prefix: str) -> Mapping[str, str]:
+        """Get all refs with the given prefix (e.g. "refs/remotes/origin/"), mapped to their object IDs."""
+        if prefix.startswith(SNAPSHOT_PREFIXES):
+            return self.get_snapshot().get_refs(prefix)
+        with contextlib.suppress(RefReaderError):
+            return self.refs.list_refs(prefix)
+        out = self.query(["for-each-ref", "--format=%(refname) %(objectname)", prefix])
+        return {ref: sha for line in out.splitlines() for ref, sha in [line.split(" ", 1)]}
+
+    def get_snapshot(self) -> RepoSnapshot:
+        """
+        Get all branches and remote-tracking refs. The snapshot is reused
+        until the refs change, including across commands in the daemon.
+        """
+        # before reading, so that changes made while reading invalidate it
+        fingerprint = get_refs_fingerprint(self.git_common_dir)
+        if (snapshot := self._snapshots.get(fingerprint)) is None:
+            out = self.query(["for-each-ref", f"--format={FOR_EACH_REF_FORMAT}", *SNAPSHOT_PREFIXES])
+            snapshot = RepoSnapshot.parse(out)
+            self._snapshots.clear()
+            self._snapshots[fingerprint] = snapshot
+        return snapshot
+
+    def update_refs(self, transaction: RefTransaction, *, message: str | None = None) -> None:
+        """Apply the given changes in one transaction, recording `message` in the reflogs."""
+        if len(transaction) == 0:
+            return
+        self.run(
+            ["update-ref", *(["-m", message] if message else []), "--stdin"],
+            input=transaction.to_stdin(),
+            capture_output=True,
+        )
+
+    def get_worktree_branches(self) -> dict[str, Path]:
+        """Get the branches checked out in any worktree, mapped to the worktree's path."""
+        out = self.query(["worktree", "list", "--porcelain"])
+        branches = {}
+        for section in out.split("\n\n"):
+            parts = {k: v for line in section.splitlines() if " " in line for k, v in [line.split(" ", 1)]}
+            if "branch" in parts:
+                branches[parts["branch"].removeprefix("refs/heads/")] = Path(parts["worktree"])
+        return branches
+
     def resolve_commit(self, branch: str) -> str:
-        return self.query(["rev-parse", branch])
+        return self.resolve_commits([branch])[0]
+
+    def resolve_commits(self, revs: Sequence[str]) -> list[str]:
+        """Resolve multiple revisions at once."""
+        resolved = [self._native_resolve(rev) for rev in revs]
+
+        # Resolve anything that isn't a plain ref with git
+        unresolved = [rev for rev, sha in zip(revs, resolved, strict=True) if sha is None]
+        batch_resolved = iter(self._batch_resolve(unresolved) or [None] * len(unresolved))
+        resolved = [sha if sha is not None else next(batch_resolved) for sha in resolved]
+
+        return [
+            # Fall back to rev-parse, for a proper error message
+            sha if sha is not None else self.query(["rev-parse", rev])
+            for rev, sha in zip(revs, resolved, strict=True)
+        ]
+
+    def _native_resolve(self, rev: str) -> str | None:
+        """Resolve the given revision by reading refs directly, if possible."""
+        try:
+            return self.refs.resolve(rev)
+        except RefReaderError:
+            return None
 
-    def get_merged_branches(self, trunk: str) -> Iterator[str]:
+    def _batch_resolve(self, revs: Sequence[str]) -> list[str | None] | None:
+        """Resolve the given revisions with the batch process, if available."""
+        if not revs or self._batch is None or any("\n" in rev for rev in revs):
+            return None
+        try:
+            return self._batch.resolve(revs)
+        except (OSError, ValueError):
+            # process died; use the subprocess path for the rest of the invocation
+            self.__dict__["_batch"] = None
+            return None
+
+    def get_merged_branches(
+        self,
+        trunk: str,
+        *,
+        max_workers: int | None = None,
+        cache: SquashCache | None = None,
+        patch_index: TrunkPatchIndex | None = None,
+    ) -> Iterator[str]:
         def get_branches(*extra_args: str) -> list[str]:
-            return self.query(["branch", "--format=%(refname:short)", *extra_args]).splitlines()
+            # not %(refname:short), which disambiguates e.g. as `heads/foo` if there's a tag `foo`
+            refs = self.query(["branch", "--format=%(refname)", *extra_args]).splitlines()
+            return [ref.removeprefix("refs/heads/") for ref in refs]
 
         # merged branches
         for branch in get_branches("--merged", trunk):
@@ -112,11 +391,92 @@ class GitClient:
             yield branch
 
         # squashed branches
-        for branch in get_branches("--no-merged", trunk):
+        unmerged_branches = get_branches("--no-merged", trunk)
+        trunk_commit, *branch_commits = self.resolve_commits(
+            [trunk, *(f"refs/heads/{branch}" for branch in unmerged_branches)]
+        )
+        commits = dict(zip(unmerged_branches, branch_commits, strict=True))
+
+        verdicts: dict[str, bool | None] = {
+            branch: cache.get(branch, branch_commit=commit, trunk_commit=trunk_commit) if cache is not None else None
+            for branch, commit in commits.items()
+        }
+        to_check = [branch for branch, verdict in verdicts.items() if verdict is None]
+
+        if patch_index is None:
+            patch_index = TrunkPatchIndex(git_dir=self.git_common_dir, trunk_commit=None, patch_ids={})
+        if to_check:
+            self._update_patch_index(patch_index, trunk_commit=trunk_commit)
+
+        def is_squashed(branch: str) -> bool:
+            # Equivalent to checking `git cherry trunk <squashed branch>`, based on
             # https://github.com/not-an-aardvark/git-delete-squashed
-            merge_base = self.query(["merge-base", trunk, branch])
-            tree_sha = self.query(["rev-parse", f"{branch}^{{tree}}"])
-            test_commit = self.run(["commit-tree", tree_sha, "-p", merge_base, "-m", "_"], capture_output=True)
-            test_cherry_pick = self.run(["cherry", trunk, test_commit.stdout.strip()], capture_output=True)
-            if test_cherry_pick.stdout.startswith("-"):
+            branch_commit = commits[branch]
+            merge_base = self.query(["merge-base", trunk, branch_commit])
+            patch_id = self.get_patch_id(merge_base, branch_commit)
+            if patch_id is None:
+                return False
+            return any(
+                # commits before the merge base are not part of `git cherry`'s search
+                not self.is_ff(from_=commit, to=merge_base)
+                for commit in patch_index.find(patch_id)
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for branch, squashed in zip(to_check, executor.map(is_squashed, to_check), strict=True):
+                verdicts[branch] = squashed
+                if cache is not None:
+                    cache.set(branch, branch_commit=commits[branch], trunk_commit=trunk_commit, is_squashed=squashed)
+
+        if cache is not None:
+            cache.prune(unmerged_branches)
+
+        for branch, verdict in verdicts.items():
+            if verdict:
                 yield branch
+
+    def _update_patch_index(self, patch_index: TrunkPatchIndex, *, trunk_commit: str) -> None:
+        """Index the patch IDs of trunk commits added since the index was last updated."""
+        if patch_index.trunk_commit == trunk_commit:
+            return
+
+        if patch_index.trunk_commit is not None and self.is_ff(from_=patch_index.trunk_commit, to=trunk_commit):
+            rev_range = f"{patch_index.trunk_commit}..{trunk_commit}"
+        else:
+            # trunk was rewritten; rebuild from scratch
+            patch_index.patch_ids.clear()
+            rev_range = trunk_commit
+
+        for patch_id, commit in self._iter_patch_ids(["log", "-p", "--no-merges", *PATCH_DIFF_ARGS, rev_range, "--"]):
+            patch_index.add(patch_id, commit)
+        patch_index.trunk_commit = trunk_commit
+
+    def get_patch_id(self, from_: str, to: str) -> str | None:
+        """Get the stable patch ID of the diff between the given commits, or None if there's no diff."""
+        patch_ids = [
+            patch_id for patch_id, _ in self._iter_patch_ids(["diff-tree", "-p", *PATCH_DIFF_ARGS, from_, to, "--"])
+        ]
+        return patch_ids[0] if patch_ids else None
+
+    def _iter_patch_ids(self, diff_args: list[str]) -> Iterator[tuple[str, str]]:
+        for line in _git_pipe(diff_args, ["patch-id", "--stable"], cwd=self.root):
+            patch_id, commit = line.split()
+            yield patch_id, commit
+
+
+# Diff options that affect the patch ID, which must be the same for
+# trunk commits and squashed branches. Porcelain `git log` honors the
+# user's diff.* config while plumbing `git diff-tree` doesn't, so pin
+# everything that changes the patch text.
+PATCH_DIFF_ARGS = [
+    "--no-renames",
+    "--no-color",
+    "--no-ext-diff",
+    "--no-textconv",
+    "--unified=3",
+    "--src-prefix=a/",
+    "--dst-prefix=b/",
+    "--diff-algorithm=myers",
+    "--indent-heuristic",
+    "--no-relative",
+]
@@ -0,0 +1,195 @@
+"""
+Opt-in profiling of where a command spends its time: every git subprocess,
+plus named spans like loading the store or the phases of a command.
+
+Enable with `GT_PROFILE=1` or `gt --profile <command>`, which prints a summary to stderr
+when the command finishes. Set `GT_PROFILE_TRACE=<file>` to also write the
+spans as a Chrome trace, which can be viewed in https://ui.perfetto.dev or
+chrome://tracing.
+
+When disabled, recording a span is a no-op.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+from collections.abc import Generator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from graphite_shim.utils.term import printerr
+
+# Number of slowest git invocations to show in the summary
+NUM_SLOWEST = 10
+MAX_ARGV_WIDTH = 100
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class Span:
+    name: str
+    # "git" for git subprocesses, "phase" for everything else
+    category: str
+    # seconds since the profiler started
+    start: float
+    duration: float
+    thread_id: int
+    args: Mapping[str, Any]
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self._spans: list[Span] = []
+        # git is run from thread pools in some commands
+        self._lock = threading.Lock()
+
+    @property
+    def spans(self) -> Sequence[Span]:
+        return self._spans
+
+    @contextlib.contextmanager
+    def span(self, name: str, *, category: str, args: dict[str, Any]) -> Generator[dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            span = Span(
+                name=name,
+                category=category,
+                start=start - self._start,
+                duration=time.perf_counter() - start,
+                thread_id=threading.get_ident(),
+                args=args,
+            )
+            with self._lock:
+                self._spans.append(span)
+
+    def print_summary(self) -> None:
+        total = time.perf_counter() - self._start
+        git_spans = [span for span in self._spans if span.category == "git"]
+        git_total = sum(span.duration for span in git_spans)
+
+        printerr(f"\n@(bold)Profile:@(reset) {_ms(total)} total, {len(git_spans)} git commands taking {_ms(git_total)}")
+
+        phases = [span for span in self._spans if span.category != "git"]
+        if phases:
+            printerr("\n@(blue)Phases:")
+            # phases that haven't ended yet, to indent nested phases
+            open_phases: list[Span] = []
+            for span in sorted(phases, key=lambda span: span.start):
+                while open_phases and open_phases[-1].start + open_phases[-1].duration <= span.start:
+                    open_phases.pop()
+                printerr(f"{_ms(span.duration):>10}  {'  ' * len(open_phases)}{span.name}")
+                open_phases.append(span)
+
+        if git_spans:
+            # subcommand => (count, total time)
+            by_subcommand: dict[str, tuple[int, float]] = {}
+            for span in git_spans:
+                count, duration = by_subcommand.get(span.name, (0, 0.0))
+                by_subcommand[span.name] = (count + 1, duration + span.duration)
+
+            printerr("\n@(blue)Git commands:")
+            printerr(f"{'total':>10} {'count':>6}  command")
+            for name, (count, duration) in sorted(by_subcommand.items(), key=lambda item: -item[1][1]):
+                printerr(f"{_ms(duration):>10} {count:>6}  {name}")
+
+            printerr("\n@(blue)Slowest git invocations:")
+            for span in sorted(git_spans, key=lambda span: -span.duration)[:NUM_SLOWEST]:
+                argv = " ".join(span.args.get("argv", [span.name]))
+                if len(argv) > MAX_ARGV_WIDTH:
+                    argv = argv[: MAX_ARGV_WIDTH - 3] + "..."
+                exit_code = span.args.get("exit_code")
+                status = "" if exit_code in (0, None) else f" @(red)(exit {exit_code})@(reset)"
+                printerr(f"{_ms(span.duration):>10}  {argv}{status}")
+
+    def write_trace(self, path: Path) -> None:
+        """Write the spans in the Chrome trace event format."""
+        thread_ids: dict[int, int] = {}
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                # small, stable thread IDs, in order of first use
+                "tid": thread_ids.setdefault(span.thread_id, len(thread_ids)),
+                "args": span.args,
+            }
+            for span in sorted(self._spans, key=lambda span: span.start)
+        ]
+        path.write_text(json.dumps({"traceEvents": events}))
+
+
+_profiler: Profiler | None = None
+
+
+@contextlib.contextmanager
+def profiling(*, enabled: bool) -> Generator[None]:
+    """
+    Profile everything run in this context, if enabled (or GT_PROFILE /
+    GT_PROFILE_TRACE are set), printing a summary at the end.
+    """
+    global _profiler
+
+    trace_file = os.environ.get("GT_PROFILE_TRACE")
+    enabled = enabled or trace_file is not None or os.environ.get("GT_PROFILE", "") not in ("", "0")
+    if not enabled or _profiler is not None:
+        yield
+        return
+
+    profiler = _profiler = Profiler()
+    try:
+        yield
+    finally:
+        _profiler = None
+        profiler.print_summary()
+        if trace_file:
+            profiler.write_trace(Path(trace_file))
+            printerr(f"\nWrote trace to {trace_file}")
+
+
+@contextlib.contextmanager
+def span(name: str, **args: Any) -> Generator[dict[str, Any]]:
+    """
+    Record the time spent in this context, if profiling. Yields the span's
+    args, which can be added to before the context exits.
+    """
+    if _profiler is None:
+        yield args
+        return
+    with _profiler.span(name, category="phase", args=args) as span_args:
+        yield span_args
+
+
+@contextlib.contextmanager
+def git_span(argv: Sequence[str]) -> Generator[dict[str, Any]]:
+    """Record a git subprocess, if profiling. Set "exit_code" in the yielded args."""
+    if _profiler is None:
+        yield {}
+        return
+    with _profiler.span(get_git_subcommand(argv), category="git", args={"argv": ["git", *argv]}) as span_args:
+        yield span_args
+
+
+def get_git_subcommand(argv: Sequence[str]) -> str:
+    """Get the subcommand from the arguments to git, e.g. `-C dir log` => `log`."""
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-c", "-C"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    # e.g. `git --version`
+    return argv[0] if argv else "git"
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms"
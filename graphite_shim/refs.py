@@ -0,0 +1,141 @@
+"""
+Read git refs directly from the git directory, to avoid spawning `git` for
+simple lookups.
+
+Only the files backend is supported (loose refs + packed-refs). Anything
+this module can't answer definitively raises RefReaderError, and callers
+should fall back to asking git.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import os
+import re
+from collections.abc import Mapping
+from pathlib import Path
+
+# https://git-scm.com/docs/gitrevisions#Documentation/gitrevisions.txt-emltrefnamegtemegemmasterememheadsmasterememrefsheadsmasterem
+REV_PARSE_RULES = [
+    "{}",
+    "refs/{}",
+    "refs/tags/{}",
+    "refs/heads/{}",
+    "refs/remotes/{}",
+    "refs/remotes/{}/HEAD",
+]
+
+# Refs that are stored in the worktree's git dir instead of the common dir
+PER_WORKTREE_PREFIXES = ("refs/worktree/", "refs/bisect/", "refs/rewritten/")
+
+OBJECT_ID_RE = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+ROOT_REF_RE = re.compile(r"[A-Z_]+")
+INVALID_REF_RE = re.compile(r"\.\.|@\{|[\x00-\x20~^:?*\[\\]|^/|/$|//|\.lock$|\.$")
+
+MAX_SYMREF_DEPTH = 5
+
+
+class RefReaderError(Exception):
+    pass
+
+
+class RefReader:
+    def __init__(self, *, git_dir: Path, common_dir: Path) -> None:
+        self._git_dir = git_dir
+        self._common_dir = common_dir
+        self._packed_refs: PackedRefs | None = None
+
+    def resolve(self, name: str) -> str | None:
+        """
+        Resolve the given name to an object ID, following the same rules
+        as `git rev-parse`. Returns None if no ref matches.
+        """
+        if not name or OBJECT_ID_RE.fullmatch(name) or INVALID_REF_RE.search(name):
+            raise RefReaderError(f"Not a plain ref name: {name}")
+
+        for rule in REV_PARSE_RULES:
+            ref = rule.format(name)
+            # Outside of refs/, only allow root refs like HEAD or ORIG_HEAD
+            if not ref.startswith("refs/") and not ROOT_REF_RE.fullmatch(ref):
+                continue
+            if (sha := self.read_ref(ref)) is not None:
+                return sha
+        return None
+
+    def read_ref(self, ref: str) -> str | None:
+        """Get the object ID of the given fully-qualified ref, or None if it doesn't exist."""
+        for _ in range(MAX_SYMREF_DEPTH):
+            content = self._read_loose_ref(ref)
+            if content is None:
+                return self._get_packed_refs().refs.get(ref)
+            elif content.startswith("ref: "):
+                ref = content.removeprefix("ref: ")
+            elif OBJECT_ID_RE.fullmatch(content):
+                return content
+            else:
+                raise RefReaderError(f"Unexpected content in ref {ref}: {content}")
+        raise RefReaderError(f"Symbolic ref nested too deeply: {ref}")
+
+    def list_refs(self, prefix: str) -> Mapping[str, str]:
+        """Get all refs with the given prefix (e.g. "refs/heads/"), sorted by name."""
+        refs = {ref: sha for ref, sha in self._get_packed_refs().refs.items() if ref.startswith(prefix)}
+
+        prefix_dir = self._common_dir / prefix
+        for dirpath, _, filenames in os.walk(prefix_dir):
+            for filename in filenames:
+                if filename.endswith(".lock"):
+                    continue
+                ref = prefix + (Path(dirpath) / filename).relative_to(prefix_dir).as_posix()
+                if (sha := self.read_ref(ref)) is not None:
+                    refs[ref] = sha
+
+        return dict(sorted(refs.items()))
+
+    def _read_loose_ref(self, ref: str) -> str | None:
+        self._check_files_backend()
+        is_per_worktree = "/" not in ref or ref.startswith(PER_WORKTREE_PREFIXES)
+        ref_file = (self._git_dir if is_per_worktree else self._common_dir) / ref
+        try:
+            return ref_file.read_text().strip()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+
+    def _get_packed_refs(self) -> PackedRefs:
+        self._check_files_backend()
+        packed_refs_file = self._common_dir / "packed-refs"
+        try:
+            stat = packed_refs_file.stat()
+        except FileNotFoundError:
+            return PackedRefs(key=None, refs={})
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._packed_refs is None or self._packed_refs.key != key:
+            self._packed_refs = PackedRefs.parse(packed_refs_file.read_text(), key=key)
+        return self._packed_refs
+
+    def _check_files_backend(self) -> None:
+        if self._is_reftable:
+            raise RefReaderError("reftable backend is not supported")
+
+    @functools.cached_property
+    def _is_reftable(self) -> bool:
+        return (self._common_dir / "reftable").is_dir()
+
+
+@dataclasses.dataclass(frozen=True)
+class PackedRefs:
+    # (inode, mtime, size) of the packed-refs file when it was parsed
+    key: tuple[int, int, int] | None
+    refs: Mapping[str, str]
+
+    @classmethod
+    def parse(cls, content: str, *, key: tuple[int, int, int]) -> PackedRefs:
+        refs = {}
+        for line in content.splitlines():
+            # skip header + peeled tag lines
+            if line.startswith(("#", "^")) or not line:
+                continue
+            sha, _, ref = line.partition(" ")
+            refs[ref] = sha
+        return cls(key=key, refs=refs)
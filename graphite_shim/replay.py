@@ -0,0 +1,162 @@
+"""
+Replay commits onto a new base without touching the worktree, like `git
+rebase` does but with `git merge-tree --write-tree` + `git commit-tree`.
+
+Anything that can't be replayed this way (conflicts, merge commits, old
+versions of git, ...) is reported back to the caller, which should fall
+back to `git rebase`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import shlex
+from collections.abc import Sequence
+from typing import Self
+
+from graphite_shim.git import GitClient, GitClientError
+
+# `merge-tree --write-tree`
+MIN_GIT_VERSION = (2, 38)
+# `merge-tree --merge-base`
+MERGE_BASE_GIT_VERSION = (2, 40)
+
+# Fields of a commit, as formatted by `git log`
+_LOG_FORMAT = "%x00".join(["%H", "%P", "%T", "%an", "%ae", "%ad", "%B"])
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class Commit:
+    sha: str
+    parents: Sequence[str]
+    tree: str
+    author_name: str
+    author_email: str
+    # in git's internal format, e.g. "1700000000 +0100"
+    author_date: str
+    message: str
+
+
+class Replayer:
+    def __init__(self, *, git: GitClient) -> None:
+        self._git = git
+        # commit => tree
+        self._trees: dict[str, str] = {}
+
+    @classmethod
+    def create(cls, *, git: GitClient) -> Self | None:
+        """Get a Replayer, or None if commits can't be replayed in memory in this repo."""
+        if git.version < MIN_GIT_VERSION:
+            return None
+
+        # rebase would sign the new commits
+        gpgsign = git.run(["config", "--type=bool", "commit.gpgsign"], capture_output=True, check=False)
+        if gpgsign.stdout.strip() == "true":
+            return None
+
+        return cls(git=git)
+
+    def replay(self, *, upstream: str, onto: str, branch: str) -> str | None:
+        """
+        Replay the commits in `upstream..branch` onto `onto`, like `git rebase
+        upstream --onto onto`, returning the new tip. Returns None if they
+        can't be replayed in memory.
+
+        Nothing is updated; the new commits are only reachable from the
+        returned commit.
+        """
+        if onto == upstream:
+            # already up to date
+            return branch
+
+        commits = self._list_commits(f"{upstream}..{branch}")
+        if any(len(commit.parents) != 1 for commit in commits):
+            return None
+
+        tip = onto
+        tip_tree = self._get_tree(onto)
+        for commit in commits:
+            (parent,) = commit.parents
+            tree = self._merge(base=parent, ours=tip, ours_tree=tip_tree, theirs=commit.sha)
+            if tree is None:
+                return None
+
+            # Like rebase, drop commits that become empty (e.g. if they're already in the new base)
+            if tree == tip_tree and commit.tree != self._get_tree(parent):
+                continue
+
+            tip = self._commit_tree(tree, parent=tip, commit=commit)
+            tip_tree = tree
+
+        return tip
+
+    def _list_commits(self, rev_range: str) -> list[Commit]:
+        out = self._git.run(
+            ["log", "-z", "--reverse", "--topo-order", "--date=raw", f"--format={_LOG_FORMAT}", rev_range],
+            capture_output=True,
+        ).stdout
+        if not out:
+            return []
+
+        # each commit is terminated by a NUL, like the fields within it
+        fields = out.removesuffix("\0").split("\0")
+        num_fields = _LOG_FORMAT.count("%x00") + 1
+        commits = []
+        for i in range(0, len(fields), num_fields):
+            sha, parents, tree, author_name, author_email, author_date, message = fields[i : i + num_fields]
+            commit = Commit(
+                sha=sha,
+                parents=parents.split(),
+                tree=tree,
+                author_name=author_name,
+                author_email=author_email,
+                author_date=author_date,
+                message=message,
+            )
+            self._trees[commit.sha] = commit.tree
+            commits.append(commit)
+        return commits
+
+    def _get_tree(self, commit: str) -> str:
+        if (tree := self._trees.get(commit)) is None:
+            tree = self._trees[commit] = self._git.resolve_commit(f"{commit}^{{tree}}")
+        return tree
+
+    def _merge(self, *, base: str, ours: str, ours_tree: str, theirs: str) -> str | None:
+        """Three-way merge the trees of the given commits, returning the tree, or None if there are conflicts."""
+        if self._git.version >= MERGE_BASE_GIT_VERSION:
+            args = ["merge-tree", "--write-tree", f"--merge-base={base}", ours, theirs]
+        else:
+            # merge-tree merges from the merge base of the two commits, so
+            # merge a stand-in for `ours` whose parent is `base`
+            stand_in = self._commit_tree(ours_tree, parent=base, commit=None)
+            args = ["merge-tree", "--write-tree", stand_in, theirs]
+
+        proc = self._git.run(args, capture_output=True, check=False)
+        if proc.returncode == 1:
+            return None
+        elif proc.returncode != 0:
+            raise GitClientError(f"command returned exit code {proc.returncode}: git {shlex.join(args)}\n{proc.stderr}")
+        return proc.stdout.split("\n", 1)[0]
+
+    def _commit_tree(self, tree: str, *, parent: str, commit: Commit | None) -> str:
+        """Create a commit with the given tree, copying the author + message from `commit`, if given."""
+        env = dict(os.environ)
+        if commit is not None:
+            env |= {
+                "GIT_AUTHOR_NAME": commit.author_name,
+                "GIT_AUTHOR_EMAIL": commit.author_email,
+                "GIT_AUTHOR_DATE": commit.author_date,
+            }
+            message = commit.message
+        else:
+            # a throwaway commit, which shouldn't require the user's identity
+            env |= {
+                "GIT_AUTHOR_NAME": "gt",
+                "GIT_AUTHOR_EMAIL": "gt@localhost",
+                "GIT_COMMITTER_NAME": "gt",
+                "GIT_COMMITTER_EMAIL": "gt@localhost",
+            }
+            message = ""
+        return self._git.query(["commit-tree", tree, "-p", parent], input=message, env=env)
@@ -0,0 +1,81 @@
+"""
+A snapshot of the repo's branches and remote-tracking refs, read with one
+`git for-each-ref` and reused until the refs change.
+
+Reading refs directly (see refs.py) is cheaper for looking up a few refs,
+but listing thousands of loose refs that way is much slower than letting
+git do it.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Self
+
+FOR_EACH_REF_FORMAT = "%(refname)%00%(objectname)%00%(upstream)"
+# The refs in a snapshot
+SNAPSHOT_PREFIXES = ("refs/heads/", "refs/remotes/")
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class BranchRef:
+    name: str
+    sha: str
+    # e.g. "refs/remotes/origin/main", if the branch has an upstream
+    upstream: str | None
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class RepoSnapshot:
+    # sorted by name
+    branches: Mapping[str, BranchRef]
+    # e.g. "refs/remotes/origin/main" => object ID, sorted by name
+    remote_refs: Mapping[str, str]
+
+    @classmethod
+    def parse(cls, out: str) -> Self:
+        """Parse the output of `git for-each-ref --format=<FOR_EACH_REF_FORMAT>`."""
+        branches = {}
+        remote_refs = {}
+        for line in out.splitlines():
+            ref, sha, upstream = line.split("\0")
+            if ref.startswith("refs/heads/"):
+                name = ref.removeprefix("refs/heads/")
+                branches[name] = BranchRef(name=name, sha=sha, upstream=upstream or None)
+            else:
+                remote_refs[ref] = sha
+        return cls(branches=branches, remote_refs=remote_refs)
+
+    def get_refs(self, prefix: str) -> Mapping[str, str]:
+        """Get the refs with the given prefix, by their full name, like GitClient.get_refs."""
+        if prefix.startswith("refs/heads/"):
+            refs = {f"refs/heads/{name}": branch.sha for name, branch in self.branches.items()}
+        else:
+            refs = dict(self.remote_refs)
+        return {ref: sha for ref, sha in refs.items() if ref.startswith(prefix)}
+
+
+type RefsFingerprint = tuple[tuple[str, tuple[int, int, int] | None], ...]
+
+
+def get_refs_fingerprint(common_dir: Path) -> RefsFingerprint:
+    """
+    Get something that changes whenever the refs in a snapshot do: git
+    updates loose refs by renaming a lock file into place, which touches the
+    ref's directory. Upstreams are stored in the config.
+    """
+    paths = [common_dir / "packed-refs", common_dir / "config", common_dir / "reftable/tables.list"]
+    for prefix in SNAPSHOT_PREFIXES:
+        paths.extend(Path(dirpath) for dirpath, _, _ in os.walk(common_dir / prefix))
+
+    def stat(path: Path) -> tuple[int, int, int] | None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    return tuple((path.as_posix(), stat(path)) for path in paths)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+from collections.abc import Iterable
+from pathlib import Path
+from typing import ClassVar, Self
+
+
+@dataclasses.dataclass(frozen=True)
+class SquashCache:
+    """
+    Cache of whether branches have been squash-merged into trunk.
+
+    A verdict is only valid as long as neither the branch nor trunk has
+    moved, so each verdict records the commits it was computed against.
+    """
+
+    git_dir: Path
+    verdicts: dict[str, SquashVerdict]
+
+    # bump the version whenever PATCH_DIFF_ARGS changes, to drop stale verdicts
+    FILE: ClassVar[str] = ".graphite_shim/squash_cache.v2.json"
+    MAX_ENTRIES: ClassVar[int] = 1000
+
+    @classmethod
+    def load(cls, *, git_dir: Path) -> Self:
+        try:
+            data = json.loads((git_dir / cls.FILE).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        return cls(
+            git_dir=git_dir,
+            verdicts={k: SquashVerdict.deserialize(v) for k, v in data.items()},
+        )
+
+    def save(self) -> None:
+        data = {k: v.serialize() for k, v in self.verdicts.items()}
+        (self.git_dir / self.FILE).write_text(json.dumps(data))
+
+    def get(self, branch: str, *, branch_commit: str, trunk_commit: str) -> bool | None:
+        """Get the cached verdict for the given branch, if it's still valid."""
+        verdict = self.verdicts.get(branch)
+        if verdict is None or (verdict.branch_commit, verdict.trunk_commit) != (branch_commit, trunk_commit):
+            return None
+        return verdict.is_squashed
+
+    def set(self, branch: str, *, branch_commit: str, trunk_commit: str, is_squashed: bool) -> None:
+        # re-insert, so that the dict stays in least-recently-set order
+        self.verdicts.pop(branch, None)
+        self.verdicts[branch] = SquashVerdict(
+            branch_commit=branch_commit,
+            trunk_commit=trunk_commit,
+            is_squashed=is_squashed,
+        )
+
+    def prune(self, branches: Iterable[str]) -> None:
+        """Evict verdicts for branches not in the given list, and cap the cache size."""
+        keep = set(branches)
+        for branch in list(self.verdicts):
+            if branch not in keep:
+                del self.verdicts[branch]
+        for branch in list(self.verdicts)[: -self.MAX_ENTRIES]:
+            del self.verdicts[branch]
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class SquashVerdict:
+    branch_commit: str
+    trunk_commit: str
+    is_squashed: bool
+
+    @classmethod
+    def deserialize(cls, data: dict[str, str | bool]) -> Self:
+        return cls(
+            branch_commit=str(data["branch_commit"]),
+            trunk_commit=str(data["trunk_commit"]),
+            is_squashed=bool(data["is_squashed"]),
+        )
+
+    def serialize(self) -> dict[str, str | bool]:
+        return {
+            "branch_commit": self.branch_commit,
+            "trunk_commit": self.trunk_commit,
+            "is_squashed": self.is_squashed,
+        }
+
+
+@dataclasses.dataclass
+class TrunkPatchIndex:
+    """
+    The patch IDs of every (non-merge) commit in trunk, so that checking if
+    a branch was squash-merged is a lookup instead of a `git cherry` scan
+    over trunk's history.
+    """
+
+    git_dir: Path
+    # The trunk commit that has been indexed, up to and including
+    trunk_commit: str | None
+    # patch ID => commits with that patch ID
+    patch_ids: dict[str, list[str]]
+
+    # bump the version whenever PATCH_DIFF_ARGS changes, to drop stale patch IDs
+    FILE: ClassVar[str] = ".graphite_shim/trunk_patch_ids.v2.json"
+
+    @classmethod
+    def load(cls, *, git_dir: Path) -> Self:
+        try:
+            data = json.loads((git_dir / cls.FILE).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {"trunk_commit": None, "patch_ids": {}}
+        return cls(
+            git_dir=git_dir,
+            trunk_commit=data["trunk_commit"],
+            patch_ids=data["patch_ids"],
+        )
+
+    def save(self) -> None:
+        data = {
+            "trunk_commit": self.trunk_commit,
+            "patch_ids": self.patch_ids,
+        }
+        (self.git_dir / self.FILE).write_text(json.dumps(data))
+
+    def add(self, patch_id: str, commit: str) -> None:
+        self.patch_ids.setdefault(patch_id, []).append(commit)
+
+    def find(self, patch_id: str) -> list[str]:
+        """Get the trunk commits with the given patch ID."""
+        return self.patch_ids.get(patch_id, [])
@@ -1,10 +1,23 @@
 import json
+import os
+from collections.abc import Sequence
 from pathlib import Path
+from typing import Any
 
+from graphite_shim import binary_store
+from graphite_shim.binary_store import BinaryStoreReader
 from graphite_shim.branch_tree import BranchTree
-from graphite_shim.config import Config
+from graphite_shim.config import Config, StoreFormat
+from graphite_shim.utils.fs import write_atomic
+from graphite_shim.utils.term import printerr
 
 STORE_FILE = ".graphite_shim/store.json"
+BINARY_STORE_FILE = ".graphite_shim/store.bin"
+
+# Append-only log of mutations since the store was last saved, see StoreManager.append
+JOURNAL_FILE = ".graphite_shim/store.journal"
+# Compact the journal into the store once it gets this big
+MAX_JOURNAL_SIZE = 64 * 1024
 
 
 type Store = BranchTree
@@ -17,10 +30,205 @@ class StoreManager:
 
     @staticmethod
     def load(*, store_dir: Path) -> Store:
-        data = json.loads((store_dir / STORE_FILE).read_text())
-        return BranchTree.deserialize(data)
+        store: Store
+        binary_store_file = store_dir / BINARY_STORE_FILE
+        if binary_store_file.exists():
+            snapshot_file = binary_store_file
+            reader = BinaryStoreReader.open(binary_store_file)
+            store = BranchTree(trunk=reader.trunk, parent_map=reader)
+        else:
+            snapshot_file = store_dir / STORE_FILE
+            data = json.loads(snapshot_file.read_text())
+            store = BranchTree.deserialize(data)
+
+        ops, is_corrupt = _read_journal(store_dir / JOURNAL_FILE, snapshot_file=snapshot_file)
+        for op in ops:
+            store.apply_op(op)
+        if is_corrupt:
+            # keep what we could replay, and compact so the corrupt entry is gone
+            printerr(f"@(yellow)WARNING: Ignoring corrupt entries in {store_dir / JOURNAL_FILE}")
+            format = StoreFormat.BINARY if snapshot_file == binary_store_file else StoreFormat.JSON
+            StoreManager.save(store, store_dir=store_dir, format=format)
+        store.mark_clean()
+
+        return store
 
     @staticmethod
-    def save(store: Store, *, store_dir: Path) -> None:
+    def save(store: Store, *, store_dir: Path, format: StoreFormat) -> None:
+        """
+        Save the store in the given format, removing the store in the other
+        format, if any. Changing the configured format thus migrates the
+        store the next time it's saved.
+
+        Does nothing if the store hasn't changed since it was loaded or last
+        saved, unless it needs to be migrated or the journal compacted.
+        """
+        store_file = store_dir / STORE_FILE
+        binary_store_file = store_dir / BINARY_STORE_FILE
+        journal_file = store_dir / JOURNAL_FILE
+        target_file = binary_store_file if format == StoreFormat.BINARY else store_file
+        if not store.is_dirty and target_file.exists() and not journal_file.exists():
+            return
+
         data = store.serialize()
-        (store_dir / STORE_FILE).write_text(json.dumps(data))
+
+        if format == StoreFormat.BINARY:
+            try:
+                content = binary_store.encode(data)
+            except ValueError:
+                # can't be represented in binary; fall back to json
+                pass
+            else:
+                write_atomic(binary_store_file, content)
+                store_file.unlink(missing_ok=True)
+                journal_file.unlink(missing_ok=True)
+                store.mark_clean()
+                return
+
+        write_atomic(store_file, json.dumps(data).encode())
+        binary_store_file.unlink(missing_ok=True)
+        journal_file.unlink(missing_ok=True)
+        store.mark_clean()
+
+    @staticmethod
+    def append(store: Store, *, store_dir: Path, format: StoreFormat) -> None:
+        """
+        Durably record the store's changes since it was loaded or last saved,
+        by appending them to the journal instead of rewriting the whole store.
+
+        The journal is replayed on load, and compacted into the store on the
+        next save (or when it gets too big).
+        """
+        if not store.is_dirty:
+            return
+
+        snapshot_file = store_dir / (BINARY_STORE_FILE if format == StoreFormat.BINARY else STORE_FILE)
+        journal_file = store_dir / JOURNAL_FILE
+        if not snapshot_file.exists() or _get_size(journal_file) > MAX_JOURNAL_SIZE:
+            StoreManager.save(store, store_dir=store_dir, format=format)
+            return
+
+        lines = [json.dumps(op) for op in store.pending_ops]
+        header = _get_journal_header(snapshot_file)
+        if _read_journal_header(journal_file) == header:
+            mode = "a"
+        else:
+            # new journal, or a stale one left over from before the last save
+            mode = "w"
+            lines.insert(0, json.dumps(header))
+
+        with journal_file.open(mode) as f:
+            f.write("".join(line + "\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        store.mark_clean()
+
+
+def _get_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+# ----- Journal helpers ----- #
+
+
+def _get_journal_header(snapshot_file: Path) -> dict[str, Any]:
+    """
+    Identify the store file that a journal applies to. If we crash between
+    saving the store and deleting the journal, the journal won't match the
+    new store file, and will be ignored instead of being replayed twice.
+    """
+    stat = snapshot_file.stat()
+    return {"snapshot": [stat.st_ino, stat.st_mtime_ns, stat.st_size]}
+
+
+def _read_journal_header(journal_file: Path) -> dict[str, Any] | None:
+    try:
+        with journal_file.open() as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    if not line.endswith("\n"):
+        return None
+    try:
+        header: dict[str, Any] = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return header
+
+
+def _read_journal(journal_file: Path, *, snapshot_file: Path) -> tuple[Sequence[dict[str, Any]], bool]:
+    """
+    Read the journal's entries, up to the first corrupt one. Returns the
+    entries and whether the journal is corrupt.
+    """
+    try:
+        header_line, *lines = journal_file.read_text().splitlines(keepends=True)
+    except (FileNotFoundError, ValueError):
+        return [], False
+
+    if not header_line.endswith("\n"):
+        return [], False
+    try:
+        header = json.loads(header_line)
+    except json.JSONDecodeError:
+        return [], True
+    if header != _get_journal_header(snapshot_file):
+        return [], False
+
+    ops = []
+    for line in lines:
+        if not line.endswith("\n"):
+            # partially-written entry, if we crashed while appending
+            break
+        try:
+            ops.append(json.loads(line))
+        except json.JSONDecodeError:
+            return ops, True
+    return ops, False
+
+
+class StoreCache:
+    """
+    Keep loaded stores in memory across commands (e.g. in the daemon),
+    reloading them when the files on disk change.
+    """
+
+    def __init__(self) -> None:
+        self._stores: dict[Path, tuple[StoreFingerprint, Store]] = {}
+
+    def load(self, *, store_dir: Path) -> Store:
+        fingerprint = _get_fingerprint(store_dir)
+        cached = self._stores.get(store_dir)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        store = StoreManager.load(store_dir=store_dir)
+        self._stores[store_dir] = (fingerprint, store)
+        return store
+
+    def refresh(self, *, store_dir: Path) -> None:
+        """
+        Call after running a command. If the store was mutated without being
+        saved (e.g. if the command failed), it no longer matches what's on
+        disk, so drop it.
+        """
+        cached = self._stores.pop(store_dir, None)
+        if cached is not None and not cached[1].is_dirty:
+            self._stores[store_dir] = (_get_fingerprint(store_dir), cached[1])
+
+
+type StoreFingerprint = tuple[tuple[int, int, int] | None, ...]
+
+
+def _get_fingerprint(store_dir: Path) -> StoreFingerprint:
+    def stat(file: str) -> tuple[int, int, int] | None:
+        try:
+            st = (store_dir / file).stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    return tuple(stat(file) for file in [STORE_FILE, BINARY_STORE_FILE, JOURNAL_FILE])
@@ -0,0 +1,107 @@
+"""
+Incrementally parse part of a large JSON file, without loading all of it.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+from typing import Any, TextIO
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9eE.+-]*")
+_DECODER = json.JSONDecoder()
+
+
+def iter_array_items(file: TextIO, key: str, *, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yield the items of the array at the given key of the top-level JSON
+    object, parsing one item at a time. Memory use is bounded by the size of
+    the largest item (or other top-level value before the array), rather
+    than the size of the file. Stops reading once the array has been parsed.
+
+    Raises KeyError if the key doesn't exist, and ValueError if the JSON is
+    invalid.
+    """
+    reader = _StreamReader(file, chunk_size=chunk_size)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        raise KeyError(key)
+    while True:
+        curr_key = reader.decode()
+        reader.expect(":")
+        if curr_key == key:
+            break
+        reader.decode()  # skip the value
+        if reader.expect(",}") == "}":
+            raise KeyError(key)
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.decode()
+        if reader.expect(",]") == "]":
+            return
+
+
+class _StreamReader:
+    def __init__(self, file: TextIO, *, chunk_size: int) -> None:
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, without consuming it."""
+        while True:
+            match = _WHITESPACE.match(self._buf, self._pos)
+            assert match is not None
+            self._pos = match.end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which should be one of the given characters."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {list(chars)}, got: {char!r}")
+        self._pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """Consume and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # possibly a value that continues past the end of the buffer
+                if self._fill():
+                    continue
+                raise
+
+            # a number at the end of the buffer might continue in the next chunk
+            if _NUMBER_TAIL.fullmatch(self._buf, end) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _fill(self) -> bool:
+        """Read more of the file, dropping what's been consumed. Returns False at EOF."""
+        if self._eof:
+            return False
+        # Grow with the buffer, so re-parsing a value bigger than a chunk isn't quadratic
+        chunk = self._file.read(max(self._chunk_size, len(self._buf) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
@@ -13,15 +13,15 @@ import tty
 from collections.abc import Callable, Generator, Sequence
 from typing import Any, TextIO
 
-FORCE_COLOR = "--color" in sys.argv
-
 
 def _print(msg: str, *, end: str = "\n", get_file: Callable[[], io.StringIO | Any]) -> None:
     """Convenience function for printing colored output."""
     file = get_file()
 
-    # strip escape codes if not a TTY
-    msg = colorify(msg) if FORCE_COLOR or file.isatty() else re.sub(r"@\(\w+\)", "", msg)
+    # strip escape codes if not a TTY. Check sys.argv each time, since the
+    # daemon runs commands with different arguments in the same process.
+    force_color = "--color" in sys.argv
+    msg = colorify(msg) if force_color or file.isatty() else re.sub(r"@\(\w+\)", "", msg)
 
     file.write(msg)
     file.write(end)
@@ -3,6 +3,7 @@ from collections.abc import Callable
 import pytest
 
 from graphite_shim.commands.down import CommandDown, DownArgs
+from graphite_shim.exception import UserError
 from graphite_shim.store import Store
 from test.utils.branch_tree import mk_parent
 from test.utils.git import GitTestClient
@@ -50,5 +51,13 @@ def test_overflow(cmd: CommandDown, git: GitTestClient, store: Store) -> None:
     assert git.calls[1].args[0] == ["switch", "main"]
 
 
+@pytest.mark.parametrize("steps", [0, -1])
+def test_invalid_steps(cmd: CommandDown, git: GitTestClient, store: Store, steps: int) -> None:
+    store.set_parent("A", parent=mk_parent("main"))
+
+    with git.expect(), pytest.raises(UserError):
+        cmd.run(DownArgs(steps=steps))
+
+
 def test_e2e() -> None:
     pass  # TODO: set up tmpdir with git repo
@@ -0,0 +1,62 @@
+from collections.abc import Callable
+
+import pytest
+
+from graphite_shim.branch_tree import ParentInfo
+from graphite_shim.commands.restack import CommandRestack, RestackArgs, RestackTargets
+from graphite_shim.store import Store
+from test.utils.git import GitTestClient
+
+SHA_MAIN = "1" * 40
+SHA_A = "2" * 40
+SHA_B = "3" * 40
+
+
+@pytest.fixture(name="cmd")
+def fixture_cmd(init_cmd: Callable[[type[CommandRestack]], CommandRestack]) -> CommandRestack:
+    return init_cmd(CommandRestack)
+
+
+@pytest.fixture(autouse=True)
+def setup_store(store: Store) -> None:
+    store.set_parent("A", parent=ParentInfo(name="main", last_commit=SHA_MAIN))
+    store.set_parent("B", parent=ParentInfo(name="A", last_commit=SHA_A))
+    store.set_parent("C", parent=ParentInfo(name="B", last_commit=SHA_B))
+
+
+def test_prune_up_to_date(cmd: CommandRestack, git: GitTestClient, store: Store) -> None:
+    with git.expect(
+        git.on.run(["rev-parse", "main"], capture_output=True).stdout(SHA_MAIN),
+        git.on.run(["rev-parse", "A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "B"], capture_output=True).stdout(SHA_B),
+    ):
+        targets = CommandRestack._prune_targets(cmd, targets=list(store.get_stack("C", include_trunk=False)))
+
+    assert targets == []
+
+
+def test_prune_transitively(
+    cmd: CommandRestack, git: GitTestClient, store: Store, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with git.expect(
+        git.on.run(["rev-parse", "main"], capture_output=True).stdout(SHA_MAIN),
+        git.on.run(["rev-parse", "A"], capture_output=True).stdout("f" * 40),
+        git.on.run(["rev-parse", "B"], capture_output=True).stdout(SHA_B),
+    ):
+        targets = CommandRestack._prune_targets(cmd, targets=list(store.get_stack("C", include_trunk=False)))
+
+    # A is up to date, B's parent moved, so C needs to be restacked on top of B
+    assert [branch.name for branch in targets] == ["B", "C"]
+    assert capsys.readouterr().out == "Already up to date: A\nTo restack: B, C\n"
+
+
+def test_restack_up_to_date(cmd: CommandRestack, git: GitTestClient, capsys: pytest.CaptureFixture[str]) -> None:
+    with git.expect(
+        git.on.get_curr_branch().returns("C"),
+        git.on.run(["rev-parse", "main"], capture_output=True).stdout(SHA_MAIN),
+        git.on.run(["rev-parse", "A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "B"], capture_output=True).stdout(SHA_B),
+    ):
+        cmd.run(RestackArgs(targets=RestackTargets.FULL_STACK))
+
+    assert capsys.readouterr().out == "Already up to date: A, B, C\n"
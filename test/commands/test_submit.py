@@ -0,0 +1,114 @@
+import argparse
+import dataclasses
+from collections.abc import Callable
+
+import pytest
+
+from graphite_shim.commands.submit import BranchPush, CommandSubmit, SubmitArgs, get_push_args
+from graphite_shim.config import Config
+from graphite_shim.store import Store
+from test.utils.branch_tree import mk_parent
+from test.utils.git import GitTestClient
+from test.utils.prompter import TestPrompter
+
+SHA_A = "a" * 40
+SHA_B = "b" * 40
+SHA_OLD = "0" * 40
+
+
+@pytest.fixture(name="cmd")
+def fixture_cmd(init_cmd: Callable[[type[CommandSubmit]], CommandSubmit]) -> CommandSubmit:
+    return init_cmd(CommandSubmit)
+
+
+@pytest.fixture(autouse=True)
+def setup_store(store: Store) -> None:
+    store.set_parent("A", parent=mk_parent("main"))
+    store.set_parent("B", parent=mk_parent("A"))
+
+
+def test_pushes_only_changed_branches(cmd: CommandSubmit, git: GitTestClient) -> None:
+    with git.expect(
+        git.on.get_curr_branch().returns("B"),
+        git.on.run(["rev-parse", "refs/heads/A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "refs/heads/B"], capture_output=True).stdout(SHA_B),
+        git.on.get_refs("refs/remotes/origin/").returns(
+            {"refs/remotes/origin/A": SHA_A, "refs/remotes/origin/B": SHA_OLD},
+        ),
+        git.on.run(["push", "--atomic", f"--force-with-lease=B:{SHA_OLD}", "origin", "B"], capture_output=True),
+    ):
+        cmd.run(SubmitArgs(submit_stack=False, force=False))
+
+
+def test_up_to_date(cmd: CommandSubmit, git: GitTestClient, capsys: pytest.CaptureFixture[str]) -> None:
+    with git.expect(
+        git.on.get_curr_branch().returns("B"),
+        git.on.run(["rev-parse", "refs/heads/A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "refs/heads/B"], capture_output=True).stdout(SHA_B),
+        git.on.get_refs("refs/remotes/origin/").returns(
+            {"refs/remotes/origin/A": SHA_A, "refs/remotes/origin/B": SHA_B},
+        ),
+    ):
+        cmd.run(SubmitArgs(submit_stack=False, force=False))
+
+    assert "Everything up to date" in capsys.readouterr().out
+
+
+def test_dry_run(cmd: CommandSubmit, git: GitTestClient, capsys: pytest.CaptureFixture[str]) -> None:
+    with git.expect(
+        git.on.get_curr_branch().returns("B"),
+        git.on.run(["rev-parse", "refs/heads/A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "refs/heads/B"], capture_output=True).stdout(SHA_B),
+        git.on.get_refs("refs/remotes/origin/").returns({}),
+        git.on.run(["rev-list", "--objects", SHA_A, SHA_B, "--not", "--remotes=origin"], capture_output=True).stdout(
+            "x\ny\nz\n"
+        ),
+    ):
+        cmd.run(SubmitArgs(submit_stack=False, force=False, dry_run=True))
+
+    out = capsys.readouterr().out
+    assert "Would push 2 branch(es) to origin, ~3 object(s)" in out
+    assert "git push --atomic --force-with-lease=A: --force-with-lease=B: origin A B" in out
+
+
+def test_multiple_remotes(
+    prompter: TestPrompter,
+    git: GitTestClient,
+    config: Config,
+    store: Store,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    config = dataclasses.replace(config, remotes=["origin", "mirror"])
+    cmd = CommandSubmit(prompter=prompter, git=git, config=config, store=store)
+
+    with git.expect(
+        git.on.get_curr_branch().returns("B"),
+        git.on.run(["rev-parse", "refs/heads/A"], capture_output=True).stdout(SHA_A),
+        git.on.run(["rev-parse", "refs/heads/B"], capture_output=True).stdout(SHA_B),
+        git.on.get_refs("refs/remotes/origin/").returns(
+            {"refs/remotes/origin/A": SHA_A, "refs/remotes/origin/B": SHA_B},
+        ),
+        git.on.get_refs("refs/remotes/mirror/").returns({"refs/remotes/mirror/A": SHA_A}),
+        git.on.run(["push", "--atomic", "--force-with-lease=B:", "mirror", "B"], capture_output=True),
+    ):
+        cmd.run(SubmitArgs(submit_stack=False, force=False, jobs=1))
+
+    out = capsys.readouterr().out
+    assert "- B (origin: up to date, mirror: new)" in out
+    assert "✓ mirror" in out
+    assert "origin (" not in out
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_invalid_jobs(cmd: CommandSubmit, jobs: str, capsys: pytest.CaptureFixture[str]) -> None:
+    parser = argparse.ArgumentParser()
+    cmd.add_args(parser)
+    with pytest.raises(SystemExit) as e:
+        parser.parse_args(["-j", jobs])
+    assert e.value.code == 2
+    assert "expected a positive integer" in capsys.readouterr().err
+
+
+def test_push_args_force() -> None:
+    pushes = [BranchPush(branch="A", local_sha=SHA_A, remote_sha=SHA_A)]
+    assert get_push_args(pushes, remote="origin", force=True) == ["push", "--atomic", "--force", "origin", "A"]
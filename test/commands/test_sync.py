@@ -0,0 +1,94 @@
+import argparse
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from graphite_shim.branch_tree import ParentInfo
+from graphite_shim.commands.restack import CommandRestack
+from graphite_shim.commands.sync import CommandSync
+from graphite_shim.config import Config
+from graphite_shim.git import GitClient, GitClientError
+from graphite_shim.store import StoreManager
+from test.utils.git import git
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(git_repo: Path) -> Path:
+    (git_repo / ".git" / ".graphite_shim").mkdir()
+    return git_repo
+
+
+@pytest.fixture(name="cmd")
+def fixture_cmd(repo: Path) -> CommandSync:
+    config = Config(config_dir=repo / ".git", trunk="main")
+    return CommandSync(
+        prompter=None,
+        git=GitClient(cwd=repo, use_batch=False),
+        config=config,
+        store=StoreManager.new(config=config),
+    )
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1", "two"])
+def test_invalid_jobs(cmd: CommandSync, jobs: str, capsys: pytest.CaptureFixture[str]) -> None:
+    parser = argparse.ArgumentParser()
+    cmd.add_args(parser)
+    with pytest.raises(SystemExit) as e:
+        parser.parse_args(["--jobs", jobs])
+    assert e.value.code == 2
+    assert "expected a positive integer" in capsys.readouterr().err
+
+
+def test_restack_when_applying_replay_fails(
+    cmd: CommandSync, repo: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    old_main = git(repo, "rev-parse", "main")
+    git(repo, "switch", "--quiet", "--create", "A")
+    git(repo, "commit", "--quiet", "--allow-empty", "--message=A")
+    git(repo, "switch", "--quiet", "main")
+    git(repo, "commit", "--quiet", "--allow-empty", "--message=second")
+    cmd._store.set_parent("A", parent=ParentInfo(name="main", last_commit=old_main))
+
+    apply_replayed = CommandRestack._apply_replayed
+    calls = 0
+
+    def fail_first_apply(*args: Any, **kwargs: Any) -> bool:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise GitClientError("cannot lock ref")
+        return apply_replayed(*args, **kwargs)
+
+    monkeypatch.setattr(CommandRestack, "_apply_replayed", staticmethod(fail_first_apply))
+    cmd._restack_stacks(trunk="main", max_workers=None)
+
+    # fell back to rebasing
+    assert capsys.readouterr().out == "Restacking A... OK\n"
+    assert git(repo, "rev-parse", "A~") == git(repo, "rev-parse", "main")
+
+
+def test_delete_branches(cmd: CommandSync, repo: Path, tmp_path_factory: pytest.TempPathFactory) -> None:
+    git(repo, "config", "branch.A.remote", "origin")
+    for branch in ["A", "B", "C"]:
+        git(repo, "branch", branch)
+    worktree = tmp_path_factory.mktemp("worktree") / "B"
+    git(repo, "worktree", "add", "--quiet", str(worktree), "B")
+
+    # B is checked out elsewhere, D doesn't exist (anymore)
+    cmd._delete_branches(["A", "B", "C", "D"])
+
+    assert git(repo, "branch", "--format=%(refname:short)").splitlines() == ["B", "main"]
+    assert git(repo, "config", "--get-regexp", r"^branch\.", check=False) == ""
+
+
+def test_merged_branch_shadowed_by_tag(cmd: CommandSync, repo: Path) -> None:
+    git(repo, "branch", "A")
+    git(repo, "tag", "A")
+    git(repo, "commit", "--quiet", "--allow-empty", "--message=second")
+
+    merged_branches = list(cmd._git.get_merged_branches("main"))
+    assert merged_branches == ["A"]
+    cmd._delete_branches(merged_branches)
+
+    assert git(repo, "branch", "--format=%(refname:short)").splitlines() == ["main"]
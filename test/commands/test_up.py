@@ -3,6 +3,7 @@ from collections.abc import Callable
 import pytest
 
 from graphite_shim.commands.up import CommandUp, UpArgs
+from graphite_shim.exception import UserError
 from graphite_shim.store import Store
 from graphite_shim.utils.term import RawKey
 from test.utils.branch_tree import mk_parent
@@ -68,5 +69,13 @@ def test_overflow(cmd: CommandUp, git: GitTestClient, store: Store) -> None:
     assert git.calls[1].args[0] == ["switch", "B"]
 
 
+@pytest.mark.parametrize("steps", [0, -1])
+def test_invalid_steps(cmd: CommandUp, git: GitTestClient, store: Store, steps: int) -> None:
+    store.set_parent("A", parent=mk_parent("main"))
+
+    with git.expect(), pytest.raises(UserError):
+        cmd.run(UpArgs(steps=steps))
+
+
 def test_e2e() -> None:
     pass  # TODO: set up tmpdir with git repo
@@ -1,11 +1,12 @@
 from collections.abc import Callable
+from pathlib import Path
 
 import pytest
 
 from graphite_shim.commands.base import Command
 from graphite_shim.config import Config
 from graphite_shim.store import Store, StoreManager
-from test.utils.git import GitTestClient
+from test.utils.git import GitTestClient, git
 from test.utils.prompter import TestPrompter
 
 
@@ -45,3 +46,19 @@ def fixture_init_cmd[Args](
         config=config,
         store=store,
     )
+
+
+@pytest.fixture(name="git_repo")
+def fixture_git_repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A real git repo on `main`, with one empty commit, isolated from the user's git config."""
+    for key, value in {
+        "GIT_AUTHOR_NAME": "Author",
+        "GIT_AUTHOR_EMAIL": "author@example.com",
+        "GIT_COMMITTER_NAME": "Committer",
+        "GIT_COMMITTER_EMAIL": "committer@example.com",
+        "GIT_CONFIG_GLOBAL": "/dev/null",
+    }.items():
+        monkeypatch.setenv(key, value)
+    git(tmp_path, "init", "--quiet", "--initial-branch=main")
+    git(tmp_path, "commit", "--quiet", "--allow-empty", "--message=first")
+    return tmp_path
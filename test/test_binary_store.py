@@ -0,0 +1,54 @@
+import pytest
+
+from graphite_shim import binary_store
+from graphite_shim.binary_store import BinaryStoreReader
+from graphite_shim.branch_tree import BranchTree, ParentInfo
+
+SHA1 = "1" * 40
+SHA2 = "2" * 40
+
+
+def make_store() -> BranchTree:
+    return BranchTree(
+        trunk="main",
+        parent_map={
+            "feat/z": ParentInfo(name="main", last_commit=SHA1),
+            "feat/a": ParentInfo(name="main", last_commit=SHA1),
+            "feat/ü": ParentInfo(name="feat/z", last_commit=SHA2),
+        },
+    )
+
+
+class TestEncode:
+    def test_roundtrip(self) -> None:
+        store = make_store()
+        reader = BinaryStoreReader(binary_store.encode(store.serialize()))
+        assert reader.trunk == "main"
+        assert BranchTree(trunk=reader.trunk, parent_map=reader).serialize() == store.serialize()
+
+    def test_preserves_children_order(self) -> None:
+        reader = BinaryStoreReader(binary_store.encode(make_store().serialize()))
+        store = BranchTree(trunk=reader.trunk, parent_map=reader)
+        assert store.get_branch("main").children == ("feat/z", "feat/a")
+
+    def test_lookup(self) -> None:
+        reader = BinaryStoreReader(binary_store.encode(make_store().serialize()))
+        assert reader["feat/ü"] == ParentInfo(name="feat/z", last_commit=SHA2)
+        assert "feat/b" not in reader
+        assert len(reader) == 3
+
+    def test_empty(self) -> None:
+        reader = BinaryStoreReader(binary_store.encode(BranchTree(trunk="main").serialize()))
+        assert reader.trunk == "main"
+        assert dict(reader.items()) == {}
+
+    def test_rejects_abbreviated_commits(self) -> None:
+        store = BranchTree(trunk="main", parent_map={"A": ParentInfo(name="main", last_commit="123456")})
+        with pytest.raises(ValueError):
+            binary_store.encode(store.serialize())
+
+    def test_rejects_truncated(self) -> None:
+        with pytest.raises(ValueError):
+            BinaryStoreReader(binary_store.encode(make_store().serialize())[:-1])
+        with pytest.raises(ValueError):
+            BinaryStoreReader(b"")
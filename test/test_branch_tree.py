@@ -67,3 +67,155 @@ class TestGetAncestors:
             },
         )
         assert [branch.name for branch in branches.get_ancestors("C")] == ["B", "A", "main"]
+
+
+class TestRenameBranch:
+    def test_updates_children(self) -> None:
+        branches = BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "B": mk_parent("A"),
+            },
+        )
+        branches.rename_branch(from_="A", to="A2")
+        assert get_parent_name(branches.get_branch("B")) == "A2"
+        assert branches.get_branch("A2").children == ("B",)
+        with pytest.raises(ValueError):
+            branches.get_branch("A")
+
+    def test_keeps_sibling_order(self) -> None:
+        branches = BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "B": mk_parent("main"),
+                "C": mk_parent("main"),
+            },
+        )
+        branches.rename_branch(from_="B", to="B2")
+        assert branches.get_branch("main").children == ("A", "B2", "C")
+
+
+class TestChildrenOrder:
+    def test_remove_branch_keeps_position(self) -> None:
+        branches = BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "B": mk_parent("main"),
+                "B1": mk_parent("B"),
+                "B2": mk_parent("B"),
+                "C": mk_parent("main"),
+            },
+        )
+        branches.remove_branch("B")
+        assert branches.get_branch("main").children == ("A", "B1", "B2", "C")
+
+    def test_serialize_roundtrip(self) -> None:
+        branches = BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "B": mk_parent("main"),
+                "C": mk_parent("main"),
+            },
+        )
+        branches.rename_branch(from_="A", to="A2")
+        branches = BranchTree.deserialize(branches.serialize())
+        assert branches.get_branch("main").children == ("A2", "B", "C")
+
+
+class TestGetAllDescendants:
+    def test_returns_topological_order(self) -> None:
+        branches = BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "A1": mk_parent("A"),
+                "A2": mk_parent("A1"),
+                "B": mk_parent("A"),
+                "C": mk_parent("main"),
+            },
+        )
+        assert [branch.name for branch in branches.get_all_descendants("main")] == ["A", "A1", "A2", "B", "C"]
+
+    def test_deep_stack(self) -> None:
+        depth = 10_000
+        branches = BranchTree(
+            trunk="main",
+            parent_map={f"b{i}": mk_parent(f"b{i - 1}" if i > 0 else "main") for i in range(depth)},
+        )
+        assert len(list(branches.get_all_descendants("main"))) == depth
+
+
+class TestAncestry:
+    @pytest.fixture(name="branches")
+    def fixture_branches(self) -> BranchTree:
+        return BranchTree(
+            trunk="main",
+            parent_map={
+                "A": mk_parent("main"),
+                "A1": mk_parent("A"),
+                "A2": mk_parent("A1"),
+                "B": mk_parent("A"),
+                "C": mk_parent("main"),
+                "X": mk_parent("untracked"),
+                "Y": mk_parent("untracked"),
+            },
+        )
+
+    def test_is_ancestor(self, branches: BranchTree) -> None:
+        assert branches.is_ancestor("A", "A2")
+        assert branches.is_ancestor("main", "B")
+        assert branches.is_ancestor("A", "A")
+        assert not branches.is_ancestor("A2", "A")
+        assert not branches.is_ancestor("B", "A2")
+        assert not branches.is_ancestor("main", "X")
+        assert not branches.is_ancestor("foo", "A")
+
+    def test_lowest_common_ancestor(self, branches: BranchTree) -> None:
+        def lca(branch1: str, branch2: str) -> str | None:
+            info = branches.lowest_common_ancestor(branch1, branch2)
+            return info.name if info else None
+
+        assert lca("A2", "B") == "A"
+        assert lca("A1", "A2") == "A1"
+        assert lca("A2", "C") == "main"
+        assert lca("A", "main") == "main"
+        assert lca("X", "Y") is None
+        assert lca("A", "X") is None
+
+    def test_updates_after_mutation(self, branches: BranchTree) -> None:
+        assert not branches.is_ancestor("C", "B")
+        branches.set_parent("B", parent=mk_parent("C"))
+        assert branches.is_ancestor("C", "B")
+        branches.remove_branch("C")
+        assert not branches.is_ancestor("C", "B")
+        assert branches.is_ancestor("main", "B")
+
+
+class TestIsDirty:
+    @pytest.fixture(name="branches")
+    def fixture_branches(self) -> BranchTree:
+        return BranchTree(trunk="main", parent_map={"A": mk_parent("main")})
+
+    def test_clean_after_load(self, branches: BranchTree) -> None:
+        assert not branches.is_dirty
+        list(branches.get_stack("A"))
+        assert not branches.is_dirty
+
+    def test_dirty_after_mutation(self, branches: BranchTree) -> None:
+        branches.update_parent_commit("A", commit="abcdef")
+        assert branches.is_dirty
+
+    def test_mark_clean(self, branches: BranchTree) -> None:
+        branches.rename_branch(from_="A", to="B")
+        branches.mark_clean()
+        assert not branches.is_dirty
+
+    def test_noop_mutation(self, branches: BranchTree) -> None:
+        branches.set_parent("A", parent=mk_parent("main"))
+        branches.update_parent_commit("A", commit="123456")
+        branches.rename_branch(from_="main", to="trunk")
+        assert not branches.is_dirty
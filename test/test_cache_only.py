@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from graphite_shim.cache_only import CACHE_INDEX_FILE, GRAPHITE_CACHE_FILE, CacheIndex, CacheOnlyRunner
+from graphite_shim.exception import UserError
+from test.utils.git import GitTestClient
+
+
+def write_cache(cache_dir: Path, parents: dict[str, str | None]) -> None:
+    branches: list[tuple[str, dict[str, Any]]] = [
+        (
+            (branch, {"validationResult": "TRUNK"})
+            if parent is None
+            else (branch, {"validationResult": "VALID", "parentBranchName": parent})
+        )
+        for branch, parent in parents.items()
+    ]
+    (cache_dir / GRAPHITE_CACHE_FILE).write_text(json.dumps({"branches": branches}))
+
+
+@pytest.fixture(name="runner")
+def fixture_runner(tmp_path: Path, git: GitTestClient) -> CacheOnlyRunner:
+    write_cache(tmp_path, {"main": None, "A": "main", "B": "A", "C": "A", "D": "B"})
+    return CacheOnlyRunner(graphite_cache_dir=tmp_path, git=git, prompter=None)
+
+
+class TestCacheIndex:
+    def test_build(self, tmp_path: Path) -> None:
+        write_cache(tmp_path, {"main": None, "A": "main", "B": "A", "C": "A"})
+        index = CacheIndex.load(graphite_cache_dir=tmp_path)
+        assert index.trunks == ["main"]
+        assert index.parents == {"A": "main", "B": "A", "C": "A"}
+        assert index.children == {"main": ["A"], "A": ["B", "C"]}
+        assert index.get_ancestors("C") == ["A", "main"]
+
+    def test_reuses_persisted_index(self, tmp_path: Path) -> None:
+        write_cache(tmp_path, {"main": None, "A": "main"})
+        CacheIndex.load(graphite_cache_dir=tmp_path)
+
+        # if the index is reused, the cache isn't read again
+        index_file = tmp_path / CACHE_INDEX_FILE
+        index_file.write_text(index_file.read_text().replace('"A"', '"X"'))
+        assert CacheIndex.load(graphite_cache_dir=tmp_path).parents == {"X": "main"}
+
+    def test_rebuilds_when_cache_changes(self, tmp_path: Path) -> None:
+        write_cache(tmp_path, {"main": None, "A": "main"})
+        CacheIndex.load(graphite_cache_dir=tmp_path)
+
+        write_cache(tmp_path, {"main": None, "A": "main", "Bee": "A"})
+        assert CacheIndex.load(graphite_cache_dir=tmp_path).parents == {"A": "main", "Bee": "A"}
+
+
+class TestCacheOnlyRunner:
+    def test_trunk(self, runner: CacheOnlyRunner, git: GitTestClient, capsys: pytest.CaptureFixture[str]) -> None:
+        with git.expect(git.on.get_curr_branch().returns("D")):
+            runner.get_trunk()
+        assert capsys.readouterr().out == "main\n"
+
+    def test_children(self, runner: CacheOnlyRunner, git: GitTestClient, capsys: pytest.CaptureFixture[str]) -> None:
+        with git.expect(git.on.get_curr_branch().returns("A")):
+            runner.get_children()
+        assert capsys.readouterr().out == "B\nC\n"
+
+    def test_up(self, runner: CacheOnlyRunner, git: GitTestClient) -> None:
+        with git.expect(
+            git.on.get_curr_branch().returns("B"),
+            git.on.run(["switch", "D"]),
+        ):
+            runner.up(2)
+
+    @pytest.mark.parametrize("steps", [0, -1])
+    def test_up_invalid_steps(self, runner: CacheOnlyRunner, git: GitTestClient, steps: int) -> None:
+        with git.expect(), pytest.raises(UserError):
+            runner.up(steps)
+
+    def test_down(self, runner: CacheOnlyRunner, git: GitTestClient) -> None:
+        with git.expect(
+            git.on.get_curr_branch().returns("D"),
+            git.on.run(["switch", "A"]),
+        ):
+            runner.down(2)
+
+    @pytest.mark.parametrize("steps", [0, -1])
+    def test_down_invalid_steps(self, runner: CacheOnlyRunner, git: GitTestClient, steps: int) -> None:
+        with git.expect(), pytest.raises(UserError):
+            runner.down(steps)
+
+    def test_bottom(self, runner: CacheOnlyRunner, git: GitTestClient) -> None:
+        with git.expect(
+            git.on.get_curr_branch().returns("D"),
+            git.on.run(["switch", "A"]),
+        ):
+            runner.down(10000, include_trunk=False)
@@ -0,0 +1,117 @@
+import os
+import socket
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+import graphite_shim.client
+from graphite_shim.client import (
+    EXIT_CODE,
+    EXIT_FALLBACK,
+    find_git_common_dir,
+    forward_command,
+    recv_message,
+    send_message,
+)
+
+
+class TestFindGitCommonDir:
+    @pytest.fixture(autouse=True)
+    def clear_git_env(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.delenv("GIT_DIR", raising=False)
+        monkeypatch.delenv("GIT_COMMON_DIR", raising=False)
+
+    def test_repo_root(self, tmp_path: Path) -> None:
+        (tmp_path / ".git").mkdir()
+        assert find_git_common_dir(tmp_path) == (tmp_path / ".git").resolve()
+
+    def test_subdirectory(self, tmp_path: Path) -> None:
+        (tmp_path / ".git").mkdir()
+        subdir = tmp_path / "a" / "b"
+        subdir.mkdir(parents=True)
+        assert find_git_common_dir(subdir) == (tmp_path / ".git").resolve()
+
+    def test_worktree(self, tmp_path: Path) -> None:
+        git_dir = tmp_path / "repo" / ".git"
+        worktree_git_dir = git_dir / "worktrees" / "wt"
+        worktree_git_dir.mkdir(parents=True)
+        (worktree_git_dir / "commondir").write_text("../..\n")
+        worktree = tmp_path / "wt"
+        worktree.mkdir()
+        (worktree / ".git").write_text(f"gitdir: {worktree_git_dir}\n")
+
+        assert find_git_common_dir(worktree) == git_dir.resolve()
+
+    def test_not_a_repo(self, tmp_path: Path) -> None:
+        assert find_git_common_dir(tmp_path) is None
+
+    def test_git_dir_env(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        (tmp_path / ".git").mkdir()
+        monkeypatch.setenv("GIT_DIR", str(tmp_path / ".git"))
+        assert find_git_common_dir(tmp_path) is None
+
+
+class TestProtocol:
+    def test_message_with_fds(self) -> None:
+        client, server = socket.socketpair(socket.AF_UNIX)
+        r, w = os.pipe()
+        with client, server:
+            send_message(client, {"op": "run", "argv": ["gt", "ls"]}, fds=[w])
+            message = recv_message(server)
+            assert message is not None
+            request, fds = message
+            assert request == {"op": "run", "argv": ["gt", "ls"]}
+            assert len(fds) == 1
+
+            os.write(fds[0], b"hello")
+            assert os.read(r, 5) == b"hello"
+
+            for fd in [r, w, *fds]:
+                os.close(fd)
+
+    def test_closed_connection(self) -> None:
+        client, server = socket.socketpair(socket.AF_UNIX)
+        with server:
+            client.close()
+            assert recv_message(server) is None
+
+
+class TestForwardCommand:
+    def run_daemon(self, monkeypatch: pytest.MonkeyPatch, respond: Callable[[socket.socket], None]) -> threading.Thread:
+        client, server = socket.socketpair(socket.AF_UNIX)
+        monkeypatch.setattr(graphite_shim.client, "connect", lambda: client)
+
+        def serve() -> None:
+            with server:
+                message = recv_message(server)
+                assert message is not None
+                for fd in message[1]:
+                    os.close(fd)
+                respond(server)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        return thread
+
+    def test_no_daemon(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(graphite_shim.client, "connect", lambda: None)
+        assert forward_command(["gt", "ls"]) is None
+
+    def test_exit_code(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        thread = self.run_daemon(monkeypatch, lambda conn: conn.sendall(EXIT_CODE.pack(3)))
+        assert forward_command(["gt", "ls"]) == 3
+        thread.join()
+
+    def test_fallback(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        thread = self.run_daemon(monkeypatch, lambda conn: conn.sendall(EXIT_CODE.pack(EXIT_FALLBACK)))
+        assert forward_command(["gt", "ls"]) is None
+        thread.join()
+
+    def test_disconnect_after_send(self, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+        # the daemon may have started running the command, so don't rerun it locally
+        thread = self.run_daemon(monkeypatch, lambda conn: None)
+        assert forward_command(["gt", "sync"]) == 1
+        thread.join()
+        assert "Lost connection to the gt daemon" in capsys.readouterr().err
@@ -0,0 +1,60 @@
+import argparse
+import subprocess
+import sys
+from collections.abc import Callable
+from typing import Any
+
+from graphite_shim.commands import get_all_commands
+from graphite_shim.commands.base import Command
+from graphite_shim.commands.registry import REGISTRY_FILE, render_registry, scan_commands
+
+
+def test_registry_up_to_date() -> None:
+    assert REGISTRY_FILE.read_text() == render_registry(), (
+        "Command registry is out of date, run `PYTHONPATH=. python -m graphite_shim.commands.registry`"
+    )
+
+
+def test_render_without_docstring() -> None:
+    class CommandNoDocs(Command[None]):
+        def add_args(self, parser: argparse.ArgumentParser) -> Callable[[argparse.Namespace], None]:
+            return lambda _: None
+
+        def run(self, args: None) -> None:
+            pass
+
+    namespace: dict[str, Any] = {}
+    exec(render_registry({"no-docs": CommandNoDocs}), namespace)
+    assert namespace["COMMANDS"] == {"no-docs": (__name__, "CommandNoDocs", None)}
+
+
+def test_load() -> None:
+    commands = scan_commands()
+    for tag, info in get_all_commands().items():
+        assert info.load() is commands[tag]
+
+
+def test_startup_does_not_import_commands() -> None:
+    """Guard against startup importing every command module."""
+    code = "; ".join(
+        [
+            "import sys",
+            "import graphite_shim.__main__",
+            "print('\\n'.join(m for m in sys.modules if m.startswith('graphite_shim.commands.')))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert set(output.split()) <= {"graphite_shim.commands._registry", "graphite_shim.commands.base"}
+
+
+def test_fast_path_does_not_import_argparse() -> None:
+    code = "; ".join(
+        [
+            "import sys",
+            "import graphite_shim.__main__",
+            "import graphite_shim.commands.log, graphite_shim.commands.parent, graphite_shim.commands.trunk",
+            "print('argparse' in sys.modules)",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "False"
@@ -0,0 +1,47 @@
+import os
+import signal
+import socket
+import sys
+import time
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from graphite_shim.daemon import _command_context, _interrupt_on_disconnect
+
+
+class TestInterruptOnDisconnect:
+    @pytest.fixture(autouse=True)
+    def check_restored(self) -> Generator[None]:
+        orig_argv = sys.argv
+        orig_stdout = os.fstat(1)
+        orig_handler = signal.getsignal(signal.SIGINT)
+        yield
+        assert sys.argv is orig_argv
+        assert os.fstat(1).st_ino == orig_stdout.st_ino
+        assert signal.getsignal(signal.SIGINT) is orig_handler
+
+    def test_disconnect_mid_command(self, tmp_path: Path) -> None:
+        client, server = socket.socketpair(socket.AF_UNIX)
+        r, w = os.pipe()
+        with (
+            server,
+            pytest.raises(KeyboardInterrupt),
+            _command_context(argv=["gt", "sync"], cwd=tmp_path, env=dict(os.environ), fds=[0, w, 2]),
+            _interrupt_on_disconnect(server),
+        ):
+            client.close()
+            time.sleep(10)
+        for fd in [r, w]:
+            os.close(fd)
+
+    def test_late_interrupt_ignored(self, tmp_path: Path) -> None:
+        client, server = socket.socketpair(socket.AF_UNIX)
+        with client, server:
+            with _interrupt_on_disconnect(server):
+                on_sigint = signal.getsignal(signal.SIGINT)
+            # e.g. the client disconnected just as the command finished, and
+            # the signal is handled while cleaning up
+            assert callable(on_sigint)
+            on_sigint(signal.SIGINT, None)
@@ -0,0 +1,169 @@
+import concurrent.futures
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from graphite_shim.git import GitClient, GitClientError, RefTransaction, _CatFileBatch, _git_pipe
+from graphite_shim.snapshot import BranchRef
+from test.utils.git import git
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(git_repo: Path) -> Path:
+    git(git_repo, "commit", "--quiet", "--allow-empty", "--message=second")
+    return git_repo
+
+
+def get_heads(repo: Path) -> dict[str, str]:
+    out = git(repo, "for-each-ref", "--format=%(refname:short) %(objectname)", "refs/heads/")
+    return {branch: sha for line in out.splitlines() for branch, sha in [line.split(" ")]}
+
+
+class TestUpdateRefs:
+    def test_update_refs(self, repo: Path) -> None:
+        first, second = git(repo, "rev-parse", "HEAD~1", "HEAD").split()
+        git(repo, "branch", "A", first)
+        git(repo, "branch", "B", first)
+
+        transaction = RefTransaction()
+        transaction.create("refs/heads/C", second)
+        transaction.update("refs/heads/A", second, old=first)
+        transaction.delete("refs/heads/B", old=first)
+        GitClient(cwd=repo, use_batch=False).update_refs(transaction, message="test")
+
+        assert get_heads(repo) == {"A": second, "C": second, "main": second}
+        assert git(repo, "reflog", "-1", "--format=%gs", "A") == "test"
+
+    def test_atomic(self, repo: Path) -> None:
+        first, second = git(repo, "rev-parse", "HEAD~1", "HEAD").split()
+        git(repo, "branch", "A", first)
+        git(repo, "branch", "B", first)
+
+        transaction = RefTransaction()
+        transaction.update("refs/heads/A", second, old=first)
+        # stale old value
+        transaction.delete("refs/heads/B", old=second)
+        with pytest.raises(GitClientError):
+            GitClient(cwd=repo, use_batch=False).update_refs(transaction)
+
+        assert get_heads(repo) == {"A": first, "B": first, "main": second}
+
+
+class TestDoesBranchExist:
+    def test_exists(self, repo: Path) -> None:
+        git(repo, "branch", "user/A")
+        client = GitClient(cwd=repo, use_batch=False)
+        assert client.does_branch_exist("user/A")
+        assert not client.does_branch_exist("user/B")
+
+    @pytest.mark.parametrize("name", ["", "../../HEAD", "main~1", "main:x", "a..b"])
+    def test_invalid_name(self, repo: Path, name: str) -> None:
+        assert not GitClient(cwd=repo, use_batch=False).does_branch_exist(name)
+
+
+class TestGetSnapshot:
+    def test_snapshot(self, repo: Path) -> None:
+        git(repo, "branch", "user/A")
+        git(repo, "update-ref", "refs/remotes/origin/main", "HEAD~1")
+        git(repo, "config", "remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*")
+        git(repo, "config", "branch.main.remote", "origin")
+        git(repo, "config", "branch.main.merge", "refs/heads/main")
+        sha = git(repo, "rev-parse", "HEAD")
+
+        snapshot = GitClient(cwd=repo, use_batch=False).get_snapshot()
+
+        assert snapshot.branches == {
+            "main": BranchRef(name="main", sha=sha, upstream="refs/remotes/origin/main"),
+            "user/A": BranchRef(name="user/A", sha=sha, upstream=None),
+        }
+        assert snapshot.get_refs("refs/heads/user/") == {"refs/heads/user/A": sha}
+        assert snapshot.get_refs("refs/remotes/origin/") == {
+            "refs/remotes/origin/main": git(repo, "rev-parse", "HEAD~1")
+        }
+
+    def test_reused_until_refs_change(self, repo: Path) -> None:
+        client = GitClient(cwd=repo, use_batch=False)
+        snapshot = client.get_snapshot()
+        assert client.get_snapshot() is snapshot
+
+        git(repo, "branch", "user/A")
+        assert client.get_branches() == ["main", "user/A"]
+
+        git(repo, "update-ref", "refs/heads/user/A", "HEAD~1")
+        assert client.get_refs("refs/heads/user/") == {"refs/heads/user/A": git(repo, "rev-parse", "HEAD~1")}
+
+        git(repo, "pack-refs", "--all")
+        git(repo, "branch", "--delete", "--force", "user/A")
+        assert client.get_branches() == ["main"]
+
+
+class TestGetMergedBranches:
+    @pytest.mark.parametrize(
+        "config",
+        [
+            [],
+            ["diff.context=5"],
+            ["diff.noprefix=true"],
+            ["diff.mnemonicPrefix=true"],
+            ["diff.algorithm=histogram"],
+        ],
+    )
+    def test_squashed_with_diff_config(self, repo: Path, config: list[str]) -> None:
+        for setting in config:
+            key, value = setting.split("=", 1)
+            git(repo, "config", key, value)
+        (repo / "file.txt").write_text("".join(f"line {i}\n" for i in range(20)))
+        git(repo, "add", "file.txt")
+        git(repo, "commit", "--quiet", "--message=base")
+
+        git(repo, "switch", "--quiet", "--create", "A")
+        (repo / "file.txt").write_text("".join(f"line {i}\n" if i != 10 else "changed\n" for i in range(20)))
+        git(repo, "commit", "--quiet", "--all", "--message=A1")
+        (repo / "other.txt").write_text("other\n")
+        git(repo, "add", "other.txt")
+        git(repo, "commit", "--quiet", "--message=A2")
+
+        git(repo, "switch", "--quiet", "main")
+        git(repo, "merge", "--quiet", "--squash", "A")
+        git(repo, "commit", "--quiet", "--message=squashed A")
+
+        client = GitClient(cwd=repo, use_batch=False)
+        assert list(client.get_merged_branches("main")) == ["A"]
+
+
+class TestBatch:
+    def test_created_once_across_threads(self, repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        created = []
+        init = _CatFileBatch.__init__
+
+        def slow_init(self: _CatFileBatch, **kwargs: Any) -> None:
+            created.append(self)
+            time.sleep(0.05)
+            init(self, **kwargs)
+
+        monkeypatch.setattr(_CatFileBatch, "__init__", slow_init)
+        client = GitClient(cwd=repo)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            batches = list(executor.map(lambda _: client._batch, range(8)))
+        client.close()
+
+        assert len(created) == 1
+        assert all(batch is created[0] for batch in batches)
+
+
+class TestGitPipe:
+    def test_lots_of_stderr(self, repo: Path) -> None:
+        # more stderr than fits in a pipe buffer, before any stdout
+        noisy = "!f() { head -c 1000000 /dev/zero | tr '\\0' x >&2; echo hello; }; f"
+        result: list[str] = []
+        thread = threading.Thread(
+            target=lambda: result.extend(_git_pipe(["-c", f"alias.noisy={noisy}", "noisy"], ["stripspace"], cwd=repo)),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive(), "deadlocked"
+        assert result == ["hello\n"]
@@ -0,0 +1,60 @@
+import io
+import json
+from typing import Any
+
+import pytest
+
+from graphite_shim.utils.json_stream import iter_array_items
+
+
+def parse(content: str, key: str, *, chunk_size: int = 4) -> list[Any]:
+    return list(iter_array_items(io.StringIO(content), key, chunk_size=chunk_size))
+
+
+def test_matches_json_loads() -> None:
+    data = {
+        "sha": "abc",
+        "other": {"nested": [1, 2, {"x": 'a \\" ] }'}]},
+        "branches": [
+            ["main", {"validationResult": "TRUNK"}],
+            ["feat", {"parentBranchName": "main", "count": 12345, "body": "é" * 20}],
+        ],
+        "after": None,
+    }
+    content = json.dumps(data, indent=2)
+    for chunk_size in [1, 3, 7, 1024]:
+        assert parse(content, "branches", chunk_size=chunk_size) == data["branches"]
+
+
+def test_numbers_across_chunks() -> None:
+    assert parse('{"a": [123456789, -1.5e10]}', "a", chunk_size=2) == [123456789, -1.5e10]
+
+
+def test_empty_array() -> None:
+    assert parse('{"a": [ ]}', "a") == []
+
+
+def test_stops_after_array() -> None:
+    # anything after the array isn't read
+    assert parse('{"a": [1, 2], "b": INVALID', "a") == [1, 2]
+
+
+def test_missing_key() -> None:
+    with pytest.raises(KeyError):
+        parse('{"b": [1]}', "a")
+    with pytest.raises(KeyError):
+        parse("{}", "a")
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '{"a": [1, 2',
+        '{"a": [1 2]}',
+        '["a"]',
+        '{"a": [tru]}',
+    ],
+)
+def test_invalid(content: str) -> None:
+    with pytest.raises(ValueError):
+        parse(content, "a")
@@ -0,0 +1,87 @@
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from graphite_shim.__main__ import fast_parse_args, get_command_name, pop_global_flag
+from graphite_shim.commands import CommandInfo
+from graphite_shim.commands.base import Command
+from graphite_shim.commands.log import CommandLog, LogArgs
+from graphite_shim.commands.parent import CommandParent, ParentArgs
+
+ALIASES = {
+    "ls": ["log", "short"],
+    "ss": ["submit", "--stack"],
+    "sss": ["ss"],
+    "loop": ["loop"],
+}
+
+
+def test_get_command_name() -> None:
+    assert get_command_name(["parent"], aliases=ALIASES) == "parent"
+    assert get_command_name(["--no-interactive", "log", "short"], aliases=ALIASES) == "log"
+    assert get_command_name(["-h"], aliases=ALIASES) is None
+    assert get_command_name([], aliases=ALIASES) is None
+
+
+def test_get_command_name_alias() -> None:
+    assert get_command_name(["ls"], aliases=ALIASES) == "log"
+    assert get_command_name(["sss", "-f"], aliases=ALIASES) == "submit"
+    assert get_command_name(["loop"], aliases=ALIASES) == "loop"
+
+
+def test_pop_global_flag() -> None:
+    argv = ["gt", "--profile", "sync"]
+    assert pop_global_flag(argv, "--profile")
+    assert argv == ["gt", "sync"]
+
+    argv = ["gt", "--no-interactive", "--profile", "log", "short"]
+    assert pop_global_flag(argv, "--profile")
+    assert argv == ["gt", "--no-interactive", "log", "short"]
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["gt", "create", "-m", "--profile"],
+        ["gt", "--", "--profile"],
+        ["gt", "sync"],
+    ],
+)
+def test_pop_global_flag_after_command(argv: list[str]) -> None:
+    expected = argv.copy()
+    assert not pop_global_flag(argv, "--profile")
+    assert argv == expected
+
+
+class TestFastParseArgs:
+    @pytest.fixture(name="fast_parse")
+    def fixture_fast_parse(
+        self,
+        init_cmd: Callable[[type[Command[Any]]], Command[Any]],
+    ) -> Callable[[list[str]], tuple[Command[Any], Any] | None]:
+        def init(cmd_info: CommandInfo) -> Command[Any]:
+            return init_cmd(cmd_info.load())
+
+        return lambda args: fast_parse_args(args, init_cmd=init)
+
+    def test_simple(self, fast_parse: Callable[[list[str]], tuple[Command[Any], Any] | None]) -> None:
+        match fast_parse(["parent"]):
+            case (CommandParent(), ParentArgs()):
+                pass
+            case result:
+                pytest.fail(f"Unexpected result: {result}")
+
+    def test_log(self, fast_parse: Callable[[list[str]], tuple[Command[Any], Any] | None]) -> None:
+        match fast_parse(["log", "--stack", "short"]):
+            case (CommandLog(), args):
+                assert args == LogArgs(command="short", only_stack=True)
+            case result:
+                pytest.fail(f"Unexpected result: {result}")
+
+    def test_falls_back(self, fast_parse: Callable[[list[str]], tuple[Command[Any], Any] | None]) -> None:
+        assert fast_parse([]) is None
+        assert fast_parse(["parent", "-h"]) is None
+        assert fast_parse(["log", "short", "--help"]) is None
+        assert fast_parse(["ls"]) is None  # aliases go through argparse
+        assert fast_parse(["create", "foo"]) is None  # no fast path
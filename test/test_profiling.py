@@ -0,0 +1,56 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from graphite_shim import profiling
+from graphite_shim.git import GitClient, GitClientError
+
+
+@pytest.fixture(autouse=True)
+def clear_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("GT_PROFILE", raising=False)
+    monkeypatch.delenv("GT_PROFILE_TRACE", raising=False)
+
+
+@pytest.mark.parametrize(
+    ("argv", "expected"),
+    [
+        (["log", "--oneline"], "log"),
+        (["-C", "dir", "-c", "core.editor=true", "rebase", "--continue"], "rebase"),
+        (["--version"], "--version"),
+    ],
+)
+def test_get_git_subcommand(argv: list[str], expected: str) -> None:
+    assert profiling.get_git_subcommand(argv) == expected
+
+
+def test_disabled(capsys: pytest.CaptureFixture[str]) -> None:
+    with profiling.profiling(enabled=False), profiling.span("phase") as args:
+        assert args == {}
+    assert capsys.readouterr().err == ""
+
+
+def test_profiling(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    trace_file = tmp_path / "trace.json"
+    monkeypatch.setenv("GT_PROFILE_TRACE", trace_file.as_posix())
+    subprocess.run(["git", "init", "--quiet"], cwd=tmp_path, check=True)
+    git = GitClient(cwd=tmp_path, use_batch=False)
+
+    with profiling.profiling(enabled=False), profiling.span("phase"):
+        git.run(["rev-parse", "--git-dir"], capture_output=True)
+        with pytest.raises(GitClientError):
+            git.run(["rev-parse", "--verify", "--quiet", "missing"], capture_output=True)
+
+    err = capsys.readouterr().err
+    assert "3 git commands" in err  # including `git rev-parse --show-toplevel` for GitClient.root
+    assert "git rev-parse --verify --quiet missing (exit 1)" in err
+
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert [(event["name"], event["cat"], event["args"].get("exit_code")) for event in events] == [
+        ("phase", "phase", None),
+        ("rev-parse", "git", 0),
+        ("rev-parse", "git", 0),
+        ("rev-parse", "git", 1),
+    ]
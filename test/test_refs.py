@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import pytest
+
+from graphite_shim.refs import RefReader, RefReaderError
+
+SHA_A = "a" * 40
+SHA_B = "b" * 40
+SHA_C = "c" * 40
+
+
+@pytest.fixture(name="git_dir")
+def fixture_git_dir(tmp_path: Path) -> Path:
+    git_dir = tmp_path / ".git"
+    (git_dir / "refs/heads").mkdir(parents=True)
+    (git_dir / "refs/tags").mkdir(parents=True)
+    return git_dir
+
+
+def write_ref(git_dir: Path, ref: str, content: str) -> None:
+    (git_dir / ref).parent.mkdir(parents=True, exist_ok=True)
+    (git_dir / ref).write_text(content + "\n")
+
+
+def write_packed_refs(git_dir: Path, refs: dict[str, str]) -> None:
+    lines = ["# pack-refs with: peeled fully-peeled sorted", *(f"{sha} {ref}" for ref, sha in refs.items())]
+    (git_dir / "packed-refs").write_text("\n".join(lines) + "\n")
+
+
+class TestResolve:
+    def test_loose_ref(self, git_dir: Path) -> None:
+        write_ref(git_dir, "refs/heads/A", SHA_A)
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("A") == SHA_A
+
+    def test_packed_ref(self, git_dir: Path) -> None:
+        write_packed_refs(git_dir, {"refs/heads/A": SHA_A})
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("A") == SHA_A
+
+    def test_loose_ref_overrides_packed_ref(self, git_dir: Path) -> None:
+        write_packed_refs(git_dir, {"refs/heads/A": SHA_A})
+        write_ref(git_dir, "refs/heads/A", SHA_B)
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("A") == SHA_B
+
+    def test_tags_take_precedence(self, git_dir: Path) -> None:
+        write_ref(git_dir, "refs/heads/A", SHA_A)
+        write_ref(git_dir, "refs/tags/A", SHA_B)
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("A") == SHA_B
+
+    def test_remote_head(self, git_dir: Path) -> None:
+        write_ref(git_dir, "refs/remotes/origin/main", SHA_A)
+        write_ref(git_dir, "refs/remotes/origin/HEAD", "ref: refs/remotes/origin/main")
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("origin") == SHA_A
+        assert refs.resolve("origin/main") == SHA_A
+
+    def test_missing(self, git_dir: Path) -> None:
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.resolve("A") is None
+
+    @pytest.mark.parametrize("rev", ["A~1", "A^{tree}", "A..B", SHA_A, "@{upstream}"])
+    def test_errors_on_non_refs(self, git_dir: Path, rev: str) -> None:
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        with pytest.raises(RefReaderError):
+            refs.resolve(rev)
+
+    def test_worktree(self, git_dir: Path) -> None:
+        worktree_git_dir = git_dir / "worktrees/wt"
+        write_ref(worktree_git_dir, "HEAD", "ref: refs/heads/A")
+        write_ref(git_dir, "HEAD", "ref: refs/heads/B")
+        write_ref(git_dir, "refs/heads/A", SHA_A)
+        write_ref(git_dir, "refs/heads/B", SHA_B)
+        refs = RefReader(git_dir=worktree_git_dir, common_dir=git_dir)
+        assert refs.resolve("HEAD") == SHA_A
+        assert refs.resolve("B") == SHA_B
+
+
+class TestListRefs:
+    def test_merges_loose_and_packed_refs(self, git_dir: Path) -> None:
+        write_packed_refs(git_dir, {"refs/heads/A": SHA_A, "refs/heads/B": SHA_A, "refs/tags/v1": SHA_A})
+        write_ref(git_dir, "refs/heads/B", SHA_B)
+        write_ref(git_dir, "refs/heads/feature/C", SHA_C)
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.list_refs("refs/heads/") == {
+            "refs/heads/A": SHA_A,
+            "refs/heads/B": SHA_B,
+            "refs/heads/feature/C": SHA_C,
+        }
+
+    def test_rereads_packed_refs_on_change(self, git_dir: Path) -> None:
+        write_packed_refs(git_dir, {"refs/heads/A": SHA_A})
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        assert refs.list_refs("refs/heads/") == {"refs/heads/A": SHA_A}
+        write_packed_refs(git_dir, {"refs/heads/A": SHA_A, "refs/heads/B": SHA_B})
+        assert refs.list_refs("refs/heads/") == {"refs/heads/A": SHA_A, "refs/heads/B": SHA_B}
+
+    def test_errors_on_reftable(self, git_dir: Path) -> None:
+        (git_dir / "reftable").mkdir()
+        refs = RefReader(git_dir=git_dir, common_dir=git_dir)
+        with pytest.raises(RefReaderError):
+            refs.list_refs("refs/heads/")
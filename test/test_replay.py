@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+
+from graphite_shim.git import GitClient
+from graphite_shim.replay import Replayer
+from test.utils.git import git
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(git_repo: Path) -> Path:
+    commit(git_repo, "base.txt", "base")
+    return git_repo
+
+
+@pytest.fixture(name="replayer")
+def fixture_replayer(repo: Path) -> Replayer:
+    replayer = Replayer.create(git=GitClient(cwd=repo, use_batch=False))
+    if replayer is None:
+        pytest.skip("git is too old")
+    return replayer
+
+
+def commit(repo: Path, file: str, content: str, *, date: str | None = None) -> str:
+    (repo / file).write_text(content)
+    git(repo, "add", file)
+    git(repo, "commit", "--quiet", f"--message=update {file}", *([f"--date={date}"] if date else []))
+    return git(repo, "rev-parse", "HEAD")
+
+
+def test_replay(repo: Path, replayer: Replayer) -> None:
+    upstream = git(repo, "rev-parse", "HEAD")
+    git(repo, "switch", "--quiet", "-c", "feature")
+    commit(repo, "a.txt", "a", date="2001-02-03T04:05:06+07:00")
+    commit(repo, "b.txt", "b")
+    git(repo, "switch", "--quiet", "main")
+    onto = commit(repo, "main.txt", "main")
+
+    new_tip = replayer.replay(upstream=upstream, onto=onto, branch="feature")
+
+    assert new_tip is not None
+    assert git(repo, "rev-list", "--count", f"{onto}..{new_tip}") == "2"
+    assert git(repo, "ls-tree", "--name-only", new_tip).split() == ["a.txt", "b.txt", "base.txt", "main.txt"]
+    assert git(repo, "log", "--format=%an %ad %s", "--date=iso-strict", f"{new_tip}~1", "-1") == (
+        "Author 2001-02-03T04:05:06+07:00 update a.txt"
+    )
+    # the worktree is untouched
+    assert not (repo / "a.txt").exists()
+
+
+def test_up_to_date(repo: Path, replayer: Replayer) -> None:
+    upstream = git(repo, "rev-parse", "HEAD")
+    tip = commit(repo, "a.txt", "a")
+    assert replayer.replay(upstream=upstream, onto=upstream, branch=tip) == tip
+
+
+def test_conflict(repo: Path, replayer: Replayer) -> None:
+    upstream = git(repo, "rev-parse", "HEAD")
+    tip = commit(repo, "a.txt", "feature")
+    git(repo, "switch", "--quiet", "--detach", upstream)
+    onto = commit(repo, "a.txt", "main")
+
+    assert replayer.replay(upstream=upstream, onto=onto, branch=tip) is None
+
+
+def test_drops_commits_already_upstream(repo: Path, replayer: Replayer) -> None:
+    upstream = git(repo, "rev-parse", "HEAD")
+    commit(repo, "a.txt", "a")
+    tip = commit(repo, "b.txt", "b")
+    git(repo, "switch", "--quiet", "--detach", upstream)
+    onto = commit(repo, "a.txt", "a")
+
+    new_tip = replayer.replay(upstream=upstream, onto=onto, branch=tip)
+
+    assert new_tip is not None
+    assert git(repo, "rev-list", "--count", f"{onto}..{new_tip}") == "1"
+
+
+def test_merge_commit(repo: Path, replayer: Replayer) -> None:
+    upstream = git(repo, "rev-parse", "HEAD")
+    git(repo, "switch", "--quiet", "-c", "feature")
+    commit(repo, "a.txt", "a")
+    git(repo, "switch", "--quiet", "-c", "other", upstream)
+    commit(repo, "b.txt", "b")
+    git(repo, "switch", "--quiet", "feature")
+    git(repo, "merge", "--quiet", "--no-edit", "other")
+    git(repo, "switch", "--quiet", "main")
+    onto = commit(repo, "main.txt", "main")
+
+    assert replayer.replay(upstream=upstream, onto=onto, branch="feature") is None
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+from graphite_shim.squash_cache import SquashCache, TrunkPatchIndex
+
+
+class TestGet:
+    def test_hit(self, tmp_path: Path) -> None:
+        cache = SquashCache(git_dir=tmp_path, verdicts={})
+        cache.set("A", branch_commit="a1", trunk_commit="t1", is_squashed=True)
+        assert cache.get("A", branch_commit="a1", trunk_commit="t1") is True
+
+    def test_miss_when_branch_moves(self, tmp_path: Path) -> None:
+        cache = SquashCache(git_dir=tmp_path, verdicts={})
+        cache.set("A", branch_commit="a1", trunk_commit="t1", is_squashed=True)
+        assert cache.get("A", branch_commit="a2", trunk_commit="t1") is None
+
+    def test_miss_when_trunk_moves(self, tmp_path: Path) -> None:
+        cache = SquashCache(git_dir=tmp_path, verdicts={})
+        cache.set("A", branch_commit="a1", trunk_commit="t1", is_squashed=False)
+        assert cache.get("A", branch_commit="a1", trunk_commit="t2") is None
+
+    def test_roundtrip(self, tmp_path: Path) -> None:
+        (tmp_path / ".graphite_shim").mkdir()
+        cache = SquashCache.load(git_dir=tmp_path)
+        cache.set("A", branch_commit="a1", trunk_commit="t1", is_squashed=False)
+        cache.save()
+        assert SquashCache.load(git_dir=tmp_path).get("A", branch_commit="a1", trunk_commit="t1") is False
+
+
+class TestPrune:
+    def test_evicts_deleted_branches(self, tmp_path: Path) -> None:
+        cache = SquashCache(git_dir=tmp_path, verdicts={})
+        cache.set("A", branch_commit="a1", trunk_commit="t1", is_squashed=False)
+        cache.set("B", branch_commit="b1", trunk_commit="t1", is_squashed=False)
+        cache.prune(["B"])
+        assert list(cache.verdicts) == ["B"]
+
+    def test_caps_size(self, tmp_path: Path) -> None:
+        cache = SquashCache(git_dir=tmp_path, verdicts={})
+        branches = [f"branch-{i}" for i in range(SquashCache.MAX_ENTRIES + 10)]
+        for branch in branches:
+            cache.set(branch, branch_commit="a1", trunk_commit="t1", is_squashed=False)
+        cache.prune(branches)
+        assert list(cache.verdicts) == branches[10:]
+
+
+class TestTrunkPatchIndex:
+    def test_find(self, tmp_path: Path) -> None:
+        index = TrunkPatchIndex(git_dir=tmp_path, trunk_commit=None, patch_ids={})
+        index.add("p1", "c1")
+        index.add("p1", "c2")
+        assert index.find("p1") == ["c1", "c2"]
+        assert index.find("p2") == []
+
+    def test_roundtrip(self, tmp_path: Path) -> None:
+        (tmp_path / ".graphite_shim").mkdir()
+        index = TrunkPatchIndex.load(git_dir=tmp_path)
+        assert index.trunk_commit is None
+        index.add("p1", "c1")
+        index.trunk_commit = "c1"
+        index.save()
+
+        index = TrunkPatchIndex.load(git_dir=tmp_path)
+        assert index.trunk_commit == "c1"
+        assert index.find("p1") == ["c1"]
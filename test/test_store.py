@@ -0,0 +1,195 @@
+from pathlib import Path
+
+import pytest
+
+from graphite_shim.branch_tree import BranchTree, ParentInfo
+from graphite_shim.config import StoreFormat
+from graphite_shim.store import BINARY_STORE_FILE, JOURNAL_FILE, STORE_FILE, StoreCache, StoreManager
+
+SHA1 = "1" * 40
+SHA2 = "2" * 40
+
+
+def make_store() -> BranchTree:
+    return BranchTree(
+        trunk="main",
+        parent_map={
+            "A": ParentInfo(name="main", last_commit=SHA1),
+            "B": ParentInfo(name="A", last_commit=SHA2),
+        },
+    )
+
+
+@pytest.fixture(autouse=True)
+def setup_store_dir(tmp_path: Path) -> None:
+    (tmp_path / ".graphite_shim").mkdir()
+
+
+class TestSave:
+    def test_skips_when_clean(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        store_file = tmp_path / STORE_FILE
+        store_file.write_text("sentinel")
+
+        store = make_store()
+        store.mark_clean()
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        assert store_file.read_text() == "sentinel"
+
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        assert StoreManager.load(store_dir=tmp_path).serialize()["branches"]["B"]["last_commit"] == SHA1
+
+    def test_saves_new_store(self, tmp_path: Path) -> None:
+        StoreManager.save(BranchTree(trunk="main"), store_dir=tmp_path, format=StoreFormat.JSON)
+        assert (tmp_path / STORE_FILE).exists()
+
+    def test_no_leftover_temp_files(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        assert [p.name for p in (tmp_path / ".graphite_shim").iterdir()] == ["store.json"]
+
+
+class TestMigrate:
+    def test_migrate_to_binary(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        store = StoreManager.load(store_dir=tmp_path)
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.BINARY)
+
+        assert not (tmp_path / STORE_FILE).exists()
+        assert (tmp_path / BINARY_STORE_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == make_store().serialize()
+
+    def test_migrate_to_json(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.BINARY)
+        store = StoreManager.load(store_dir=tmp_path)
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.JSON)
+
+        assert (tmp_path / STORE_FILE).exists()
+        assert not (tmp_path / BINARY_STORE_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == make_store().serialize()
+
+    def test_binary_falls_back_to_json(self, tmp_path: Path) -> None:
+        store = BranchTree(trunk="main", parent_map={"A": ParentInfo(name="main", last_commit="123456")})
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.BINARY)
+        assert (tmp_path / STORE_FILE).exists()
+        assert not (tmp_path / BINARY_STORE_FILE).exists()
+
+
+class TestJournal:
+    @pytest.fixture(name="store")
+    def fixture_store(self, tmp_path: Path) -> BranchTree:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        return StoreManager.load(store_dir=tmp_path)
+
+    def test_replay(self, tmp_path: Path, store: BranchTree) -> None:
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        store.set_parent("C", parent=ParentInfo(name="B", last_commit=SHA2))
+        store.rename_branch(from_="A", to="A2")
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        store.remove_branch("B")
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+
+        assert (tmp_path / JOURNAL_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == store.serialize()
+
+    def test_save_compacts(self, tmp_path: Path, store: BranchTree) -> None:
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+
+        loaded = StoreManager.load(store_dir=tmp_path)
+        StoreManager.save(loaded, store_dir=tmp_path, format=StoreFormat.JSON)
+        assert not (tmp_path / JOURNAL_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == store.serialize()
+
+    def test_compacts_when_too_big(self, tmp_path: Path, store: BranchTree, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr("graphite_shim.store.MAX_JOURNAL_SIZE", 0)
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        store.update_parent_commit("A", commit=SHA2)
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+
+        assert not (tmp_path / JOURNAL_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == store.serialize()
+
+    def test_ignores_stale_journal(self, tmp_path: Path, store: BranchTree) -> None:
+        store.rename_branch(from_="A", to="A2")
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        journal = (tmp_path / JOURNAL_FILE).read_text()
+
+        # simulate crashing after saving the store but before deleting the journal
+        StoreManager.save(StoreManager.load(store_dir=tmp_path), store_dir=tmp_path, format=StoreFormat.JSON)
+        (tmp_path / JOURNAL_FILE).write_text(journal)
+
+        assert StoreManager.load(store_dir=tmp_path).serialize() == store.serialize()
+
+    def test_ignores_partial_entry(self, tmp_path: Path, store: BranchTree) -> None:
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        with (tmp_path / JOURNAL_FILE).open("a") as f:
+            f.write('{"op": "remove_br')
+
+        assert StoreManager.load(store_dir=tmp_path).serialize() == store.serialize()
+
+    @pytest.mark.parametrize("format", [StoreFormat.JSON, StoreFormat.BINARY])
+    def test_stops_at_corrupt_entry(
+        self, tmp_path: Path, format: StoreFormat, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=format)
+        store = StoreManager.load(store_dir=tmp_path)
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(store, store_dir=tmp_path, format=format)
+        expected = store.serialize()
+        with (tmp_path / JOURNAL_FILE).open("a") as f:
+            f.write('{"op": "remove_br\n')
+        store.remove_branch("B")
+        StoreManager.append(store, store_dir=tmp_path, format=format)
+
+        assert StoreManager.load(store_dir=tmp_path).serialize() == expected
+        assert "Ignoring corrupt entries" in capsys.readouterr().err
+        # compacted, so it only warns once
+        assert not (tmp_path / JOURNAL_FILE).exists()
+        assert StoreManager.load(store_dir=tmp_path).serialize() == expected
+        assert capsys.readouterr().err == ""
+
+
+class TestStoreCache:
+    def test_reuses_store(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        cache = StoreCache()
+        store = cache.load(store_dir=tmp_path)
+        cache.refresh(store_dir=tmp_path)
+        assert cache.load(store_dir=tmp_path) is store
+
+    def test_reloads_when_changed_on_disk(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        cache = StoreCache()
+        store = cache.load(store_dir=tmp_path)
+
+        other = StoreManager.load(store_dir=tmp_path)
+        other.update_parent_commit("B", commit=SHA1)
+        StoreManager.append(other, store_dir=tmp_path, format=StoreFormat.JSON)
+
+        reloaded = cache.load(store_dir=tmp_path)
+        assert reloaded is not store
+        assert reloaded.serialize()["branches"]["B"]["last_commit"] == SHA1
+
+    def test_keeps_saved_changes(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        cache = StoreCache()
+        store = cache.load(store_dir=tmp_path)
+        store.update_parent_commit("B", commit=SHA1)
+        StoreManager.save(store, store_dir=tmp_path, format=StoreFormat.JSON)
+        cache.refresh(store_dir=tmp_path)
+        assert cache.load(store_dir=tmp_path) is store
+
+    def test_drops_unsaved_changes(self, tmp_path: Path) -> None:
+        StoreManager.save(make_store(), store_dir=tmp_path, format=StoreFormat.JSON)
+        cache = StoreCache()
+        store = cache.load(store_dir=tmp_path)
+        store.update_parent_commit("B", commit=SHA1)
+        cache.refresh(store_dir=tmp_path)
+
+        reloaded = cache.load(store_dir=tmp_path)
+        assert reloaded is not store
+        assert reloaded.serialize()["branches"]["B"]["last_commit"] == SHA2
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 import subprocess
+from collections.abc import Mapping
 from pathlib import Path
 from typing import Any
 
 import test.utils.expector as expector
 from graphite_shim.git import GitClient
+from graphite_shim.refs import RefReader
 
 
 class GitTestClient(expector.ExpectorMixin, GitClient):
     def __init__(self) -> None:
-        super().__init__(cwd=Path("/non_existent"))
+        super().__init__(cwd=Path("/non_existent"), use_batch=False)
 
     @property
     def root(self) -> Path:
@@ -24,6 +26,10 @@ class GitTestClient(expector.ExpectorMixin, GitClient):
     def git_dir(self) -> Path:
         return Path(".git")
 
+    @property
+    def refs(self) -> RefReader:
+        return RefReader(git_dir=Path("/non_existent/.git"), common_dir=Path("/non_existent/.git"))
+
     @expector.mocked
     def _get_curr_branch(
         self,
@@ -32,6 +38,15 @@ class GitTestClient(expector.ExpectorMixin, GitClient):
     ) -> str:
         return MOCK_returns
 
+    @expector.mocked
+    def _get_refs(
+        self,
+        prefix: str,
+        *,
+        MOCK_returns: Mapping[str, str] | None = None,
+    ) -> Mapping[str, str]:
+        return MOCK_returns or {}
+
     @expector.mocked
     def _run(
         self,
@@ -48,3 +63,8 @@ class GitTestClient(expector.ExpectorMixin, GitClient):
             stdout=MOCK_stdout,
             stderr=MOCK_stderr,
         )
+
+
+def git(repo: Path, *args: str, check: bool = True) -> str:
+    """Run git in a real repo (see the `git_repo` fixture), returning its stdout."""
+    return subprocess.run(["git", *args], cwd=repo, check=check, capture_output=True, text=True).stdout.strip()